@@ -39,13 +39,31 @@ def chat(character_file: str):
     default="characters/default_character_data.json",
     show_default=True
 )
-def auto(character_file: str):
+@click.option(
+    "--webhook-port",
+    type=int,
+    help="Receive neynar webhooks on this port, notification polling becomes a slow fallback",
+    default=lambda: os.getenv("NEYNAR_WEBHOOK_PORT") or None,
+)
+@click.option(
+    "--worker-only",
+    is_flag=True,
+    help="Only work the shared queue (AGENT_QUEUE_DB) without polling, to add worker processes",
+    default=False
+)
+@click.option(
+    "--webhook-insecure",
+    is_flag=True,
+    help="Accept unsigned webhooks when NEYNAR_WEBHOOK_SECRET is not set (local testing only)",
+    default=False
+)
+def auto(character_file: str, webhook_port: int, worker_only: bool, webhook_insecure: bool):
     """
     Run an autonomous simulation with the DAO Agent
     """
     click.echo(click.style(f"Running autonomus agent conversation Character Definition file: {click.style(character_file, fg='blue')}", fg="yellow"))
     from dao_agent_demo.run import run_autonomous_loop
-    run_autonomous_loop()
+    run_autonomous_loop(webhook_port=webhook_port, worker_only=worker_only, webhook_insecure=webhook_insecure)
 
 
 @cli.command()
@@ -107,6 +125,28 @@ def create_sim(num_players: int):
     from dao_agent_demo.create_sim import main
     main(num_players=3)
 
+@cli.command()
+@click.option(
+    "--trace-file",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    help="Path to the trace file written by the agent loops",
+    default="traces.jsonl",
+    show_default=True
+)
+@click.option(
+    "--top",
+    type=int,
+    help="Number of slowest traces to list",
+    default=10,
+    show_default=True
+)
+def trace_summary(trace_file: str, top: int):
+    """
+    Show a latency breakdown of recorded agent traces
+    """
+    from dao_agent_demo.trace_utils import summarize_traces
+    click.echo(summarize_traces(trace_file, top))
+
 def run():
     cli()
 
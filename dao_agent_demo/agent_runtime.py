@@ -0,0 +1,310 @@
+import asyncio
+import time
+import itertools
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from dao_agent_demo.interval_utils import AdaptiveInterval
+from dao_agent_demo.queue_utils import DurableWorkQueue, worker_name
+
+
+def make_work_item(kind: str, ref, payload, priority: int = 0, order: float = 0) -> Dict:
+    """
+    Build a work item for the agent runtime.
+
+    Args:
+        kind (str): The item kind (notification, proposal)
+        ref: The source reference, unique per kind (cast hash, proposal id)
+        payload: The raw item (notification dict, proposal record)
+        priority (int): Lower runs first
+        order (float): Tie breaker within a priority, lower runs first
+
+    Returns:
+        Dict: The work item
+    """
+    return {
+        "key": f"{kind}:{ref}",
+        "kind": kind,
+        "ref": ref,
+        "payload": payload,
+        "priority": priority,
+        "order": order,
+        "received_at": time.time(),
+    }
+
+
+class PeriodicSource:
+    def __init__(
+        self,
+        name: str,
+        poll: Callable[[], List[Dict]],
+        interval: AdaptiveInterval,
+        rate_limit: Optional[Callable[[], Dict]] = None,
+        on_queued: Optional[Callable[[], None]] = None,
+    ):
+        """
+        A source the runtime polls on its own adaptive schedule.
+
+        Args:
+            name (str): Source name used in logs
+            poll (Callable): Blocking function returning a list of work items
+            interval (AdaptiveInterval): The source's poll interval
+            rate_limit (Optional[Callable]): Returns the rate limit headers seen by the last poll
+            on_queued (Optional[Callable]): Called once the items of a poll are queued, to advance
+                a cursor only when a crash can no longer lose them
+        """
+        self.name = name
+        self.poll = poll
+        self.interval = interval
+        self.rate_limit = rate_limit
+        self.on_queued = on_queued
+
+    def next_interval(self, new_items: int) -> float:
+        """
+        Seconds to wait before the next poll.
+
+        Args:
+            new_items (int): Items of the last poll that were not seen before
+        """
+        rate_limit = self.rate_limit() if self.rate_limit else None
+        return self.interval.observe(new_items, rate_limit)
+
+    def metrics(self) -> Dict:
+        """
+        Get the poll efficiency metrics of the source.
+        """
+        return self.interval.metrics()
+
+
+class AgentRuntime:
+    def __init__(
+        self,
+        handle_item: Callable[[Dict], None],
+        sources: List[PeriodicSource],
+        workers: int = 1,
+        max_remembered: int = 10000,
+        work_queue: Optional[DurableWorkQueue] = None,
+        idle_poll: float = 1.0,
+        purge_interval: float = 3600,
+        done_retention: float = 7 * 86400,
+        max_attempts: int = 5,
+        retry_delay: float = 30,
+    ):
+        """
+        Event driven runtime for the autonomous agent.
+
+        Every source polls concurrently on its own interval and pushes new items onto
+        one priority queue. A bounded pool of workers takes the most urgent items off the
+        queue and runs the (blocking) agent turns in threads, so sources keep polling
+        while the agents think, an item waits at most one poll interval before it is
+        queued and a backlog drains in proportion to the number of workers.
+
+        With a work_queue, items go through the durable SQLite queue instead of memory:
+        they survive crashes, failed turns are retried and several processes (each with
+        its own workers, sources optional) can share one backlog. Handled items stay in
+        the queue for done_retention seconds, so polls do not queue them again, and are
+        purged every purge_interval seconds.
+
+        Without it, failed items are retried the same way as in the durable queue:
+        after retry_delay seconds, doubled on every attempt, and dropped as dead letters
+        after max_attempts.
+
+        Args:
+            handle_item (Callable): Runs the agent on one work item
+            sources (List[PeriodicSource]): The sources to poll
+            workers (int): Number of items handled at the same time
+            max_remembered (int): Handled item keys kept for dedupe
+            work_queue (Optional[DurableWorkQueue]): Durable queue shared between processes
+            idle_poll (float): Seconds an idle worker waits before checking the durable queue again
+            purge_interval (float): Seconds between purges of handled items from the durable queue
+            done_retention (float): Seconds handled items are kept, longer than any poll looks back
+            max_attempts (int): Attempts before an in-memory item is dead lettered
+            retry_delay (float): Seconds before the first in-memory retry, doubled on every attempt
+        """
+        self.handle_item = handle_item
+        self.sources = sources
+        self.workers = workers
+        self.max_remembered = max_remembered
+        self.work_queue = work_queue
+        self.idle_poll = idle_poll
+        self.purge_interval = purge_interval
+        self.done_retention = done_retention
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.wakeup: Optional[asyncio.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.sequence = itertools.count()
+        # keys queued or being handled, and keys already handled
+        self.pending = set()
+        self.handled: OrderedDict = OrderedDict()
+        # failed attempts of in-memory items, and the keys given up on
+        self.attempts: Dict[str, int] = {}
+        self.dead: OrderedDict = OrderedDict()
+
+    async def run(self):
+        """
+        Run the sources and workers until cancelled.
+        """
+        self.queue = asyncio.PriorityQueue()
+        self.wakeup = asyncio.Event()
+        # published last, submit() from other threads treats a loop as a ready runtime
+        self.loop = asyncio.get_running_loop()
+        worker = self._durable_worker if self.work_queue else self._worker
+        tasks = [asyncio.create_task(self._poll_source(source)) for source in self.sources]
+        tasks += [asyncio.create_task(worker(i)) for i in range(self.workers)]
+        if self.work_queue:
+            tasks.append(asyncio.create_task(self._purge_done()))
+        print(f"agent runtime started with {len(self.sources)} sources and {self.workers} workers")
+        await asyncio.gather(*tasks)
+
+    def metrics(self) -> Dict:
+        """
+        Get the poll efficiency metrics of every source.
+        """
+        return {source.name: source.metrics() for source in self.sources}
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the poll efficiency of every source.
+        """
+        report = "polling: " + ", ".join(
+            f"{name} {m['items']}/{m['polls']} items/polls every {m['interval']:.0f}s"
+            for name, m in self.metrics().items()
+        )
+        if self.work_queue:
+            report += f"\n{self.work_queue.report()}"
+        elif self.dead:
+            report += f", {len(self.dead)} dead letters"
+        return report
+
+    def _enqueue(self, item: Dict) -> bool:
+        if item["key"] in self.pending or item["key"] in self.handled or item["key"] in self.dead:
+            return False
+        self.pending.add(item["key"])
+        self._put(item)
+        return True
+
+    def _put(self, item: Dict):
+        self.queue.put_nowait((item["priority"], item["order"], next(self.sequence), item))
+
+    def _remember(self, keys: OrderedDict, key: str):
+        keys[key] = time.time()
+        while len(keys) > self.max_remembered:
+            keys.popitem(last=False)
+
+    def _failed(self, item: Dict, error: str):
+        # same policy as DurableWorkQueue.nack, the key stays pending so polls do not queue it early
+        key = item["key"]
+        attempts = self.attempts.get(key, 0) + 1
+        if attempts >= self.max_attempts:
+            self.attempts.pop(key, None)
+            self.pending.discard(key)
+            self._remember(self.dead, key)
+            print(f"\033[91mError handling {key}: {error} (dead after {attempts} attempts)\033[0m")
+            return
+        self.attempts[key] = attempts
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        self.loop.call_later(delay, self._put, item)
+        print(f"\033[91mError handling {key}: {error} (retry in {delay:.0f}s)\033[0m")
+
+    def submit(self, item: Dict):
+        """
+        Push an item onto the work queue from any thread (ex: a webhook receiver).
+
+        Returns:
+            bool: False if the runtime is not running yet, the polls pick the item up later
+        """
+        if self.loop is None or self.wakeup is None:
+            return False
+        if self.work_queue:
+            self.work_queue.put(item)
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        else:
+            self.loop.call_soon_threadsafe(self._enqueue, item)
+        return True
+
+    def _put_durable(self, items: List[Dict]) -> int:
+        queued = sum(1 for item in items if self.work_queue.put(item))
+        if queued:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        return queued
+
+    async def _poll_source(self, source: PeriodicSource):
+        while True:
+            try:
+                items = await asyncio.to_thread(source.poll)
+            except Exception as e:
+                print(f"\033[91mError polling {source.name}: {str(e)}\033[0m")
+                items = []
+            if self.work_queue:
+                queued = await asyncio.to_thread(self._put_durable, items)
+            else:
+                queued = sum(1 for item in items if self._enqueue(item))
+            if source.on_queued:
+                try:
+                    await asyncio.to_thread(source.on_queued)
+                except Exception as e:
+                    print(f"\033[91mError saving the {source.name} cursor: {str(e)}\033[0m")
+            interval = source.next_interval(queued)
+            if queued:
+                metrics = source.metrics()
+                print(
+                    f"\n\033[90m{source.name}: queued {queued} new item(s), "
+                    f"{metrics['items_per_poll']:.2f} items/poll, next poll in {interval:.0f}s\033[0m"
+                )
+            await asyncio.sleep(interval)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, _, _, item = await self.queue.get()
+            try:
+                print(f"\n\033[90mworker {worker_id} handling {item['key']}\033[0m")
+                await asyncio.to_thread(self.handle_item, item)
+                self._remember(self.handled, item["key"])
+                self.attempts.pop(item["key"], None)
+                self.pending.discard(item["key"])
+            except Exception as e:
+                self._failed(item, str(e))
+            finally:
+                self.queue.task_done()
+
+    async def _durable_worker(self, worker_id: int):
+        owner = worker_name(worker_id)
+        while True:
+            item = await asyncio.to_thread(self.work_queue.lease, owner)
+            if item is None:
+                # other processes add items too, so wait for a local wakeup or the idle poll
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.idle_poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heartbeat = asyncio.create_task(self._renew_lease(item["key"], owner))
+            try:
+                print(f"\n\033[90mworker {worker_id} handling {item['key']} (attempt {item['attempts']})\033[0m")
+                await asyncio.to_thread(self.handle_item, item)
+                await asyncio.to_thread(self.work_queue.ack, item["key"], owner)
+            except Exception as e:
+                status = await asyncio.to_thread(self.work_queue.nack, item["key"], owner, str(e))
+                print(f"\033[91mError handling {item['key']}: {str(e)} ({status})\033[0m")
+            finally:
+                heartbeat.cancel()
+
+    async def _purge_done(self):
+        while True:
+            try:
+                purged = await asyncio.to_thread(self.work_queue.purge_done, self.done_retention)
+                if purged:
+                    print(f"\n\033[90mwork queue: purged {purged} handled item(s)\033[0m")
+            except Exception as e:
+                print(f"\033[91mError purging the work queue: {str(e)}\033[0m")
+            await asyncio.sleep(self.purge_interval)
+
+    async def _renew_lease(self, key: str, owner: str):
+        # agent turns can outlast the visibility timeout, keep the lease while the turn runs
+        while True:
+            await asyncio.sleep(self.work_queue.visibility_timeout / 3)
+            await asyncio.to_thread(self.work_queue.renew, key, owner)
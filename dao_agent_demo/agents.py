@@ -5,10 +5,12 @@ from typing import Union, List, Dict, TypedDict
 from openai import OpenAI
 from swarm import Agent
 
-from dao_agent_demo.prompt_helpers import get_instructions_from_json, get_character_json
+from dao_agent_demo.character_registry import character_registry
 
 from dao_agent_demo.tools import (
+    get_balance,
     get_knowledge_by_keywords,
+    search_knowledge,
     get_agent_address,
     get_dao_proposals,
     get_passed_dao_proposals,
@@ -18,7 +20,7 @@ from dao_agent_demo.tools import (
     summon_meme_token_dao,
     summon_crowd_fund_dao,
     commit_memory,
-    get_all_memories,
+    recall_memories,
     generate_art,
     cast_to_farcaster,
     check_cast_replies,
@@ -40,21 +42,21 @@ def route_to_agent(agent_name: str):
     """
     agent_name = agent_name.lower()
     print("routing to", agent_name)
-    operator_agent = operator_agent_list[agent_name]["file_path"]
-    file_json = get_character_json(operator_agent, character_type="OPERATOR")
-    instructions = get_instructions_from_json(file_json, character_type="OPERATOR")
-    print("instructions", instructions)
-    print("functions", operator_agent_list[agent_name]["functions"])
-    if operator_agent_list[agent_name]["agent"] is None:
+    operator = operator_agent_list[agent_name]
+    # instructions come from the registry, only rebuilt when the operator file changes
+    instructions = character_registry.get_instructions(operator["file_path"], character_type="OPERATOR")
+    if operator["agent"] is None:
         agent = Agent(
             name=agent_name,
             instructions=instructions,
             model="gpt-4o-mini",
-            functions=operator_agent_list[agent_name]["functions"]
+            functions=operator["functions"]
         )
-        operator_agent_list[agent_name]["agent"] = agent
+        operator["agent"] = agent
     else:
-        agent = operator_agent_list[agent_name]["agent"]
+        agent = operator["agent"]
+        if agent.instructions is not instructions:
+            agent.instructions = instructions
     return agent
 
 def route_to_synthesizer():
@@ -101,7 +103,7 @@ operator_agent_list = {
         },
     "maester":{
         "file_path":"operators/maester.json",
-        "functions":[get_knowledge_by_keywords, route_to_synthesizer],
+        "functions":[search_knowledge, get_knowledge_by_keywords, route_to_synthesizer],
         "agent": None
         },
     "bard":{
@@ -131,8 +133,7 @@ def alderman_agent():
     """
     Alderman agent (triage)
     """
-    file_json = get_character_json(operator_agent_list["alderman"]["file_path"], character_type="OPERATOR")
-    instructions = get_instructions_from_json(file_json, character_type="OPERATOR")
+    instructions = character_registry.get_instructions(operator_agent_list["alderman"]["file_path"], character_type="OPERATOR")
     return Agent(
         name="Alderman",
         instructions=instructions,
@@ -170,8 +171,10 @@ def dao_agent(instructions: str ):
         summon_meme_token_dao,
         summon_crowd_fund_dao,
         commit_memory,
-        get_all_memories,
-        get_knowledge_by_keywords
+        # ranked pages instead of the whole store
+        recall_memories,
+        get_knowledge_by_keywords,
+        search_knowledge
 
     ],
     )
@@ -0,0 +1,56 @@
+import argparse
+import timeit
+
+from swarm.util import function_to_json
+
+from dao_agent_demo.tool_utils import ToolSchemaCache, CTX_VARS_NAME
+
+
+def dao_agent_tools() -> list:
+    """
+    Get the real dao_agent tools, needs the same .env as the agent (tools connect on import).
+    """
+    from dao_agent_demo.agents import dao_agent
+    return list(dao_agent("").functions)
+
+
+def uncached_schemas(functions: list) -> list:
+    # what swarm does on every completion
+    tools = [function_to_json(f) for f in functions]
+    for tool in tools:
+        params = tool["function"]["parameters"]
+        params["properties"].pop(CTX_VARS_NAME, None)
+        if CTX_VARS_NAME in params["required"]:
+            params["required"].remove(CTX_VARS_NAME)
+    return tools
+
+
+def run_benchmark(number: int = 2000) -> str:
+    """
+    Time schema generation per completion with and without the schema cache.
+
+    Args:
+        number (int): Completions to simulate
+
+    Returns:
+        str: The formatted results
+    """
+    functions = dao_agent_tools()
+    cache = ToolSchemaCache()
+    assert cache.schemas(functions) == uncached_schemas(functions)
+
+    uncached = timeit.timeit(lambda: uncached_schemas(functions), number=number) / number
+    cached = timeit.timeit(lambda: cache.schemas(functions), number=number) / number
+    return (
+        f"{len(functions)} tools, {number} completions\n"
+        f"uncached: {uncached * 1e6:10.1f} us per completion\n"
+        f"cached:   {cached * 1e6:10.1f} us per completion\n"
+        f"saved:    {(uncached - cached) * 1e6:10.1f} us per completion ({uncached / cached:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tool schema generation with and without the cache.")
+    parser.add_argument('--number', type=int, default=2000, help="Completions to simulate (default: 2000)")
+    args = parser.parse_args()
+    print(run_benchmark(args.number))
@@ -0,0 +1,163 @@
+import json
+import time
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 512):
+        """
+        Memoization for read-only tools.
+
+        Entries expire after a per tool TTL and the least recently used entry is evicted
+        once max_entries is reached. Concurrent calls with the same arguments share one
+        fetch, and entries can be dropped by tag when a write tool changes the data.
+
+        Args:
+            max_entries (int): Maximum number of cached results
+        """
+        self.max_entries = max_entries
+        # key -> {"value": ..., "expires_at": float, "tags": tuple}
+        self.entries: OrderedDict = OrderedDict()
+        self.in_flight: Dict[tuple, Future] = {}
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str, stat: str):
+        tool_stats = self.stats.setdefault(name, {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0})
+        tool_stats[stat] += 1
+
+    def _key(self, name: str, args: tuple, kwargs: dict) -> tuple:
+        return (name, json.dumps([args, kwargs], sort_keys=True, default=str))
+
+    def get_or_load(self, name: str, key: tuple, ttl: float, tags: Iterable[str], loader: Callable):
+        """
+        Get a cached value, or load it once even if several threads ask at the same time.
+
+        Args:
+            name (str): The tool name (for metrics)
+            key (tuple): The cache key
+            ttl (float): Seconds the loaded value stays valid
+            tags (Iterable[str]): Tags the entry can be invalidated by
+            loader (Callable): Loads the value on a miss
+
+        Returns:
+            The cached or loaded value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry["expires_at"] > time.monotonic():
+                self.entries.move_to_end(key)
+                self._count(name, "hits")
+                return entry["value"]
+            future = self.in_flight.get(key)
+            if future is not None:
+                self._count(name, "coalesced")
+                owner = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                self._count(name, "misses")
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.in_flight.pop(key, None)
+            # tools report failures as strings, never keep those around
+            if not (isinstance(value, str) and value.startswith("Error")):
+                self.entries[key] = {"value": value, "expires_at": time.monotonic() + ttl, "tags": tuple(tags)}
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    evicted_key, _ = self.entries.popitem(last=False)
+                    self._count(evicted_key[0], "evictions")
+        future.set_result(value)
+        return value
+
+    def memoize(self, ttl: float, tags: Iterable[str] = ()):
+        """
+        Decorator caching a read-only tool's results for ttl seconds.
+
+        Args:
+            ttl (float): Seconds a result stays valid
+            tags (Iterable[str]): Tags the cached results can be invalidated by
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = self._key(func.__name__, args, kwargs)
+                return self.get_or_load(func.__name__, key, ttl, tags, lambda: func(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def invalidates(self, *tags: str):
+        """
+        Decorator for write tools, drops the tagged entries once the tool reports success.
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                result = func(*args, **kwargs)
+                if isinstance(result, str) and result.startswith("Successfully"):
+                    for tag in tags:
+                        self.invalidate(tag)
+                return result
+            return wrapper
+        return decorator
+
+    def invalidate(self, tag: str = None) -> int:
+        """
+        Drop cached entries with a tag, or every entry when no tag is given.
+
+        Returns:
+            int: The number of entries dropped
+        """
+        with self.lock:
+            keys = [key for key, entry in self.entries.items() if tag is None or tag in entry["tags"]]
+            for key in keys:
+                del self.entries[key]
+                self._count(key[0], "invalidations")
+        return len(keys)
+
+    def metrics(self) -> Dict:
+        """
+        Get hit/miss metrics per tool and overall.
+        """
+        with self.lock:
+            per_tool = {name: dict(tool_stats) for name, tool_stats in self.stats.items()}
+            size = len(self.entries)
+        hits = sum(s["hits"] + s["coalesced"] for s in per_tool.values())
+        misses = sum(s["misses"] for s in per_tool.values())
+        return {
+            "entries": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tools": per_tool,
+        }
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the cache metrics.
+        """
+        metrics = self.metrics()
+        return (
+            f"tool cache: {metrics['hits']} hits / {metrics['misses']} misses "
+            f"({metrics['hit_rate']:.0%}), {metrics['entries']} entries"
+        )
+
+
+# shared cache for the read-only dao and farcaster tools
+tool_cache = TTLCache()
@@ -0,0 +1,140 @@
+import os
+import json
+import threading
+import time
+from typing import Dict
+
+from dao_agent_demo.prompt_helpers import get_instructions_from_json
+
+# relative definition paths that do not exist in the working directory are looked up here
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CharacterRegistry:
+    def __init__(self, directories: tuple = ("operators", "characters"), refresh_interval: float = 5.0):
+        """
+        Initialize the character and operator registry.
+
+        Loads every json definition under the given directories on first use and keeps
+        the parsed json and the built instruction strings in memory. Relative paths are
+        resolved against the working directory, or the repository when they are not
+        found there, so importing the registry from elsewhere still finds the definitions. A file is only
+        re-read when its mtime changes, and mtimes are checked at most once every
+        refresh_interval seconds per file so hot paths (agent routing) do no I/O.
+
+        Args:
+            directories (tuple): Directories to preload definitions from
+            refresh_interval (float): Minimum seconds between mtime checks of a file
+        """
+        self.directories = directories
+        self.refresh_interval = refresh_interval
+        # path -> {"json": dict, "mtime": float, "checked_at": float, "instructions": {character_type: str}}
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.preloaded = False
+
+    def preload(self) -> int:
+        """
+        Load all json files in the registry directories.
+
+        Returns:
+            int: The number of definitions loaded
+        """
+        self.preloaded = True
+        count = 0
+        for directory in self.directories:
+            directory = self.resolve(directory)
+            if not os.path.isdir(directory):
+                continue
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    if file_name.endswith(".json"):
+                        self._load(os.path.join(root, file_name))
+                        count += 1
+        print(f"character registry loaded {count} definitions")
+        return count
+
+    def resolve(self, path: str) -> str:
+        """
+        Get the absolute path of a definition file or directory.
+        """
+        if not os.path.isabs(path) and not os.path.exists(path) and os.path.exists(os.path.join(REPO_ROOT, path)):
+            path = os.path.join(REPO_ROOT, path)
+        return os.path.abspath(path)
+
+    def _key(self, file: str) -> str:
+        return os.path.normpath(self.resolve(file))
+
+    def _load(self, file: str) -> Dict:
+        key = self._key(file)
+        mtime = os.path.getmtime(key)
+        with open(key, "r") as character_file:
+            file_json = json.load(character_file)
+        entry = {
+            "json": file_json,
+            "mtime": mtime,
+            "checked_at": time.monotonic(),
+            "instructions": {},
+        }
+        with self.lock:
+            self.entries[key] = entry
+        return entry
+
+    def _entry(self, file: str) -> Dict:
+        """
+        Get the cached entry for a file, reloading it if the file changed on disk.
+        """
+        if not self.preloaded:
+            self.preload()
+        key = self._key(file)
+        entry = self.entries.get(key)
+        if entry is None:
+            return self._load(key)
+
+        now = time.monotonic()
+        if now - entry["checked_at"] < self.refresh_interval:
+            return entry
+        entry["checked_at"] = now
+        try:
+            mtime = os.path.getmtime(key)
+        except OSError:
+            # keep serving the last good copy if the file disappeared
+            return entry
+        if mtime != entry["mtime"]:
+            print(f"reloading changed definition {key}")
+            return self._load(key)
+        return entry
+
+    def get_json(self, file: str) -> Dict:
+        """
+        Get the parsed json of a character or operator definition.
+
+        Args:
+            file (str): Path to the definition file
+
+        Returns:
+            Dict: The definition json
+        """
+        return self._entry(file)["json"]
+
+    def get_instructions(self, file: str, character_type: str = "PLAYER") -> str:
+        """
+        Get the instruction prompt of a definition, built once per file version.
+
+        Args:
+            file (str): Path to the definition file
+            character_type (str): Type of character - PLAYER, GM, or OPERATOR
+
+        Returns:
+            str: Formatted instruction prompt
+        """
+        entry = self._entry(file)
+        instructions = entry["instructions"].get(character_type)
+        if instructions is None:
+            instructions = get_instructions_from_json(entry["json"], character_type=character_type)
+            entry["instructions"][character_type] = instructions
+        return instructions
+
+
+# shared registry used by the agents
+character_registry = CharacterRegistry()
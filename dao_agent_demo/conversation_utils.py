@@ -0,0 +1,179 @@
+import json
+import threading
+from typing import Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+SUMMARY_PROMPT = (
+    "You maintain the long running memory of an autonomous DAO agent. "
+    "Merge the previous summary and the new conversation turns into an updated summary of at most {max_chars} characters "
+    "that keeps open requests, decisions, actions taken (casts, proposals, votes, summons) and who asked for them. "
+    "Also list durable facts worth remembering long term (people, DAOs, addresses, preferences, outcomes). "
+    'Respond with json: {{"summary": "...", "facts": ["..."]}}'
+)
+
+
+def _message_text(message: Dict) -> str:
+    content = message.get("content")
+    if content is None and message.get("tool_calls"):
+        content = "calls " + ", ".join(tool_call["function"]["name"] for tool_call in message["tool_calls"])
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    speaker = message.get("sender") or message.get("tool_name") or message.get("role")
+    return f"{speaker}: {content}"
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        max_turns: int = 12,
+        keep_turns: int = 6,
+        max_summary_chars: int = 3000,
+        commit_fact: Optional[Callable[[str], object]] = None,
+        summarizer: Optional[Callable[[str, List[Dict]], Dict]] = None,
+        model: str = "gpt-4o-mini",
+        on_change: Optional[Callable[[Dict], object]] = None,
+    ):
+        """
+        Sliding window over the autonomous loop's message history.
+
+        A turn starts at a user message and holds everything the agents produced for
+        it. Once more than max_turns are kept, the oldest turns are folded into a running
+        summary and only the last keep_turns are sent verbatim, so the prompt size stays
+        flat no matter how long the loop runs. Facts pulled out while compacting are
+        handed to commit_fact (ex: MemoryRetention.store_memory).
+
+        Args:
+            max_turns (int): Turns kept before compacting
+            keep_turns (int): Turns left in the window after compacting
+            max_summary_chars (int): Upper bound of the running summary
+            commit_fact (Optional[Callable]): Called with each salient fact
+            summarizer (Optional[Callable]): Called with (summary, messages), returns {"summary", "facts"}
+            model (str): Model used by the default summarizer
+            on_change (Optional[Callable]): Called with get_state() after every change, to persist the window
+        """
+        self.max_turns = max_turns
+        self.keep_turns = keep_turns
+        self.max_summary_chars = max_summary_chars
+        self.commit_fact = commit_fact
+        self.summarizer = summarizer or self._llm_summarize
+        self.model = model
+        self.on_change = on_change
+        self.summary = ""
+        self.messages: List[Dict] = []
+        self.compactions = 0
+        self.compacting = False
+        self.lock = threading.RLock()
+
+    def add(self, message: Dict):
+        """
+        Append a message and compact the history if needed.
+        """
+        self.extend([message])
+
+    def extend(self, messages: List[Dict]):
+        """
+        Append messages and compact the history if needed.
+        """
+        with self.lock:
+            self.messages.extend(messages)
+        # outside the lock, compact only holds it around the summarizer call
+        self.compact()
+        if self.on_change:
+            self.on_change(self.get_state())
+
+    def get_state(self) -> Dict:
+        """
+        Get the summary and window so they can be restored after a restart.
+        """
+        with self.lock:
+            return {"summary": self.summary, "messages": list(self.messages), "compactions": self.compactions}
+
+    def load_state(self, state: Optional[Dict]):
+        """
+        Restore a state saved from get_state, a missing state leaves the memory empty.
+        """
+        if not state:
+            return
+        with self.lock:
+            self.summary = state.get("summary") or ""
+            self.messages = list(state.get("messages") or [])
+            self.compactions = state.get("compactions", 0)
+
+    def get_messages(self) -> List[Dict]:
+        """
+        Get the history to send to the model: the running summary followed by the window.
+        """
+        with self.lock:
+            if not self.summary:
+                return list(self.messages)
+            summary_message = {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}
+            return [summary_message] + self.messages
+
+    def _turn_starts(self) -> List[int]:
+        return [i for i, message in enumerate(self.messages) if message.get("role") == "user"]
+
+    def compact(self) -> bool:
+        """
+        Fold the oldest turns into the summary when the window is full.
+
+        The summarizer runs on a snapshot outside the lock, so other workers keep reading
+        and extending the window during the model call. The summary is only swapped in if
+        the snapshot is still the start of the window.
+
+        Returns:
+            bool: True if turns were compacted
+        """
+        with self.lock:
+            starts = self._turn_starts()
+            if self.compacting or len(starts) <= self.max_turns:
+                return False
+            # cut on a turn boundary so tool calls and their results stay together
+            cut = starts[len(starts) - self.keep_turns]
+            summary, old_messages = self.summary, self.messages[:cut]
+            self.compacting = True
+
+        try:
+            try:
+                result = self.summarizer(summary, old_messages)
+            except Exception as e:
+                print(f"Error summarizing conversation, truncating instead: {str(e)}")
+                result = self._fallback_summarize(summary, old_messages)
+
+            with self.lock:
+                # messages are only appended, the window changed if the state was reloaded meanwhile
+                unchanged = self.summary is summary and len(self.messages) >= cut and all(
+                    a is b for a, b in zip(self.messages, old_messages)
+                )
+                if not unchanged:
+                    return False
+                self.messages = self.messages[cut:]
+                self.summary = (result.get("summary") or "")[-self.max_summary_chars:]
+                self.compactions += 1
+                facts = result.get("facts") or []
+        finally:
+            with self.lock:
+                self.compacting = False
+
+        if self.commit_fact:
+            for fact in facts:
+                self.commit_fact(fact)
+        print(f"\033[90mcompacted {len(old_messages)} messages into the conversation summary, {len(facts)} facts committed\033[0m")
+        return True
+
+    def _llm_summarize(self, summary: str, messages: List[Dict]) -> Dict:
+        transcript = "\n".join(_message_text(message) for message in messages)
+        completion = OpenAI().chat.completions.create(
+            model=self.model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT.format(max_chars=self.max_summary_chars)},
+                {"role": "user", "content": f"Previous summary: {summary or 'none'}\n\nNew turns:\n{transcript}"},
+            ],
+        )
+        return json.loads(completion.choices[0].message.content)
+
+    def _fallback_summarize(self, summary: str, messages: List[Dict]) -> Dict:
+        # keep the tail of the transcript if the model is not reachable
+        transcript = " | ".join(_message_text(m) for m in messages if m.get("role") in ("user", "assistant"))
+        return {"summary": f"{summary} | {transcript}".strip(" |"), "facts": []}
@@ -8,8 +8,42 @@ import uuid
 from dotenv import load_dotenv
 from datetime import datetime
 
+from dao_agent_demo.interval_utils import parse_rate_limit_headers
+
 load_dotenv()
 
+
+def format_notification(cast: Dict, notification_type: str) -> Dict:
+    """
+    Flatten a neynar cast into the notification record the agents work with.
+    Shared by the notifications poll and the webhook receiver.
+
+    Args:
+        cast (Dict): The neynar cast object
+        notification_type (str): mention or reply
+
+    Returns:
+        Dict: Notification containing timestamp, hash, text, author and age
+    """
+    author = cast['author']
+    eth_addresses = (author.get('verified_addresses') or {}).get('eth_addresses') or []
+    timestamp = cast['timestamp']
+    try:
+        created_at = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
+    except ValueError:
+        created_at = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+    return {
+        'timestamp': timestamp,
+        'hash': cast['hash'],
+        'text': cast['text'],
+        'author': author['username'],
+        'author_fid': author['fid'],
+        'author_verified_address': eth_addresses[0] if eth_addresses else None,
+        'type': notification_type,
+        'age_in_sec': (datetime.utcnow() - created_at).total_seconds()
+    }
+
+
 class FarcasterBot:
     def __init__(self):
         """Initialize Warpcast bot with credentials"""
@@ -21,6 +55,8 @@ class FarcasterBot:
             "content-type": "application/json",
             "x-api-key": os.getenv("NAYNAR_API_KEY")
         }
+        # rate limit headers of the last notifications poll, used to pace polling
+        self.last_rate_limit = {}
 
         
     def post_cast(self, content: str, channel_id: Optional[str] = None,parent: Optional[str] = None, parent_fid: Optional[str] = None) -> str:
@@ -130,6 +166,7 @@ class FarcasterBot:
             # Constructing the URL for fetching notifications
             url = self.v2_url + "notifications?fid=" + os.getenv("FARCASTER_FID") + "&type=mentions,replies&priority_mode=false"
             response = requests.get(url, headers=self.headers)
+            self.last_rate_limit = parse_rate_limit_headers(response.headers, response.status_code)
             # Ensure the response is successful
             if response.status_code != 200:
                 return f"Error getting notifications: {response.status_code} - {response.text}"
@@ -140,24 +177,8 @@ class FarcasterBot:
             # Extract the list of notifications from the response
             notifications = response_data.get('notifications', [])
 
-# notification['cast']['author']['verified_address']['eth_addresses'][0]
             result = [
-                {
-                    'timestamp': notification['cast']['timestamp'],
-                    'hash': notification['cast']['hash'],
-                    'text': notification['cast']['text'],
-                    'author': notification['cast']['author']['username'],
-                    'author_fid':  notification['cast']['author']['fid'],
-                    'author_verified_address': (
-                            notification['cast']['author']['verified_addresses']['eth_addresses'][0]
-                            if 'verified_addresses' in notification['cast']['author'] and
-                            'eth_addresses' in notification['cast']['author']['verified_addresses'] and
-                            len(notification['cast']['author']['verified_addresses']['eth_addresses']) > 0
-                            else None
-                        ),
-                    'type': notification['type'],
-                    'age_in_sec': (datetime.utcnow() - datetime.strptime(notification['cast']['timestamp'], "%Y-%m-%dT%H:%M:%S.%fZ")).total_seconds()
-                }
+                format_notification(notification['cast'], notification['type'])
                 for notification in notifications
                 if notification.get('type') in ['reply', 'mention'] and 'cast' in notification
             ]
@@ -1,4 +1,6 @@
 import os
+import json
+import threading
 from time import sleep
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
@@ -18,22 +20,115 @@ TARGET_CHAIN = os.getenv("TARGET_CHAIN", "0x2105")
 GRAPH_URL = "https://gateway-arbitrum.network.thegraph.com/api/" + os.getenv("GRAPH_KEY", "nokey") + DAOHAUS_GRAPH_URLS[TARGET_CHAIN]
 
 
+def parse_dao_addresses(value: Optional[str]) -> List[str]:
+    """
+    Parse a comma separated list of DAO addresses into lower case subgraph ids.
+    """
+    addresses = []
+    for address in (value or "").split(","):
+        address = address.strip().lower()
+        if address and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+# DAOs the agent watches, TARGET_DAOS takes a comma separated list, TARGET_DAO a single one
+# the first DAO is the default for tools called without a dao address
+TARGET_DAOS = parse_dao_addresses(os.getenv("TARGET_DAOS") or os.getenv("TARGET_DAO"))
+
+
+def query_proposals_in_voting(sg, dh_v3, where: Dict, first: int = 10) -> str:
+    """
+    Get proposals in voting with their votes
+    Args:
+        sg (Subgrounds): The subgrounds client
+        dh_v3: The loaded daohaus subgraph
+        where (Dict): The dao filter (dao or dao_in)
+        first (int): Maximum number of proposals
+    Returns:
+        str: Proposals in voting, one record per vote
+    """
+    now = int(datetime.now(timezone.utc).timestamp())
+
+    # Define synthetic fields for the proposal
+    proposal = dh_v3.Proposal
+    proposal.ageInSeconds = now - proposal.createdAt
+    proposal.displayYesBalance = proposal.yesBalance / 10**18
+    proposal.displayNoBalance = proposal.noBalance / 10**18
+
+    # Construct the query
+    proposals = dh_v3.Query.proposals(
+        first=first,
+        orderBy="createdAt",
+        orderDirection="desc",
+        where={
+            **where,
+            "passed": False,
+            "votingEnds_gt": now
+        }
+    )
+
+    # Get main proposal data without votes
+    result = sg.query_df([
+        proposals.dao.id,
+        proposals.proposalId,
+        proposals.ageInSeconds,
+        proposals.yesVotes,
+        proposals.noVotes,
+        proposals.createdAt,
+        proposals.details,
+        proposals.votingEnds,
+        proposals.graceEnds,
+        proposals.passed,
+        proposals.displayYesBalance,
+        proposals.displayNoBalance,
+        # Remove proposal.votes from here
+    ])
+
+    # Convert to DataFrame
+    if isinstance(result, list):
+        df = pd.DataFrame(result)
+    else:
+        df = result
+
+    # Get votes data with specific fields
+    votes_query = sg.query_df([
+        proposals.dao.id,
+        proposals.proposalId,
+        proposals.votes.approved,
+        proposals.votes.balance,
+        proposals.votes.member.memberAddress,
+    ])
+
+    if votes_query is not None:
+        votes_df = pd.DataFrame(votes_query)
+        if not votes_df.empty:
+            df = df.merge(votes_df, on=['proposals_dao_id', 'proposals_proposalId'], how='left')
+
+    return df.to_json(orient='records')
+
+
 class DaohausGraphData:
-    def __init__(self):
+    def __init__(self, dao_id: Optional[str] = None, sg: Optional[Subgrounds] = None, dh_v3=None):
         """
         Initialize daohaus graph data
         python subgrounds https://thegraph.com/docs/en/querying/querying-with-python/
+        Args:
+            dao_id (Optional[str]): The DAO address, defaults to the first of TARGET_DAOS
+            sg (Optional[Subgrounds]): Shared subgrounds client
+            dh_v3: Shared loaded subgraph, so the schema is only loaded once per process
         """
         print("initializing graph data")
-        if not os.getenv("GRAPH_KEY") or not os.getenv("TARGET_DAO"):
-            raise ValueError("GRAPH_KEY and TARGET_DAO must be set in the .env file")
+        dao_id = dao_id or (TARGET_DAOS[0] if TARGET_DAOS else None)
+        if not os.getenv("GRAPH_KEY") or not dao_id:
+            raise ValueError("GRAPH_KEY and TARGET_DAO (or TARGET_DAOS) must be set in the .env file")
 
-        self.sg = Subgrounds()
+        self.sg = sg or Subgrounds()
 
         # Load the subgraph
-        self.dh_v3 = self.sg.load_subgraph(GRAPH_URL)
+        self.dh_v3 = dh_v3 or self.sg.load_subgraph(GRAPH_URL)
 
-        self.dao_id = os.getenv("TARGET_DAO")
+        self.dao_id = dao_id.lower()
 
         self.dao  = self.dh_v3.Query.daos(
                 where={"id": self.dao_id},
@@ -75,69 +170,9 @@ class DaohausGraphData:
         Returns:
             str: Proposals in voting
         """
-        print('>>>> get recent proposals', self.dao_id)
         try:
-            now = int(datetime.now(timezone.utc).timestamp())
-
-            # Define synthetic fields for the proposal
-            proposal = self.dh_v3.Proposal
-            proposal.ageInSeconds = now - proposal.createdAt
-            proposal.displayYesBalance = proposal.yesBalance / 10**18
-            proposal.displayNoBalance = proposal.noBalance / 10**18
-            
-            # Construct the query
-            proposals = self.dh_v3.Query.proposals(
-                first=10,
-                orderBy="createdAt",
-                orderDirection="desc",
-                where={
-                    "dao": self.dao_id, 
-                    "passed": False,
-                    "votingEnds_gt": now
-                }   
-            )
-
-            # Get main proposal data without votes
-            result = self.sg.query_df([
-                proposals.proposalId,
-                proposals.ageInSeconds,
-                proposals.yesVotes,
-                proposals.noVotes,
-                proposals.createdAt,
-                proposals.details,
-                proposals.votingEnds,
-                proposals.graceEnds,
-                proposals.passed,
-                proposals.displayYesBalance,
-                proposals.displayNoBalance,
-                # Remove proposal.votes from here
-            ])
-
-            # Convert to DataFrame
-            if isinstance(result, list):
-                df = pd.DataFrame(result)
-            else:
-                df = result
-
-            # Get votes data with specific fields
-            votes_query = self.sg.query_df([
-                proposals.proposalId,
-                proposals.votes.approved,
-                proposals.votes.balance,
-                proposals.votes.member.memberAddress,
-            ])
-            
-            if votes_query is not None:
-                votes_df = pd.DataFrame(votes_query)
-                print('>>>> votes_df', votes_df)
-                if not votes_df.empty:
-                    df = df.merge(votes_df, on='proposals_proposalId', how='left')
-
-            print('>>>>', df.to_json(orient='records'))
-            return df.to_json(orient='records')
-
+            return query_proposals_in_voting(self.sg, self.dh_v3, {"dao": self.dao_id})
         except Exception as e:
-            print('>>>> error', e)
             return f"Error getting proposals data: {str(e)}"
         
     def get_passed_proposals_data(self) -> str:
@@ -330,4 +365,82 @@ class DaohausGraphData:
             str: The URL
         """
         return f"https://admin.daohaus.fun/#/molochV3/{TARGET_CHAIN}/{self.dao_id}/proposal/{proposal_id}"
-        
\ No newline at end of file
+        
+
+
+class MultiDaoGraphData:
+    def __init__(self, dao_ids: Optional[List[str]] = None):
+        """
+        Graph data for every watched DAO on one subgrounds client and subgraph schema.
+
+        Per DAO queries go through a DaohausGraphData sharing the client, the proposals
+        watch covers all DAOs with a single dao_in query per poll (see get_proposals_in_voting).
+
+        Args:
+            dao_ids (Optional[List[str]]): The DAO addresses, defaults to TARGET_DAOS
+        """
+        self.dao_ids = [dao_id.lower() for dao_id in (dao_ids or TARGET_DAOS)]
+        if not os.getenv("GRAPH_KEY") or not self.dao_ids:
+            raise ValueError("GRAPH_KEY and TARGET_DAO (or TARGET_DAOS) must be set in the .env file")
+
+        self.sg = Subgrounds()
+        self.dh_v3 = self.sg.load_subgraph(GRAPH_URL)
+        self.daos: Dict[str, DaohausGraphData] = {}
+        self.lock = threading.Lock()
+        print(f"watching {len(self.dao_ids)} DAOs")
+
+    @property
+    def default_dao(self) -> str:
+        return self.dao_ids[0]
+
+    def get(self, dao_id: Optional[str] = None) -> DaohausGraphData:
+        """
+        Get the graph data of one DAO
+        Args:
+            dao_id (Optional[str]): The DAO address, defaults to the first watched DAO
+        Returns:
+            DaohausGraphData: Graph data sharing the client
+        """
+        dao_id = (dao_id or self.default_dao).lower()
+        with self.lock:
+            if dao_id not in self.daos:
+                self.daos[dao_id] = DaohausGraphData(dao_id, sg=self.sg, dh_v3=self.dh_v3)
+            return self.daos[dao_id]
+
+    def get_proposals_in_voting(self, per_dao: int = 10, page_size: int = 1000) -> str:
+        """
+        Get the newest proposals in voting of every watched DAO, up to per_dao each
+        Args:
+            per_dao (int): Proposals to keep per DAO
+            page_size (int): Proposals of the shared dao_in query, the graph caps a page at 1000
+        Returns:
+            str: Proposals in voting, with the DAO address in proposals_dao_id
+        """
+        try:
+            # one dao_in query for all DAOs, cut to per_dao each
+            records = json.loads(query_proposals_in_voting(self.sg, self.dh_v3, {"dao_in": self.dao_ids}, first=page_size))
+            kept = self._newest_per_dao(records, per_dao)
+            if len({(r["proposals_dao_id"], r["proposals_proposalId"]) for r in records}) >= page_size:
+                # a full page can hide the proposals of quieter DAOs behind a busy one, query those alone
+                for dao_id in self.dao_ids:
+                    if len(kept.get(dao_id, [])) < per_dao:
+                        dao_records = json.loads(query_proposals_in_voting(self.sg, self.dh_v3, {"dao": dao_id}, first=per_dao))
+                        kept[dao_id] = self._newest_per_dao(dao_records, per_dao).get(dao_id, [])
+            return json.dumps([record for dao_records in kept.values() for record in dao_records])
+        except Exception as e:
+            return f"Error getting proposals data: {str(e)}"
+
+    @staticmethod
+    def _newest_per_dao(records: List[Dict], per_dao: int) -> Dict[str, List[Dict]]:
+        # records are newest first and one per vote, keep every vote row of the first per_dao proposals
+        kept: Dict[str, List[Dict]] = {}
+        proposals: Dict[str, set] = {}
+        for record in records:
+            dao_id = record["proposals_dao_id"]
+            seen = proposals.setdefault(dao_id, set())
+            if record["proposals_proposalId"] not in seen:
+                if len(seen) >= per_dao:
+                    continue
+                seen.add(record["proposals_proposalId"])
+            kept.setdefault(dao_id, []).append(record)
+        return kept
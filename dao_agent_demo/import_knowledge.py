@@ -1,71 +1,247 @@
 import os
+import json
+import hashlib
 import argparse
-from tinydb import TinyDB, Query
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from dao_agent_demo.storage_utils import open_backend
+from dao_agent_demo.knowledge_utils import (
+    KeywordIndex, BM25Index, index_dir, passage_id, split_passages, term_frequencies
+)
+from dao_agent_demo.vector_utils import HashingVectorizer, VectorIndex
+
+# below this many changed files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 32
 
 def extract_keywords(file_name):
     """
     Extract keywords from the filename by splitting on underscores and removing the file extension.
     """
-    base_name = os.path.splitext(file_name)[0]  # Remove file extension
+    base_name = os.path.splitext(os.path.basename(file_name))[0]  # Remove folders and file extension
     keywords = base_name.split('_')  # Split by underscores
     return keywords
 
-def import_markdown_files_to_db(directory, db_path):
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def find_markdown_files(directory: str) -> List[str]:
+    """
+    Get the Markdown files of a directory and its subdirectories, as posix paths relative to it.
+    """
+    file_names = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.md'):
+                file_names.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/"))
+    return file_names
+
+def read_document(directory: str, file_name: str, known_hash: Optional[str] = None) -> Dict:
     """
-    Import all Markdown files from a directory into TinyDB with keywords based on filenames.
-    Skip files that have already been imported.
+    Read, hash, tokenize and embed one Markdown file, runs in the import worker pool.
+
+    Args:
+        directory (str): The knowledge directory
+        file_name (str): Path of the file relative to the directory
+        known_hash (Optional[str]): Content hash of the imported version
+
+    Returns:
+        Dict: The knowledge record with its hash, term frequencies, passages and vectors,
+            or only file_name and content_hash when the content did not change
     """
-    db = TinyDB(db_path)
-    File = Query()
-
-    for file_name in os.listdir(directory):
-        if file_name.endswith('.md'):  # Process only Markdown files
-            file_path = os.path.join(directory, file_name)
-            
-            # Check if the file has already been imported
-            if db.contains(File.file_name == file_name):
-                print(f"Skipping already imported file: {file_name}")
-                continue
-            
-            # Read the file content
-            with open(file_path, 'r') as file:
-                content = file.read()
-            
-            # Extract keywords from filename
-            keywords = extract_keywords(file_name)
-            
-            # Create a record for the database
-            record = {
-                'file_name': file_name,
-                'content': content,
-                'keywords': keywords
-            }
-            
-            # Insert into the database
-            db.insert(record)
-            print(f"Imported: {file_name}")
-    
+    with open(os.path.join(directory, file_name), 'r') as file:
+        content = file.read()
+    digest = content_hash(content)
+    if digest == known_hash:
+        return {'file_name': file_name, 'content_hash': digest}
+    return {
+        'file_name': file_name,
+        'content': content,
+        'keywords': extract_keywords(file_name),
+        'content_hash': digest,
+        **analyze(content),
+    }
+
+def analyze(content: str) -> Dict:
+    """
+    Get the term frequencies, passages and vectors of a document.
+    """
+    passages = split_passages(content)
+    texts = [content[passage['start']:passage['end']] for passage in passages]
+    for passage, text in zip(passages, texts):
+        passage['terms'] = term_frequencies(text)
+    vectors = HashingVectorizer().transform([content] + texts)
+    return {'terms': term_frequencies(content), 'passages': passages, 'vector': vectors[0], 'passage_vectors': vectors[1:]}
+
+def _read_documents(args):
+    return [read_document(*arg) for arg in args]
+
+def load_manifest(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as manifest_file:
+        return json.load(manifest_file)
+
+def save_manifest(path: str, manifest: Dict[str, str]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(tmp_path, path)
+
+def import_markdown_files_to_db(directory, db_path, workers: Optional[int] = None, prune: bool = False):
+    """
+    Import all Markdown files from a directory and its subdirectories into the memory store,
+    with keywords based on filenames.
+
+    Files are compared by content hash with the last import (manifest.json next to the
+    indexes), only new and changed files are written and re-indexed. Files are read,
+    tokenized and embedded in a process pool, written to the store in one transaction and the search
+    indexes are updated in place.
+
+    Args:
+        directory (str): The knowledge directory
+        db_path (str): The memory store
+        workers (Optional[int]): Size of the worker pool, defaults to the cpu count
+        prune (bool): Also remove the knowledge of files that were deleted from the directory
+    """
+    db = open_backend(db_path)
+    indexes = index_dir(db.db_path)
+    os.makedirs(indexes, exist_ok=True)
+    manifest_path = os.path.join(indexes, "manifest.json")
+    first_import = not os.path.exists(manifest_path)
+    manifest = load_manifest(manifest_path)
+
+    file_names = find_markdown_files(directory)
+    tasks = [(directory, file_name, manifest.get(file_name)) for file_name in file_names]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= PARALLEL_THRESHOLD:
+        # batches keep the pickling overhead per file low
+        size = max(len(tasks) // (workers * 4), 1)
+        batches = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            documents = [document for batch in pool.map(_read_documents, batches) for document in batch]
+    else:
+        documents = _read_documents(tasks)
+    changed = [document for document in documents if 'content' in document]
+    print(f"Skipping {len(documents) - len(changed)} unchanged file(s).")
+
+    removed = []
+    if prune:
+        present = set(file_names)
+        removed = [file_name for file_name in manifest if file_name not in present]
+
+    # one transaction for the whole batch
+    db.insert_many([
+        {'file_name': document['file_name'], 'content': document['content'], 'keywords': document['keywords']}
+        for document in changed
+    ])
+    if removed:
+        db.delete_knowledge(removed)
+    for document in changed:
+        print(f"{'Updated' if document['file_name'] in manifest else 'Imported'}: {document['file_name']}")
+    for file_name in removed:
+        print(f"Removed: {file_name}")
+
+    # keyword index with precomputed inflections, full-text and vector indexes, persisted next to the store
+    # changed documents replace their entries in place
+    keyword_index = KeywordIndex.load(os.path.join(indexes, "keywords.json"))
+    text_index = BM25Index.load(os.path.join(indexes, "bm25.json"))
+    vector_index = VectorIndex.load(os.path.join(indexes, "knowledge"))
+    passage_text_index = BM25Index.load(os.path.join(indexes, "passages_bm25.json"))
+    passage_vectors = VectorIndex.load(os.path.join(indexes, "passages"))
+
+    def remove_passages(file_name):
+        position = 0
+        while passage_id(file_name, position) in passage_vectors:
+            passage_text_index.remove(passage_id(file_name, position))
+            passage_vectors.remove(passage_id(file_name, position))
+            position += 1
+
+    for file_name in removed:
+        keyword_index.remove(file_name)
+        text_index.remove(file_name)
+        vector_index.remove(file_name)
+        remove_passages(file_name)
+        manifest.pop(file_name)
+
+    # stores imported before the manifest existed may miss indexes, those are built from the store
+    indexed = {document['file_name'] for document in changed}
+    stale = [] if not first_import else [
+        record for record in db.knowledge()
+        if record['file_name'] not in indexed and not (
+            record['file_name'] in keyword_index and record['file_name'] in text_index
+            and record['file_name'] in vector_index and passage_id(record['file_name'], 0) in passage_vectors
+        )
+    ]
+    for record in stale:
+        changed.append({**record, **analyze(record['content'])})
+
+    passage_rows = []
+    for document in changed:
+        file_name, content = document['file_name'], document['content']
+        keyword_index.add(file_name, document['keywords'])
+        text_index.add(file_name, content, document['terms'])
+        remove_passages(file_name)
+        for position, passage in enumerate(document['passages']):
+            row = {"id": passage_id(file_name, position), "file_name": file_name,
+                   "heading": passage['heading'], "start": passage['start'], "end": passage['end']}
+            passage_text_index.add(row["id"], "", passage['terms'])
+            passage_rows.append(row)
+        if 'content_hash' in document:
+            manifest[file_name] = document['content_hash']
+    # embedded by the workers, appended in one batch each
+    if changed:
+        vector_index.add_vectors([{"id": document['file_name']} for document in changed],
+                                 np.stack([document['vector'] for document in changed]), persist=False)
+        passage_vectors.add_vectors(passage_rows, np.concatenate([document['passage_vectors'] for document in changed]),
+                                    persist=False)
+
+    if changed or removed:
+        keyword_index.save()
+        text_index.save()
+        vector_index.save()
+        passage_text_index.save()
+        passage_vectors.save()
+        save_manifest(manifest_path, manifest)
+    print(f"Keyword index: {len(keyword_index)} documents, {len(keyword_index.postings)} keyword forms.")
+    print(f"Full-text index: {len(text_index)} documents, {len(text_index.postings)} terms.")
+    print(f"Vector index: {len(vector_index)} documents, {vector_index.vectorizer.dim} dimensions.")
+    print(f"Passage index: {len(passage_vectors)} passages.")
+
     print(f"Import completed. All records are stored in {db_path}.")
 
 if __name__ == "__main__":
     # Set up argument parser
-    parser = argparse.ArgumentParser(description="Import Markdown files into TinyDB.")
+    parser = argparse.ArgumentParser(description="Import Markdown files into the memory store.")
     parser.add_argument(
-        '--directory', 
-        type=str, 
-        default='./knowledge', 
-        help="Directory containing Markdown files (default: './knowledge')"
+        '--directory',
+        type=str,
+        default='./knowledge',
+        help="Directory containing Markdown files, subdirectories included (default: './knowledge')"
     )
     parser.add_argument(
-        '--db_path', 
-        type=str, 
-        default='db.json', 
-        help="Path to the TinyDB database file (default: 'db.json')"
+        '--db_path',
+        type=str,
+        default=os.getenv("MEMORY_DB", "memory.db"),
+        help="Path to the memory store, SQLite or a TinyDB .json file (default: 'memory.db')"
     )
-    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="Worker processes reading and tokenizing files (default: cpu count)"
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help="Remove the knowledge of files deleted from the directory"
+    )
+
     # Parse arguments
     args = parser.parse_args()
-    
-    # Run the import function
-    import_markdown_files_to_db(args.directory, args.db_path)
 
+    # Run the import function
+    import_markdown_files_to_db(args.directory, args.db_path, args.workers, args.prune)
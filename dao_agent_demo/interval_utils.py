@@ -1,16 +1,97 @@
-import random
+import time
 
-# Define a global variable for the interval
-interval = 1800
+def parse_rate_limit_headers(headers, status_code: int = 200) -> dict:
+    """
+    Read upstream rate limit headers (Retry-After, X-RateLimit-Remaining, X-RateLimit-Reset).
 
-def set_interval(new_interval):
-    global interval
-    interval = new_interval
+    Args:
+        headers: The response headers
+        status_code (int): The response status code
 
-def get_interval():
-    global interval
-    return interval
+    Returns:
+        dict: retry_after and reset_in in seconds and remaining requests, when present
+    """
+    rate_limit = {}
+    try:
+        if headers.get("Retry-After"):
+            rate_limit["retry_after"] = float(headers["Retry-After"])
+        if headers.get("X-RateLimit-Remaining") is not None:
+            rate_limit["remaining"] = int(headers["X-RateLimit-Remaining"])
+        if headers.get("X-RateLimit-Reset"):
+            reset = float(headers["X-RateLimit-Reset"])
+            # some apis send an epoch timestamp, others the seconds left
+            rate_limit["reset_in"] = max(0.0, reset - time.time()) if reset > 1e9 else reset
+    except (TypeError, ValueError):
+        pass
+    if status_code == 429 and "retry_after" not in rate_limit:
+        rate_limit["retry_after"] = rate_limit.get("reset_in", 60.0)
+    return rate_limit
 
-def set_random_interval(min_value, max_value):
-    global interval
-    interval = random.randint(min_value, max_value)
\ No newline at end of file
+
+class AdaptiveInterval:
+    def __init__(self, floor: float, ceiling: float, initial: float = None, shrink: float = 0.5, backoff: float = 2.0, reserve: int = 5):
+        """
+        Poll interval that follows the observed activity of a source.
+
+        The interval shrinks toward floor while polls keep returning new items and backs
+        off exponentially toward ceiling while the source is idle. Upstream rate limit
+        headers always win: Retry-After is honored and the remaining quota is spread over
+        the time left until the limit resets.
+
+        Args:
+            floor (float): Shortest interval in seconds
+            ceiling (float): Longest interval in seconds
+            initial (float): Starting interval, defaults to the ceiling
+            shrink (float): Factor applied when new items arrived
+            backoff (float): Factor applied when a poll found nothing
+            reserve (int): Remaining requests below which the quota is rationed
+        """
+        self.floor = floor
+        self.ceiling = ceiling
+        self.shrink = shrink
+        self.backoff = backoff
+        self.reserve = reserve
+        self.interval = initial if initial is not None else ceiling
+        self.polls = 0
+        self.items = 0
+        self.rate_limited = 0
+
+    def observe(self, new_items: int, rate_limit: dict = None) -> float:
+        """
+        Record a poll result and get the next interval.
+
+        Args:
+            new_items (int): New items the poll returned
+            rate_limit (dict): Parsed rate limit headers of the poll, if any
+
+        Returns:
+            float: Seconds to wait before the next poll
+        """
+        self.polls += 1
+        self.items += new_items
+        if new_items:
+            self.interval = max(self.floor, self.interval * self.shrink)
+        else:
+            self.interval = min(self.ceiling, self.interval * self.backoff)
+
+        next_interval = self.interval
+        if rate_limit:
+            if "retry_after" in rate_limit:
+                next_interval = max(next_interval, rate_limit["retry_after"])
+                self.rate_limited += 1
+            elif rate_limit.get("remaining") is not None and rate_limit["remaining"] <= self.reserve:
+                next_interval = max(next_interval, rate_limit.get("reset_in", self.ceiling) / max(rate_limit["remaining"], 1))
+                self.rate_limited += 1
+        return next_interval
+
+    def metrics(self) -> dict:
+        """
+        Get the poll efficiency metrics of the source.
+        """
+        return {
+            "polls": self.polls,
+            "items": self.items,
+            "items_per_poll": self.items / self.polls if self.polls else 0.0,
+            "interval": self.interval,
+            "rate_limited": self.rate_limited,
+        }
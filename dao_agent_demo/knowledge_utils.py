@@ -0,0 +1,379 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import inflect
+
+_inflector = None
+_inflector_lock = threading.Lock()
+
+
+def get_inflector() -> inflect.engine:
+    """
+    Shared inflect engine, building one is expensive.
+    """
+    global _inflector
+    with _inflector_lock:
+        if _inflector is None:
+            _inflector = inflect.engine()
+    return _inflector
+
+
+def index_dir(db_path: str) -> str:
+    """
+    Directory the knowledge indexes are persisted in, next to the store.
+    """
+    return f"{db_path}.index"
+
+
+def normalize_keyword(keyword: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", str(keyword).lower())
+
+
+@lru_cache(maxsize=1 << 16)
+def keyword_forms(keyword: str) -> FrozenSet[str]:
+    """
+    Get the normalized singular and plural forms of a keyword, cached since inflecting is slow.
+    """
+    keyword = normalize_keyword(keyword)
+    if not keyword:
+        return frozenset()
+    inflector = get_inflector()
+    forms = {keyword}
+    if not keyword.isdigit():
+        forms.add(normalize_keyword(inflector.plural(keyword)))
+        singular = inflector.singular_noun(keyword)
+        if singular:
+            forms.add(normalize_keyword(singular))
+    return frozenset(forms)
+
+
+class KeywordIndex:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Inverted index from normalized keyword forms to knowledge file names.
+
+        The singular and plural forms of every document keyword are computed once at
+        import time, so a query is a handful of dict lookups instead of full scans and
+        inflections per keyword.
+
+        Args:
+            path (Optional[str]): The json file the index is persisted to
+        """
+        self.path = path
+        self.postings: Dict[str, Set[str]] = {}
+        self.forms_by_doc: Dict[str, List[str]] = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> "KeywordIndex":
+        """
+        Load a persisted index, an empty one if the file does not exist.
+        """
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r") as index_file:
+                forms_by_doc = json.load(index_file)
+            for doc_id, forms in forms_by_doc.items():
+                index._add_forms(doc_id, forms)
+        return index
+
+    def save(self):
+        """
+        Persist the index next to the store.
+        """
+        with self.lock:
+            data = json.dumps(self.forms_by_doc)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as index_file:
+            index_file.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.forms_by_doc)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.forms_by_doc
+
+    def _add_forms(self, doc_id: str, forms: Iterable[str]):
+        with self.lock:
+            self.forms_by_doc[doc_id] = sorted(set(forms))
+            for form in self.forms_by_doc[doc_id]:
+                self.postings.setdefault(form, set()).add(doc_id)
+
+    def add(self, doc_id: str, keywords: Iterable[str]):
+        """
+        Index a document's keywords, replacing what was indexed for it before.
+        """
+        forms = set()
+        for keyword in keywords:
+            forms |= keyword_forms(keyword)
+        with self.lock:
+            self.remove(doc_id)
+            self._add_forms(doc_id, forms)
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            for form in self.forms_by_doc.pop(doc_id, []):
+                docs = self.postings.get(form)
+                if docs:
+                    docs.discard(doc_id)
+                    if not docs:
+                        del self.postings[form]
+
+    def query(self, keywords: Iterable[str], match_all: bool = False) -> List[Tuple[str, float]]:
+        """
+        Find documents by keywords.
+
+        Args:
+            keywords (Iterable[str]): Query keywords, any form
+            match_all (bool): Only return documents matching every keyword (intersection)
+
+        Returns:
+            List[Tuple[str, float]]: (doc id, share of the query keywords matched), best first
+        """
+        keywords = [keyword for keyword in (normalize_keyword(k) for k in keywords) if keyword]
+        if not keywords:
+            return []
+        hits: Dict[str, int] = {}
+        with self.lock:
+            for keyword in set(keywords):
+                for doc_id in self.postings.get(keyword, ()):
+                    hits[doc_id] = hits.get(doc_id, 0) + 1
+        total = len(set(keywords))
+        results = [(doc_id, count / total) for doc_id, count in hits.items() if not match_all or count == total]
+        return sorted(results, key=lambda result: (-result[1], result[0]))
+
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from", "has", "have",
+    "how", "i", "if", "in", "into", "is", "it", "its", "me", "my", "of", "on", "or", "our", "so", "that", "the",
+    "their", "them", "then", "there", "these", "they", "this", "to", "was", "we", "were", "what", "when", "where",
+    "which", "who", "why", "will", "with", "you", "your",
+}
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower case search terms without stopwords.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Full-text index over knowledge content ranked with BM25.
+
+        Keeps a postings list (term -> {doc id: term frequency}) and document lengths, so
+        a query only touches the postings of its own terms. Documents are added and
+        replaced one at a time, the importer updates the index in place.
+
+        Args:
+            path (Optional[str]): The json file the index is persisted to
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Load a persisted index, an empty one if the file does not exist.
+        """
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r") as index_file:
+                data = json.load(index_file)
+            index.k1, index.b = data.get("k1", index.k1), data.get("b", index.b)
+            for doc_id, terms in data["docs"].items():
+                index._add_terms(doc_id, terms)
+        return index
+
+    def save(self):
+        """
+        Persist the index next to the store.
+        """
+        with self.lock:
+            data = json.dumps({"k1": self.k1, "b": self.b, "docs": self.doc_terms})
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as index_file:
+            index_file.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_terms
+
+    def _add_terms(self, doc_id: str, terms: Dict[str, int]):
+        with self.lock:
+            self.doc_terms[doc_id] = terms
+            self.doc_lengths[doc_id] = sum(terms.values())
+            self.total_length += self.doc_lengths[doc_id]
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def add(self, doc_id: str, text: str, terms: Optional[Dict[str, int]] = None):
+        """
+        Index a document, replacing what was indexed for it before.
+
+        Args:
+            doc_id (str): The document id
+            text (str): The document text
+            terms (Optional[Dict[str, int]]): Precomputed term frequencies of the text
+        """
+        if terms is None:
+            terms = term_frequencies(text)
+        with self.lock:
+            self.remove(doc_id)
+            self._add_terms(doc_id, terms)
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for term in terms:
+                docs = self.postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Rank documents for a query.
+
+        Args:
+            query (str): Free text query
+            k (int): Number of results
+
+        Returns:
+            List[Tuple[str, float]]: (doc id, BM25 score), best first
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            count = len(self.doc_terms)
+            if not count or not terms:
+                return []
+            average_length = self.total_length / count
+            scores: Dict[str, float] = {}
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, frequency in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """
+    Count the search terms of a text.
+    """
+    return dict(Counter(tokenize(text)))
+
+
+def excerpt(text: str, query: str, max_chars: int = 400) -> str:
+    """
+    Cut the part of a text around the first query term, bounded to max_chars.
+    """
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in tokenize(query)]
+    positions = [position for position in positions if position >= 0]
+    start = max(min(positions) - max_chars // 4, 0) if positions else 0
+    snippet = text[start:start + max_chars].strip()
+    return ("..." if start else "") + snippet + ("..." if start + max_chars < len(text) else "")
+
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+CHARS_PER_TOKEN = 4
+
+
+def char_budget(max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> int:
+    """
+    Get a character budget from a character and/or token budget (about 4 characters per token).
+    """
+    budgets = [budget for budget in (max_chars, max_tokens * CHARS_PER_TOKEN if max_tokens else None) if budget]
+    return min(budgets) if budgets else 4000
+
+
+def _split_span(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    # split a long section on paragraph, then line, then hard boundaries
+    spans = []
+    while end - start > max_chars:
+        cut = -1
+        for separator in ("\n\n", "\n", ". ", " "):
+            cut = text.rfind(separator, start + max_chars // 2, start + max_chars)
+            if cut != -1:
+                cut += len(separator)
+                break
+        if cut == -1:
+            cut = start + max_chars
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, end))
+    return spans
+
+
+def split_passages(text: str, max_chars: int = 1200) -> List[Dict]:
+    """
+    Split a markdown document into heading-aware passages.
+
+    Every passage belongs to one section and carries the heading path of that section
+    ("Launch > Fees"). Sections longer than max_chars are split on paragraph boundaries.
+
+    Args:
+        text (str): The markdown document
+        max_chars (int): Maximum passage length
+
+    Returns:
+        List[Dict]: {heading, start, end} per passage, text[start:end] is the passage
+    """
+    headings = list(HEADING_PATTERN.finditer(text))
+    sections = []
+    if not headings or headings[0].start() > 0:
+        sections.append(("", 0, headings[0].start() if headings else len(text)))
+    path: List[Tuple[int, str]] = []
+    for position, heading in enumerate(headings):
+        level = len(heading.group(1))
+        path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, heading.group(2))]
+        end = headings[position + 1].start() if position + 1 < len(headings) else len(text)
+        sections.append((" > ".join(title for _, title in path), heading.start(), end))
+
+    passages = []
+    for heading, start, end in sections:
+        for span_start, span_end in _split_span(text, start, end, max_chars):
+            # leading and trailing blank space is not part of the passage
+            stripped = text[span_start:span_end]
+            if not HEADING_PATTERN.sub("", stripped).strip():
+                continue  # blank or a bare heading
+            span_start += len(stripped) - len(stripped.lstrip())
+            span_end -= len(stripped) - len(stripped.rstrip())
+            passages.append({"heading": heading, "start": span_start, "end": span_end})
+    return passages
+
+
+def passage_id(file_name: str, position: int) -> str:
+    return f"{file_name}#{position}"
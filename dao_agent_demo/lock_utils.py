@@ -0,0 +1,43 @@
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on windows, locks are then only held between threads
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, path: str):
+        """
+        Exclusive lock shared by threads and processes, an flock on a side file.
+
+        Reentrant within a thread, so a locked method can call another locked method.
+
+        Args:
+            path (str): The lock file, created if missing
+        """
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.handle = None
+
+    def __enter__(self) -> "FileLock":
+        self.thread_lock.acquire()
+        try:
+            if self.depth == 0 and fcntl is not None:
+                self.handle = open(self.path, "a")
+                fcntl.flock(self.handle, fcntl.LOCK_EX)
+        except Exception:
+            self.thread_lock.release()
+            raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.depth -= 1
+        if self.depth == 0 and self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+        self.thread_lock.release()
+        return False
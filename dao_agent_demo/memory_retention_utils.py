@@ -1,44 +1,264 @@
 import os
+import threading
 
-from time import sleep
+import numpy as np
+
+from time import monotonic, sleep
 from typing import List, Dict, Optional
 import requests
 import uuid
-import inflect
-from tinydb import TinyDB, Query
 
 from dotenv import load_dotenv
 from datetime import datetime
 
+from dao_agent_demo.storage_utils import MemoryBackend, WriteBehindBackend, open_backend, record_kind
+from dao_agent_demo.knowledge_utils import (
+    KeywordIndex, BM25Index, char_budget, excerpt, get_inflector, index_dir, split_passages
+)
+from dao_agent_demo.vector_utils import VectorIndex
+
 load_dotenv()
 
+# memories are rated 1 (trivia) to 5 (critical)
+DEFAULT_IMPORTANCE = 3
+# mirrored into arrays by the memory vector index, recall ranks by them
+MEMORY_FIELDS = {"ts": 0.0, "importance": DEFAULT_IMPORTANCE}
+
+# notifications older than this are never fetched again (see tools.check_all_unacted_cast_notifications)
+NOTIFICATION_LOOKBACK = 86400
+# seconds each record type is kept after it was recorded, None keeps it forever
+# acted notifications only have to outlive the lookback window, twice that leaves a margin
+RETENTION = {
+    "notification": 2 * NOTIFICATION_LOOKBACK,
+    "proposal": 90 * 86400,
+    "memory": None,
+    "knowledge": None,
+}
+
+
+def memory_text(memory: Dict) -> str:
+    """
+    Get the text of a memory that is embedded for recall.
+    """
+    content = memory.get("content")
+    if isinstance(content, str):
+        return content
+    return " ".join(f"{key} {value}" for key, value in memory.items() if key not in ("id", "type"))
+
+
+def parse_timestamp(timestamp) -> float:
+    """
+    Get the epoch seconds of an iso timestamp, 0 when it is missing or invalid.
+    """
+    try:
+        return datetime.fromisoformat(str(timestamp).replace("Z", "")).timestamp() if timestamp else 0.0
+    except ValueError:
+        return 0.0
+
+
+def memory_row(memory: Dict, memory_id: str) -> Dict:
+    """
+    Get the vector index row of a memory, with what recall ranks it by.
+    """
+    return {
+        "id": memory_id,
+        "type": memory.get("type"),
+        "content": memory_text(memory),
+        "ts": parse_timestamp(memory.get("timestamp")),
+        "importance": memory.get("importance", DEFAULT_IMPORTANCE),
+    }
+
+
+def format_memory(item: Dict) -> str:
+    """
+    Format a recalled memory on one line.
+    """
+    date = f", {item['timestamp'][:10]}" if item.get("timestamp") else ""
+    return f"- [{item['type']}{date}] {item['content']} (score {item['score']:.2f})"
+
+
+def format_passage(passage: Dict) -> str:
+    """
+    Format a knowledge passage with its source reference.
+    """
+    heading = f" > {passage['heading']}" if passage['heading'] else ""
+    return f"[{passage['file_name']}{heading}, chars {passage['start']}-{passage['end']}]\n{passage['text']}\n"
+
+
+def fuse_rankings(rankings: List[List[str]], k: int, offset: int = 60) -> List[tuple]:
+    """
+    Merge several rankings of doc ids with reciprocal rank fusion.
+
+    Returns:
+        List[tuple]: (doc id, fused score), best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (offset + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
 class MemoryRetention:
-    def __init__(self):
-        """Initialize local json store"""
+    def __init__(
+        self,
+        backend: Optional[MemoryBackend] = None,
+        default_dao: Optional[str] = None,
+        retention: Optional[Dict[str, Optional[float]]] = None,
+        write_behind: Optional[bool] = None,
+        shared: Optional[bool] = None,
+    ):
+        """
+        Initialize the local store
+
+        Acted notification hashes and (dao, proposal id) pairs are kept in hash sets
+        loaded from the store at startup and updated on every mark, so "was this acted
+        on" is O(1) no matter how much history the store holds.
+
+        Memories and knowledge are also embedded into local hashed n-gram vectors
+        (see vector_utils), so recall returns the few most similar records instead of
+        the whole store. New memories are appended to the vector index as they are
+        committed.
+
+        Acted records expire per record type (see RETENTION) and a background job
+        (start_maintenance) expires them and compacts the store, so storage and the acted
+        sets stay bounded in a long running deployment.
+
+        Memories and acted marks go through a write-behind buffer (see
+        storage_utils.WriteBehindBackend): a tool call only appends to an in-memory
+        overlay that reads already see, batches are written in one fsynced transaction
+        and the buffer is flushed at exit.
+
+        Several processes (operators, simulation players, the autonomous loop) can share
+        the store: TinyDB files and the vector indexes are guarded by file locks
+        (lock_utils.FileLock) and SQLite by its own locking. When shared, acted marks are
+        written through instead of buffered, so mark_*_as_acted is an atomic claim that
+        exactly one process wins, and is_*_acted asks the store when the local set misses.
+
+        Args:
+            backend (Optional[MemoryBackend]): The storage backend, defaults to
+                open_backend() (SQLite memory.db, or TinyDB when MEMORY_DB ends in .json)
+            default_dao (Optional[str]): DAO of acted proposals recorded without one
+            retention (Optional[Dict[str, Optional[float]]]): Overrides of RETENTION
+            write_behind (Optional[bool]): Buffer writes, defaults to MEMORY_WRITE_BEHIND (on)
+            shared (Optional[bool]): Other processes use the store too, defaults to MEMORY_SHARED (on)
+        """
         print("initializing memory retention")
         # init local db
         print("Initializing local database...")
-        self.db = TinyDB('db.json')
+        self.backend = backend or open_backend()
+        if write_behind is None:
+            write_behind = os.getenv("MEMORY_WRITE_BEHIND", "1") != "0"
+        if shared is None:
+            shared = os.getenv("MEMORY_SHARED", "1") != "0"
+        self.shared = shared
+        if write_behind:
+            # claims are decided by the store when other processes compete for them
+            # memory vectors reach the index files with their records, never before
+            self.backend = WriteBehindBackend(self.backend, buffer_claims=not shared, on_flush=self._persist_memory_vectors)
+        self.default_dao = default_dao.lower() if default_dao else None
+        self.retention = {**RETENTION, **(retention or {})}
+        self.maintenance_stats = {"runs": 0, "expired": 0, "compactions": 0, "last_run": None}
+        # row counts and sizes of the store, (computed at, stats), see metrics
+        self.store_stats = (0.0, None)
+        self.maintenance_stop = threading.Event()
+        self.maintenance_thread: Optional[threading.Thread] = None
+        self.index_lock = threading.Lock()
+        self.load_acted_indexes()
+        self.keyword_index = KeywordIndex.load(os.path.join(index_dir(self.backend.db_path), "keywords.json"))
+        self.text_index = BM25Index.load(os.path.join(index_dir(self.backend.db_path), "bm25.json"))
+        self.knowledge_vectors = VectorIndex.load(os.path.join(index_dir(self.backend.db_path), "knowledge"))
+        # heading-aware passages of the knowledge documents, built by import_knowledge
+        self.passage_text_index = BM25Index.load(os.path.join(index_dir(self.backend.db_path), "passages_bm25.json"))
+        self.passage_vectors = VectorIndex.load(os.path.join(index_dir(self.backend.db_path), "passages"))
+        self.memory_vectors = VectorIndex.load(os.path.join(index_dir(self.backend.db_path), "memories"), fields=MEMORY_FIELDS)
+        if not len(self.memory_vectors):
+            self.rebuild_memory_vectors()
+
+    def rebuild_memory_vectors(self):
+        """
+        (Re)build the memory vector index from the store.
+        """
+        memories = self.backend.memories()
+        self.memory_vectors = VectorIndex(self.memory_vectors.path, self.memory_vectors.vectorizer, MEMORY_FIELDS)
+        rows = [memory_row(memory, memory.get("id") or f"stored-{position}") for position, memory in enumerate(memories)]
+        self.memory_vectors.add_many(rows, [row["content"] for row in rows], persist=False)
+        self.memory_vectors.save()
+
+    def _persist_memory_vectors(self, batch: List[Dict]):
+        """
+        Append the vectors of a flushed batch of memories to the index files, they were
+        embedded and added in memory by store_memory.
+        """
+        self.memory_vectors.persist([record["id"] for record in batch if record_kind(record) == "memory" and record.get("id")])
 
-    def mark_proposal_as_acted(self, proposal_id: int, actor: str) -> bool:
+    def _proposal_key(self, proposal_id, dao_address: Optional[str]) -> tuple:
+        return ((dao_address or self.default_dao or "").lower(), str(proposal_id))
+
+    def load_acted_indexes(self):
+        """
+        (Re)build the acted hash sets from the store.
+        """
+        notification_hashes = {record['hash'] for record in self.backend.acted_notifications()}
+        proposal_keys = {
+            self._proposal_key(record['proposal_id'], record.get('dao_address'))
+            for record in self.backend.acted_proposals()
+        }
+        with self.index_lock:
+            self.acted_notification_hashes = notification_hashes
+            self.acted_proposal_keys = proposal_keys
+
+    def is_notification_acted(self, notification_hash: str) -> bool:
+        """
+        Check if a notification was acted on, O(1), plus a store lookup when shared.
+        """
+        if notification_hash in self.acted_notification_hashes:
+            return True
+        if not self.shared or not self.backend.is_acted_notification(notification_hash):
+            return False
+        # marked by another process
+        with self.index_lock:
+            self.acted_notification_hashes.add(notification_hash)
+        return True
+
+    def is_proposal_acted(self, proposal_id, dao_address: Optional[str] = None) -> bool:
+        """
+        Check if a proposal was acted on, O(1), plus a store lookup when shared.
+        """
+        key = self._proposal_key(proposal_id, dao_address)
+        if key in self.acted_proposal_keys:
+            return True
+        if not self.shared or not self.backend.is_acted_proposal(proposal_id, key[0] or None):
+            return False
+        with self.index_lock:
+            self.acted_proposal_keys.add(key)
+        return True
+
+    def mark_proposal_as_acted(self, proposal_id: int, actor: str, dao_address: Optional[str] = None) -> bool:
         """
         Mark a proposal as acted upon.
         
         Args:
             proposal_id (int): The ID of the proposal to mark.
             actor (str): The actor that acted on the proposal.
+            dao_address (Optional[str]): The DAO of the proposal, ids are only unique per DAO.
             
         Returns:
-            bool: True if successfully marked, False otherwise.
+            bool: True if successfully marked, False if it already was (by any process
+                sharing the store) or on error.
         """
+        key = self._proposal_key(proposal_id, dao_address)
+        if key in self.acted_proposal_keys:
+            return False
         try:
-            # check if proposal is already marked
-            if self.db.search(Query().proposal_id == proposal_id):
-                return False
-            self.db.insert({'record_type': 'action', 'context': 'proposal', 'proposal_id': proposal_id, 'actor': actor, 'timestamp': datetime.utcnow().isoformat()})
-            return True
+            # check-and-insert is atomic in the backend
+            inserted = self.backend.insert_acted_proposal(proposal_id, key[0] or None, actor, datetime.utcnow().isoformat())
         except Exception as e:
             return False
+        # recorded either way now, by this call or another writer
+        with self.index_lock:
+            self.acted_proposal_keys.add(key)
+        return inserted
 
     def mark_notification_as_acted(self, notification_hash: str) -> bool:
         """
@@ -48,17 +268,20 @@ class MemoryRetention:
             notification_hash (str): The hash of the notification to mark.
             
         Returns:
-            bool: True if successfully marked, False otherwise.
+            bool: True if successfully marked, False if it already was (by any process
+                sharing the store) or on error.
         """
+        if notification_hash in self.acted_notification_hashes:
+            print("already marked as acted")
+            return False
         try:
-            # Check if the notification is already marked
-            if self.db.search(Query().hash == notification_hash):
+            # check-and-insert is atomic in the backend
+            inserted = self.backend.insert_acted_notification(notification_hash, datetime.utcnow().isoformat())
+            with self.index_lock:
+                self.acted_notification_hashes.add(notification_hash)
+            if not inserted:
                 print("already marked as acted")
-                return False
-
-            # Add the hash to the database
-            self.db.insert({'record_type': 'action', 'context': 'notification', 'hash': notification_hash, 'timestamp': datetime.utcnow().isoformat()})
-            return True
+            return inserted
         except Exception as e:
             print(f"Error marking notification as acted: {str(e)}")
             return False
@@ -74,41 +297,272 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            self.db.insert(memory)
+            memory = {"id": uuid.uuid4().hex, "timestamp": datetime.utcnow().isoformat(), **memory}
+            self.backend.insert(memory)
+            # appended to the vector index, no rebuild
+            # with write-behind only in memory until the record is flushed (see _persist_memory_vectors),
+            # so a crash cannot leave index rows without a record
+            row = memory_row(memory, memory["id"])
+            self.memory_vectors.add(row, row["content"], persist=not isinstance(self.backend, WriteBehindBackend))
             return "Successfully stored memory"
         except Exception as e:
             return f"Error storing memory: {str(e)}"
     
-    def query_by_keywords(self, keywords: list[str]) -> str:
+    def query_by_keywords(self, keywords: list[str], match_all: bool = False, max_chars: int = 4000) -> str:
         """
-        Query the TinyDB database for records containing a specific keyword.
-        """
-        db = self.db
-        File = Query()
-        inflector = inflect.engine()
+        Query the knowledge records containing a specific keyword.
+
+        Args:
+            keywords (list[str]): The keywords, singular or plural
+            match_all (bool): Only return records matching every keyword
+            max_chars (int): Budget of the content previews, shared by the records
 
-        # Search for records where the 'keywords' field contains the specified keyword
-        # Aggregate results for all keywords
-        results = []
-        for keyword in keywords:
-            plural = inflector.plural(keyword)
-            singular_matches = db.search(File.keywords.any(keyword.lower()))
-            plural_matches = db.search(File.keywords.any(plural.lower()))
-            results.extend(singular_matches + plural_matches)
+        Returns:
+            str: The matching records, best match first
+        """
+        if len(self.keyword_index):
+            # inverted index built by import_knowledge, inflections are precomputed
+            ranked = [file_name for file_name, score in self.keyword_index.query(keywords, match_all)]
+            # at least 200 characters per preview, the records past the budget are only counted
+            records = {record['file_name']: record for record in self.backend.knowledge(ranked[:max(max_chars // 200, 1)])}
+            skipped = max(len(ranked) - len(records), 0)
+            results = [records[file_name] for file_name in ranked if file_name in records]
+        else:
+            # stores imported before the index existed
+            inflector = get_inflector()
+            results = []
+            for keyword in keywords:
+                plural = inflector.plural(keyword)
+                results.extend(self.backend.search_knowledge([keyword.lower(), plural.lower()]))
+            skipped = 0
 
         # Remove duplicates (optional, in case multiple keywords match the same record)
-        unique_results = {record['file_name']: record for record in results}.values()
+        unique_results = list({record['file_name']: record for record in results}.values())
+        skipped += max(len(unique_results) - max(max_chars // 200, 1), 0)
+        unique_results = unique_results[:max(max_chars // 200, 1)]
         response = ""
         if unique_results:
-            print(f"Found {len(unique_results)} record(s) with keyword '{keywords}':")
+            print(f"Found {len(unique_results) + skipped} record(s) with keyword '{keywords}':")
+            share = max(max_chars // len(unique_results), 200)
             
             for record in unique_results:
                 res_file_name = f"File Name: {record['file_name']}"
                 res_keywords = f"Keywords: {record['keywords']}"
-                res_content = f"Content Preview: {record['content']}\n"
+                res_content = f"Content Preview: {self._preview(record['content'], share)}\n"
                 response += res_file_name + res_keywords + res_content + "\n"
+            if skipped:
+                response += f"... and {skipped} more record(s), use more specific keywords or search_knowledge.\n"
+        else:
+            response = f"No records found with keyword '{keywords}'."
+        return response
+
+    def _preview(self, content: str, max_chars: int) -> str:
+        # the leading passages that fit, cut at a passage boundary unless that wastes half the budget
+        if len(content) <= max_chars:
+            return content
+        ends = [passage['end'] for passage in split_passages(content) if passage['end'] <= max_chars]
+        cut = max(ends) if ends and max(ends) >= max_chars // 2 else max_chars
+        return f"{content[:cut]} ... (chars 0-{cut} of {len(content)})"
+
+    def search_passages(
+        self, query: str, k: int = 8, max_chars: Optional[int] = None, max_tokens: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Get the knowledge passages most relevant to a query, within a size budget.
+
+        Passages are ranked by BM25 fused with vector similarity and added best first
+        until the formatted output would exceed the budget, the last one is cut to fit.
+
+        Args:
+            query (str): Free text query
+            k (int): Maximum number of passages
+            max_chars (Optional[int]): Character budget of the formatted passages
+            max_tokens (Optional[int]): Token budget, about 4 characters per token
+
+        Returns:
+            List[Dict]: {file_name, heading, start, end, text, score} per passage, best first
+        """
+        budget = char_budget(max_chars, max_tokens)
+        ranked = fuse_rankings([
+            [doc_id for doc_id, _ in self.passage_text_index.search(query, 2 * k)],
+            [row["id"] for row, _ in self.passage_vectors.search(query, 2 * k)],
+        ], k)
+        rows = [(self.passage_vectors.get(doc_id), score) for doc_id, score in ranked]
+        rows = [(row, score) for row, score in rows if row is not None]
+        records = {record['file_name']: record for record in self.backend.knowledge(list({row['file_name'] for row, _ in rows}))}
+
+        passages, used = [], 0
+        for row, score in rows:
+            if row['file_name'] not in records:
+                continue
+            content = records[row['file_name']]['content']
+            passage = {**row, "text": content[row['start']:row['end']], "score": score}
+            passage.pop("id", None)
+            # one separator line between passages
+            size = len(format_passage(passage)) + 1
+            if used + size > budget:
+                room = budget - used - (size - len(passage['text'])) - len(" ...")
+                if room < 200:
+                    break
+                passage['text'] = passage['text'][:room].rstrip() + " ..."
+                passage['end'] = passage['start'] + room
+                size = len(format_passage(passage)) + 1
+            passages.append(passage)
+            used += size
+        return passages
+
+    def _rank_memories(self, query: str, record_type: Optional[str], half_life_days: float, need: int) -> tuple:
+        # similarity, recency and importance over the memory index arrays, only the top need are sorted
+        index = self.memory_vectors
+        index.refresh()  # memories committed by other processes
+        with index.lock:
+            rows, similarities = index.similarities(query) if query else (index.rows[:index.size], None)
+            live = index.alive[:index.size].copy()
+            timestamps = index.columns["ts"][:index.size]
+            importance = np.clip(index.columns["importance"][:index.size], 1, 5) / 5
+        if record_type:
+            live &= np.fromiter((row is not None and row["type"] == record_type for row in rows), bool, len(rows))
+        if similarities is not None:
+            live &= similarities > 0  # nothing in common with the query
+        positions = np.flatnonzero(live)
+        if not len(positions):
+            return [], 0
+        age_days = np.maximum(datetime.utcnow().timestamp() - timestamps[positions], 0) / 86400
+        recency = np.where(timestamps[positions] > 0, 0.5 ** (age_days / half_life_days), 0.0)
+        if similarities is not None:
+            # relevance first, recency and importance only reorder the relevant memories
+            scores = similarities[positions] * (0.6 + 0.25 * recency + 0.15 * importance[positions])
+        else:
+            scores = 0.6 * recency + 0.4 * importance[positions]
+        if need < len(positions):
+            top = np.argpartition(-scores, need - 1)[:need]
+        else:
+            top = np.arange(len(positions))
+        # ties keep the insertion order
+        top = top[np.lexsort((positions[top], -scores[top]))]
+        return [(rows[positions[i]], float(scores[i])) for i in top], len(positions)
+
+    def _rank_acted(self, record_type: str) -> tuple:
+        records = self.backend.acted_notifications() if record_type == "notification" else self.backend.acted_proposals()
+        ranked = sorted(records, key=lambda record: str(record.get("timestamp", "")), reverse=True)
+        return [({
+            "type": record_type,
+            "content": f"acted on notification {record['hash']}" if record_type == "notification"
+            else f"{record.get('actor')} acted on proposal {record.get('dao_address') or self.default_dao}:{record['proposal_id']}",
+            "ts": parse_timestamp(record.get("timestamp")),
+        }, 0.0) for record in ranked], len(ranked)
+
+    def recall(
+        self,
+        query: str = "",
+        record_type: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        max_chars: int = 2000,
+        half_life_days: float = 7,
+    ) -> Dict:
+        """
+        Ranked, paginated recall of memories.
+
+        Memories are scored by similarity to the query (when there is one), weighted by
+        recency (halved every half_life_days) and importance (1 to 5), acted notifications
+        and proposals are ranked by recency only. A page holds up to limit items and stops early when the formatted
+        items would exceed max_chars, next_cursor continues right after the last item.
+
+        Args:
+            query (str): What to recall, empty to get the most recent and important memories
+            record_type (Optional[str]): Only this memory type (ex: memory), or notification
+                / proposal for the acted bookkeeping
+            limit (int): Maximum items per page
+            cursor (Optional[str]): next_cursor of the previous page
+            max_chars (int): Size budget of a page
+            half_life_days (float): Age in days at which recency counts half
+
+        Returns:
+            Dict: {items: [{type, content, timestamp, score}], total, next_cursor (None on the last page)}
+        """
+        try:
+            offset = max(int(cursor), 0) if cursor else 0
+        except ValueError:
+            offset = 0
+        if record_type in ("notification", "proposal"):
+            ranked, total = self._rank_acted(record_type)
         else:
-            response = f"No records found with keyword '{keyword}'."
+            ranked, total = self._rank_memories(query, record_type or None, half_life_days, offset + max(limit, 1))
+
+        items, used, position = [], 0, offset
+        for row, score in ranked[offset:offset + max(limit, 1)]:
+            item = {
+                "type": row["type"],
+                "content": row["content"],
+                "timestamp": datetime.utcfromtimestamp(row["ts"]).isoformat() if row.get("ts") else None,
+                "score": round(score, 3),
+            }
+            size = len(format_memory(item))
+            if items and used + size > max_chars:
+                break
+            if size > max_chars:
+                item["content"] = item["content"][:max(max_chars - (size - len(item["content"])) - 4, 0)] + " ..."
+                size = len(format_memory(item))
+            items.append(item)
+            used += size
+            position += 1
+        return {
+            "items": items,
+            "total": total,
+            "next_cursor": str(position) if position < total else None,
+        }
+
+    def recall_memories(
+        self, query: str = "", record_type: Optional[str] = None, limit: int = 10, cursor: Optional[str] = None,
+        max_chars: int = 2000,
+    ) -> str:
+        """
+        Formatted page of recall(), see there for the arguments.
+
+        Returns:
+            str: The memories of the page, best first, and the cursor of the next page
+        """
+        page = self.recall(query, record_type, limit, cursor, max_chars)
+        if not page["items"]:
+            return f"No memories found for '{query}'." if query else "No memories found."
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        response = "\n".join(format_memory(item) for item in page["items"])
+        response += f"\n(items {offset + 1}-{offset + len(page['items'])} of {page['total']}"
+        if page["next_cursor"]:
+            response += f", next cursor: {page['next_cursor']}"
+        return response + ")"
+
+    def search_knowledge(self, query: str, k: int = 5, max_chars: int = 3000) -> str:
+        """
+        Search over the knowledge content, BM25 full-text ranking fused with vector
+        similarity so related wording is found without exact term hits.
+
+        Args:
+            query (str): Free text query
+            k (int): Number of results
+            max_chars (int): Size budget of the response
+
+        Returns:
+            str: The best matching passages with their source, or records with an excerpt
+                each for stores imported before passages existed
+        """
+        if len(self.passage_vectors):
+            passages = self.search_passages(query, k, max_chars)
+            if not passages:
+                return f"No knowledge found for '{query}'."
+            return "\n".join(format_passage(passage) for passage in passages)
+        ranked = fuse_rankings([
+            [doc_id for doc_id, _ in self.text_index.search(query, 2 * k)],
+            [row["id"] for row, _ in self.knowledge_vectors.search(query, 2 * k)],
+        ], k)
+        if not ranked:
+            return f"No knowledge found for '{query}'."
+        records = {record['file_name']: record for record in self.backend.knowledge([doc_id for doc_id, _ in ranked])}
+        response = ""
+        for file_name, score in ranked:
+            if file_name in records:
+                response += f"File Name: {file_name} (score {score:.2f})\nExcerpt: {excerpt(records[file_name]['content'], query)}\n\n"
         return response
 
     def get_acted_notifications(self) -> List:
@@ -119,9 +573,7 @@ class MemoryRetention:
             List: List of acted notifications
         """
         try:
-            query = Query()
-            acted_notifications = self.db.search(query.hash.exists())
-            return acted_notifications
+            return self.backend.acted_notifications()
         except Exception as e:
             return f"Error getting memories: {str(e)}"
         
@@ -132,9 +584,7 @@ class MemoryRetention:
         Returns:
             List: List of acted proposals
         """
-        query = Query()
-        acted_proposals = self.db.search(query.proposal_id.exists())
-        return acted_proposals
+        return self.backend.acted_proposals()
     
     def get_all_memories(self) -> List:
         """
@@ -144,7 +594,7 @@ class MemoryRetention:
             List: List of memories
         """
         try:
-            memories = self.db.all()
+            memories = self.backend.all()
             return memories
         except Exception as e:
             return f"Error getting memories: {str(e)}"
@@ -160,8 +610,7 @@ class MemoryRetention:
             List: List of memories
         """
         try:
-            Memory = Query()
-            memories = self.db.search(Memory.type == query["type"])
+            memories = self.backend.memories(query["type"])
             return memories
         except Exception as e:
             return f"Error getting memories: {str(e)}"
@@ -177,8 +626,8 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            Memory = Query()
-            self.db.remove(Memory.type == query["type"])
+            self.backend.delete_memories(query["type"])
+            self.rebuild_memory_vectors()
             return "Successfully deleted memory"
         except Exception as e:
             return f"Error deleting memory: {str(e)}"
@@ -195,8 +644,8 @@ class MemoryRetention:
             str: Status message about the memory
         """
         try:
-            Memory = Query()
-            self.db.update(memory, Memory.type == query["type"])
+            self.backend.update_memories(query["type"], memory)
+            self.rebuild_memory_vectors()
             return "Successfully updated memory"
         except Exception as e:
             return f"Error updating memory: {str(e)}"
@@ -209,7 +658,9 @@ class MemoryRetention:
             str: Status message about the action
         """
         try:
-            self.db.truncate()
+            self.backend.truncate()
+            self.load_acted_indexes()
+            self.rebuild_memory_vectors()
             return "Successfully cleared memories"
         except Exception as e:
             return f"Error clearing memories: {str(e)}"
@@ -222,9 +673,149 @@ class MemoryRetention:
             str: The count of memories
         """
         try:
-            count = len(self.get_all_memories())
-            return count
+            # one row per memory in the vector index, no scan of the store
+            self.memory_vectors.refresh()
+            return len(self.memory_vectors)
         except Exception as e:
             return f"Error getting memory count: {str(e)}"
 
         
+
+    def flush(self) -> int:
+        """
+        Write the buffered memories and acted marks now.
+
+        Returns:
+            int: The number of records written
+        """
+        if isinstance(self.backend, WriteBehindBackend):
+            return self.backend.flush()
+        return 0
+
+    def close(self):
+        """
+        Stop the maintenance and flush the write buffer.
+        """
+        self.stop_maintenance()
+        if isinstance(self.backend, WriteBehindBackend):
+            self.backend.close()
+
+    def apply_retention(self) -> Dict[str, int]:
+        """
+        Delete the acted records that outlived their retention.
+
+        Returns:
+            Dict[str, int]: The number of expired records per record type
+        """
+        now = datetime.utcnow().timestamp()
+        expired = {}
+        for record_type in ("notification", "proposal"):
+            ttl = self.retention.get(record_type)
+            if ttl is None:
+                continue
+            cutoff = datetime.utcfromtimestamp(now - ttl).isoformat()
+            # the keys leave the acted sets too, without a reload that could drop concurrent marks
+            if record_type == "notification":
+                keys = [r['hash'] for r in self.backend.acted_notifications() if str(r.get('timestamp', '')) < cutoff]
+            else:
+                keys = [
+                    self._proposal_key(r['proposal_id'], r.get('dao_address'))
+                    for r in self.backend.acted_proposals() if str(r.get('timestamp', '')) < cutoff
+                ]
+            expired[record_type] = self.backend.expire(record_type, cutoff)
+            with self.index_lock:
+                if record_type == "notification":
+                    self.acted_notification_hashes.difference_update(keys)
+                else:
+                    self.acted_proposal_keys.difference_update(keys)
+        return expired
+
+    def compact(self) -> bool:
+        """
+        Reclaim the space of deleted records in the store and the memory vector files.
+
+        Returns:
+            bool: True if the store file was rewritten
+        """
+        if len(self.memory_vectors) < self.memory_vectors.size:
+            self.flush()  # the rewrite holds the memories in memory, their records go first
+            self.memory_vectors.save()
+        return self.backend.compact()
+
+    def run_maintenance(self) -> Dict[str, int]:
+        """
+        Apply the retention policies and compact the store once.
+        """
+        expired = self.apply_retention()
+        compacted = self.compact()
+        self.maintenance_stats["runs"] += 1
+        self.maintenance_stats["expired"] += sum(expired.values())
+        self.maintenance_stats["compactions"] += int(compacted)
+        self.maintenance_stats["last_run"] = datetime.utcnow().isoformat()
+        self.store_stats = (0.0, None)  # sizes changed, recount on the next report
+        return expired
+
+    def start_maintenance(self, interval: float = 3600):
+        """
+        Run the maintenance every interval seconds in a background thread.
+        """
+        def loop():
+            while not self.maintenance_stop.is_set():
+                try:
+                    expired = self.run_maintenance()
+                    if any(expired.values()):
+                        print(f"\033[90mmemory retention expired {expired}\033[0m")
+                except Exception as e:
+                    print(f"\033[91mError in memory maintenance: {str(e)}\033[0m")
+                self.maintenance_stop.wait(interval)
+
+        self.maintenance_stop.clear()
+        self.maintenance_thread = threading.Thread(target=loop, name="memory-maintenance", daemon=True)
+        self.maintenance_thread.start()
+
+    def stop_maintenance(self):
+        self.maintenance_stop.set()
+
+    def metrics(self, max_age: float = 60.0) -> Dict:
+        """
+        Get the row count per record type, the size of the store and its indexes in bytes
+        and the maintenance counters.
+
+        Counting rows and sizing the files costs a scan, so they are recomputed at most
+        every max_age seconds (and after each maintenance run), the counters are live.
+
+        Args:
+            max_age (float): Seconds the row counts and sizes may be old
+        """
+        computed_at, stats = self.store_stats
+        if stats is None or monotonic() - computed_at > max_age:
+            stats = self.backend.stats()
+            indexes = index_dir(self.backend.db_path)
+            stats["index_bytes"] = sum(
+                os.path.getsize(os.path.join(indexes, name)) for name in os.listdir(indexes)
+            ) if os.path.isdir(indexes) else 0
+            self.store_stats = (monotonic(), stats)
+        if isinstance(self.backend, WriteBehindBackend):
+            stats = {**stats, "write_behind": self.backend.buffer_stats()}
+        return {
+            **stats,
+            "acted_in_memory": len(self.acted_notification_hashes) + len(self.acted_proposal_keys),
+            **self.maintenance_stats,
+        }
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the store.
+        """
+        m = self.metrics()
+        rows = ", ".join(f"{count} {record_type}" for record_type, count in m["rows"].items())
+        report = (
+            f"memory store: {rows}, {m['bytes'] / 1e6:.1f} MB + {m['index_bytes'] / 1e6:.1f} MB indexes, "
+            f"{m['expired']} expired in {m['runs']} maintenance runs"
+        )
+        if "write_behind" in m:
+            report += (
+                f", {m['write_behind']['flushed']} writes in {m['write_behind']['flushes']} flushes"
+                f", {m['write_behind']['pending']} pending"
+            )
+        return report
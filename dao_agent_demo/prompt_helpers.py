@@ -44,7 +44,8 @@ def get_instructions_from_json(file_json, character_type: str = "PLAYER"):
         "pre_autonomous_thought", 
         "post_autonomous_thought",
         "Type",
-        "Key"
+        "Key",
+        "TriageRules"
     ]
     
     # Build prompt from all other keys
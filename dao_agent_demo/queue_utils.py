@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    sort_order REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    received_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS work_items_ready ON work_items (status, priority, sort_order, available_at);
+CREATE INDEX IF NOT EXISTS work_items_leases ON work_items (status, lease_expires);
+CREATE TABLE IF NOT EXISTS runtime_state (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def worker_name(worker_id: int = 0) -> str:
+    """
+    Lease owner name of a worker, unique across processes and hosts.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{worker_id}"
+
+
+class DurableWorkQueue:
+    def __init__(
+        self,
+        db_path: str = "agent_queue.db",
+        visibility_timeout: float = 300,
+        max_attempts: int = 5,
+        retry_delay: float = 30,
+    ):
+        """
+        Persistent SQLite work queue for the autonomous agent's notifications and proposals.
+
+        Items survive restarts and are processed at least once: a worker leases an item
+        for visibility_timeout seconds and acks it when the turn is done. If the worker
+        crashes the lease runs out and another worker (in this or another process) picks
+        the item up again. Failed items are retried with exponential backoff and moved to
+        the dead letters after max_attempts. The database runs in WAL mode and leases are
+        taken in an immediate transaction, so several processes can share one backlog.
+
+        Args:
+            db_path (str): The SQLite database file
+            visibility_timeout (float): Seconds a leased item stays invisible to other workers
+            max_attempts (int): Attempts before an item is dead lettered
+            retry_delay (float): Seconds before the first retry, doubled on every attempt
+        """
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread, sqlite connections are not shared between threads
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._connect()
+        return _ImmediateTransaction(conn)
+
+    def _row_to_item(self, row: sqlite3.Row) -> Dict:
+        return {
+            "key": row["key"],
+            "kind": row["kind"],
+            "ref": row["ref"],
+            "payload": json.loads(row["payload"]),
+            "priority": row["priority"],
+            "order": row["sort_order"],
+            "received_at": row["received_at"],
+            "attempts": row["attempts"],
+        }
+
+    def put(self, item: Dict) -> bool:
+        """
+        Add a work item, items already queued, handled or dead lettered are ignored.
+
+        Args:
+            item (Dict): The work item (see agent_runtime.make_work_item)
+
+        Returns:
+            bool: True if the item is new
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO work_items "
+                "(key, kind, ref, payload, priority, sort_order, available_at, received_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    item["key"], item["kind"], str(item["ref"]), json.dumps(item["payload"], default=str),
+                    item.get("priority", 0), item.get("order", 0), now, item.get("received_at", now), now,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def lease(self, owner: str) -> Optional[Dict]:
+        """
+        Take the most urgent ready item, or an item whose lease ran out.
+
+        Args:
+            owner (str): The worker taking the lease
+
+        Returns:
+            Optional[Dict]: The work item with its attempts so far, None if nothing is ready
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # a lease that ran out means the worker died mid turn, that attempt counts
+            conn.execute(
+                "UPDATE work_items SET status = 'dead', last_error = 'lease expired', lease_owner = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires <= ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM work_items "
+                "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires <= ?) "
+                "ORDER BY priority, sort_order, received_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                (owner, now + self.visibility_timeout, now, row["key"]),
+            )
+        item = self._row_to_item(row)
+        item["attempts"] += 1
+        return item
+
+    def renew(self, key: str, owner: str) -> bool:
+        """
+        Extend a lease while a long agent turn is still running.
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                "WHERE key = ? AND status = 'leased' AND lease_owner = ?",
+                (now + self.visibility_timeout, now, key, owner),
+            )
+            return cursor.rowcount == 1
+
+    def ack(self, key: str, owner: str) -> bool:
+        """
+        Mark a leased item as handled.
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE key = ? AND status = 'leased' AND lease_owner = ?",
+                (now, key, owner),
+            )
+            return cursor.rowcount == 1
+
+    def nack(self, key: str, owner: str, error: str = "") -> str:
+        """
+        Give a leased item back after a failed attempt.
+
+        Returns:
+            str: The new status, pending (retried after a backoff) or dead
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM work_items WHERE key = ? AND status = 'leased' AND lease_owner = ?",
+                (key, owner),
+            ).fetchone()
+            if row is None:
+                return "lost"
+            status = "dead" if row["attempts"] >= self.max_attempts else "pending"
+            delay = self.retry_delay * 2 ** (row["attempts"] - 1)
+            conn.execute(
+                "UPDATE work_items SET status = ?, available_at = ?, last_error = ?, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE key = ?",
+                (status, now + delay, error[:1000], now, key),
+            )
+        return status
+
+    def dead_letters(self, limit: int = 20) -> List[Dict]:
+        """
+        Get the dead lettered items with their last error, most recent first.
+        """
+        rows = self._connect().execute(
+            "SELECT * FROM work_items WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [{**self._row_to_item(row), "last_error": row["last_error"]} for row in rows]
+
+    def requeue_dead(self, key: Optional[str] = None) -> int:
+        """
+        Move dead lettered items back to the queue with a fresh attempt count.
+
+        Args:
+            key (Optional[str]): Only requeue this item
+
+        Returns:
+            int: The number of requeued items
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE status = 'dead' AND (? IS NULL OR key = ?)",
+                (now, now, key, key),
+            )
+            return cursor.rowcount
+
+    def purge_done(self, older_than: float = 7 * 86400) -> int:
+        """
+        Delete handled items older than older_than seconds.
+
+        Returns:
+            int: The number of deleted items
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM work_items WHERE status = 'done' AND updated_at < ?", (time.time() - older_than,)
+            )
+            return cursor.rowcount
+
+    def save_state(self, name: str, state: Dict):
+        """
+        Persist a piece of runtime state (conversation window, block cursor) next to the queue.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO runtime_state (name, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (name, json.dumps(state, default=str), time.time()),
+            )
+
+    def load_state(self, name: str) -> Optional[Dict]:
+        """
+        Load a piece of runtime state saved with save_state.
+        """
+        row = self._connect().execute("SELECT state FROM runtime_state WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["state"]) if row else None
+
+    def metrics(self) -> Dict:
+        """
+        Get the number of items per status.
+        """
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM work_items GROUP BY status").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "dead": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the queue.
+        """
+        m = self.metrics()
+        return f"work queue: {m['pending']} pending, {m['leased']} leased, {m['done']} done, {m['dead']} dead"
+
+
+class _ImmediateTransaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so two processes can not lease the same item
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the durable agent work queue.")
+    parser.add_argument('--db-path', default=os.getenv("AGENT_QUEUE_DB", "agent_queue.db"), help="Queue database file")
+    parser.add_argument('--requeue-dead', action="store_true", help="Move every dead letter back to the queue")
+    args = parser.parse_args()
+
+    work_queue = DurableWorkQueue(args.db_path)
+    if args.requeue_dead:
+        print(f"requeued {work_queue.requeue_dead()} dead letters")
+    print(work_queue.report())
+    for item in work_queue.dead_letters():
+        print(f"dead: {item['key']} after {item['attempts']} attempts: {item['last_error']}")
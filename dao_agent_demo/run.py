@@ -1,21 +1,39 @@
 import os
-import time
+import asyncio
 import json
 import random
 import sys
-from swarm import Swarm
-from swarm.repl import run_demo_loop
 from openai import OpenAI
 
-from dao_agent_demo.agents import alderman_agent, dao_agent, gm_agent, player_agent
-from dao_agent_demo.tools import check_recent_unacted_cast_notifications, check_recent_unacted_proposals
+from dao_agent_demo.agents import alderman_agent, dao_agent, gm_agent, player_agent, route_to_agent, operator_agent_list
+from dao_agent_demo.tools import (
+    check_all_unacted_cast_notifications,
+    check_all_unacted_proposals,
+    notification_priority,
+    mark_notification_as_acted,
+    mark_proposal_as_acted,
+    iter_proposal_events,
+    commit_memory,
+    farcaster_bot,
+    memory_retention,
+)
 from dao_agent_demo.logs import pretty_print_messages
+from dao_agent_demo.swarm_utils import AgentSwarm
+from dao_agent_demo.trace_utils import tracer
+from dao_agent_demo.triage_utils import FastPathTriage
+from dao_agent_demo.tool_utils import ToolSelector
+from dao_agent_demo.cache_utils import tool_cache
+from dao_agent_demo.conversation_utils import ConversationMemory
+from dao_agent_demo.agent_runtime import AgentRuntime, PeriodicSource, make_work_item
+from dao_agent_demo.queue_utils import DurableWorkQueue
+from dao_agent_demo.interval_utils import AdaptiveInterval
+from dao_agent_demo.webhook_utils import NeynarWebhookReceiver
+from dao_agent_demo.graph_utils import TARGET_DAOS
 from dao_agent_demo.prompt_helpers import (
     get_character_json, 
     get_instructions_from_json,
     dao_simulation_setup,
     )
-from dao_agent_demo.interval_utils import get_interval, set_random_interval
 import dao_agent_demo.sim_phases as sim_phases
 from dao_agent_demo.worlds import fetch_world_files
 
@@ -23,85 +41,234 @@ from dao_agent_demo.worlds import fetch_world_files
 
 lower_interval = 20
 upper_interval = 100
+# number of items the autonomous runtime handles at the same time
+agent_workers = 4
+
+# sources the autonomous runtime polls, each returns a list of work items
+def poll_notifications():
+    notifications = check_all_unacted_cast_notifications()
+    if isinstance(notifications, str):  # If an error occurred
+        print(f"\033[91m{notifications}\033[0m")
+        return []
+    return [notification_work_item(n) for n in notifications]
+
+
+def notification_work_item(notification):
+    # mentions first, then replies, oldest first
+    return make_work_item(
+        "notification", notification["hash"], notification,
+        priority=notification_priority(notification), order=-notification["age_in_sec"],
+    )
 
-# this is the main loop that runs the agent in autonomous mode
-# you can modify this to change the behavior of the agent
-def run_autonomous_loop():
-    client = Swarm()
-    messages = []
 
-    print("Starting autonomous DAO Agent loop...")
-    file_json = get_character_json("operators/alderman.json", character_type="OPERATOR")
-    character_json = get_instructions_from_json(file_json)
+def proposal_work_item(proposal):
+    # proposals sit between mentions and replies, closest voting deadline first
+    # ids are only unique per DAO
+    ref = f"{proposal['dao_address']}:{proposal['proposals_proposalId']}"
+    return make_work_item("proposal", ref, proposal, priority=1, order=proposal.get("proposals_votingEnds") or 0)
 
-    agent = alderman_agent()
 
-    while True:
-        # Generate a thought
-        # thought = random.choices(
-        #     population=[thought['text'] for thought in character_json["autonomous_thoughts"]],
-        #     weights=[thought['weight'] for thought in character_json["autonomous_thoughts"]],
-        #     k=1
-        # )[0]
-        # thought = f"{character_json['pre_autonomous_thought']} {thought} {character_json['post_autonomous_thought']}"
-        
-        
-        new_notification = check_recent_unacted_cast_notifications()
-        new_proposal = check_recent_unacted_proposals()
-        debug = os.getenv("DEBUG")
-        
+def poll_proposals():
+    return [proposal_work_item(proposal) for proposal in check_all_unacted_proposals()]
 
-        # if debug:
-        #     thought = "Hello, can you tell me about fair launch tokens?"
-        #     messages.append({"role": "user", "content": thought})
 
-        #     print(f"\n\033[90mAgent's Thought:\033[0m {thought}")
+def make_onchain_poll(work_queue=None):
+    """
+    Get the on-chain proposal poll and the callback that commits its block cursor.
 
-        #     # Run the agent to generate a response and take action
-        #     response = client.run(agent=agent, messages=messages, stream=True)
+    The cursor is kept next to the durable queue so events are not missed across restarts.
+    It only advances once the runtime has queued the items of a poll, a crash in between
+    rescans those blocks and the queue dedupes what was already queued.
 
-        #     # Process and print the streaming response
-        #     response_obj = process_and_print_streaming_response(response)
+    Returns:
+        tuple: (poll, on_queued) for a PeriodicSource
+    """
+    state = (work_queue.load_state("onchain") if work_queue else None) or {"from_block": None}
+    scanned = {"from_block": state["from_block"]}
 
-        #     # Update messages with the new response
-        #     messages.extend(response_obj.messages)
-        
-        # check for new notifications first
-        if new_notification:
-            print("\n\033[90mNew cast notification found...\033[0m")
-            messages.append({"role": "user", "content": new_notification})
-        else:
-            print("\n\033[90mNo new cast notifications found...\033[0m")
-            if new_proposal:
-                print("\n\033[90mNew proposals found...\033[0m")
-                print(new_proposal)
-                # Get the first proposal from the list and parse its details
-                proposal = new_proposal[0]  # Access first item in list
-                details = json.loads(proposal['proposals_details'])  # Parse the JSON string
-                messages.append({
-                    "role": "user", 
-                    "content": f"New Proposal for governor: {details['title']} -- {details['description']}"
-                })
-            else:
-                print("\n\033[90mNo new proposals found...\033[0m")
-            
-        if messages:
-            # Run the agent to generate a response and take action
-            response = client.run(agent=agent, messages=messages, stream=True)
+    def poll_onchain_proposals():
+        # after downtime the range is scanned in chunks
+        items = []
+        scanned["from_block"] = state["from_block"]
+        try:
+            for proposals, scanned["from_block"] in iter_proposal_events(state["from_block"]):
+                items.extend(proposal_work_item(proposal) for proposal in proposals)
+        except Exception as e:
+            if not items:
+                raise
+            # keep what the chunks before the failure found, the next poll resumes after them
+            print(f"\033[91mError scanning on-chain proposals from block {scanned['from_block']}: {str(e)}\033[0m")
+        return items
+
+    def commit_cursor():
+        if scanned["from_block"] != state["from_block"]:
+            state["from_block"] = scanned["from_block"]
+            if work_queue:
+                work_queue.save_state("onchain", state)
+
+    return poll_onchain_proposals, commit_cursor
 
-            # Process and print the streaming response
-            response_obj = process_and_print_streaming_response(response)
 
-            # Update messages with the new response
-            messages.extend(response_obj.messages)
+def mark_work_item_acted(item, actor="alderman"):
+    """
+    Record a handled work item so no worker or later poll picks it up again.
+    """
+    if item["kind"] == "notification":
+        return mark_notification_as_acted(item["ref"])
+    return mark_proposal_as_acted(item["payload"]["proposals_proposalId"], actor, item["payload"]["dao_address"])
 
 
-        # Set a random interval between 600 and 3600 seconds
-        set_random_interval(lower_interval, upper_interval)
+def work_item_message(item):
+    """
+    Turn a work item into the user message the agents get.
+    """
+    if item["kind"] == "proposal":
+        dao = f"(proposal {item['payload']['proposals_proposalId']} in DAO {item['payload']['dao_address']})"
+        try:
+            details = json.loads(item["payload"]["proposals_details"])  # Parse the JSON string
+            return f"New Proposal for governor {dao}: {details['title']} -- {details['description']}"
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return f"New Proposal for governor {dao}: {item['payload']['proposals_details']}"
+    return item["payload"]
+
+
+# this is the main loop that runs the agent in autonomous mode
+# you can modify this to change the behavior of the agent
+def run_autonomous_loop(webhook_port=None, worker_only=False, webhook_insecure=False):
+    tool_selector = ToolSelector()
+    client = AgentSwarm(tool_selector=tool_selector)
+    # sliding window over the history, older turns are summarized and facts committed to memory
+    # notifications and proposals go through a durable queue, so a crash mid turn does not lose them
+    # and several processes can work the same backlog (see queue_utils)
+    work_queue = DurableWorkQueue(os.getenv("AGENT_QUEUE_DB", "agent_queue.db"))
+    if worker_only:
+        # the window belongs to the polling process, workers keep their own in memory
+        # instead of overwriting (or restoring) the poller's saved conversation
+        memory = ConversationMemory(commit_fact=commit_memory)
+    else:
+        memory = ConversationMemory(commit_fact=commit_memory, on_change=lambda state: work_queue.save_state("conversation", state))
+        memory.load_state(work_queue.load_state("conversation"))
+
+    print("Starting autonomous DAO Agent loop...")
+
+    agent = alderman_agent()
+    # only routes with a registered operator are fast pathed
+    triage = FastPathTriage(operators={name: operator["file_path"] for name, operator in operator_agent_list.items()})
+
+    def handle_item(item):
+        print(f"\n\033[90mNew {item['kind']} found...\033[0m")
+        # every item gets its own turn on top of the shared summary and recent window
+        user_message = {"role": "user", "content": work_item_message(item)}
+
+        # trace the request through the operator chain (see trace_utils for the summary)
+        with tracer.trace(item["kind"], ref=item["ref"]):
+            # route obvious requests straight to an operator, the alderman only triages ambiguous ones
+            turn_agent = agent
+            route, scores = triage.classify(user_message["content"])
+            tracer.event("triage", route or "alderman", scores=scores)
+            if route:
+                try:
+                    turn_agent = route_to_agent(route)
+                    print(f"\n\033[90mFast path triage to {route} {scores}\033[0m")
+                except (KeyError, OSError) as e:
+                    # a broken operator must not dead letter the item, the alderman still can triage it
+                    print(f"\n\033[91mFast path triage to {route} failed, falling back to the alderman: {str(e)}\033[0m")
+                    tracer.event("triage", "alderman", fallback_from=route)
+
+            # Run the agent to generate a response and take action
+            # (streamed output of several workers would interleave, so only stream with one)
+            stream = runtime.workers == 1
+            response = client.run(agent=turn_agent, messages=memory.get_messages() + [user_message], stream=stream)
+
+            # Process and print the response
+            if stream:
+                response_obj = process_and_print_streaming_response(response)
+            else:
+                response_obj = response
+                pretty_print_messages(response_obj.messages)
+
+        # Update messages with the new response
+        memory.extend([user_message] + response_obj.messages)
+        mark_work_item_acted(item)
+        print(f"\n\033[90m{triage.report()}\033[0m")
+        print(f"\033[90m{tool_selector.report()}\033[0m")
+        print(f"\033[90m{tool_cache.report()}\033[0m")
+        print(f"\033[90m{runtime.report()}\033[0m")
+        if webhook_port:
+            print(f"\033[90m{webhook.report()}\033[0m")
+        print(f"\033[90m{memory_retention.report()}\033[0m")
+
+    # every source polls on its own schedule while the agents work, so a new item
+    # waits at most one poll interval instead of a full sleep cycle
+    # intervals shrink while items keep arriving and back off while a source is quiet
+    # with the webhook receiver notifications are pushed, polling only reconciles missed deliveries
+    notifications_interval = (
+        AdaptiveInterval(floor=upper_interval, ceiling=600, initial=upper_interval)
+        if webhook_port else AdaptiveInterval(floor=5, ceiling=upper_interval, initial=lower_interval)
+    )
+    poll_onchain_proposals, commit_onchain_cursor = make_onchain_poll(work_queue)
+    sources = [
+        PeriodicSource(
+            "notifications",
+            poll_notifications,
+            notifications_interval,
+            rate_limit=lambda: farcaster_bot.last_rate_limit,
+        ),
+        PeriodicSource("proposals", poll_proposals, AdaptiveInterval(floor=lower_interval, ceiling=600, initial=upper_interval)),
+        PeriodicSource(
+            "onchain",
+            poll_onchain_proposals,
+            AdaptiveInterval(floor=10, ceiling=upper_interval, initial=lower_interval),
+            on_queued=commit_onchain_cursor,
+        ),
+    ]
+    if worker_only:
+        # extra worker processes only drain the shared queue, one process polls
+        sources, webhook_port = [], None
+    runtime = AgentRuntime(handle_item, sources, workers=int(os.getenv("AGENT_WORKERS", agent_workers)), work_queue=work_queue)
+    if not worker_only:
+        # expire acted records past their retention and compact the store in the background
+        memory_retention.start_maintenance(float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", 3600)))
+    if webhook_port:
+        webhook = NeynarWebhookReceiver(
+            lambda notification: runtime.submit(notification_work_item(notification)),
+            port=webhook_port,
+            allow_unsigned=webhook_insecure,
+        )
+        webhook.start()
+    asyncio.run(runtime.run())
+
+
+# interactive chat with an agent, same as swarm.repl.run_demo_loop but on the AgentSwarm client
+def run_demo_loop(starting_agent, context_variables=None, stream=True, debug=False):
+    tool_selector = ToolSelector()
+    client = AgentSwarm(tool_selector=tool_selector)
+    print("Starting Swarm CLI 🐝")
+
+    messages = []
+    agent = starting_agent
+
+    while True:
+        user_input = input("\033[90mUser\033[0m: ")
+        messages.append({"role": "user", "content": user_input})
+
+        response = client.run(
+            agent=agent,
+            messages=messages,
+            context_variables=context_variables or {},
+            stream=stream,
+            debug=debug,
+        )
+
+        if stream:
+            response = process_and_print_streaming_response(response)
+        else:
+            pretty_print_messages(response.messages)
 
-        print(f"\n\033[90mNext thought in {get_interval()} seconds...\033[0m")
-        # Wait for the specified interval
-        time.sleep(get_interval())
+        messages.extend(response.messages)
+        agent = response.agent
+        print(f"\033[90m{tool_selector.report()}\033[0m")
+        print(f"\033[90m{tool_cache.report()}\033[0m")
 
 
 def run_dao_simulation_loop(world=None, off_chain=False):
@@ -109,7 +276,7 @@ def run_dao_simulation_loop(world=None, off_chain=False):
     Runs the DAO governance simulation loop.
     """
     # Initialize Swarm and OpenAI clients
-    client = Swarm()
+    client = AgentSwarm()
     
     if not world:
         world = choose_world()
@@ -126,8 +293,8 @@ def run_dao_simulation_loop(world=None, off_chain=False):
 
     # verify on_chain reqs if one doesn't exists default to off_chain. .env WEB3_PROVIDER_URI, TARGET_DAO, AGENT_ADDR
     if not off_chain:
-        if not os.getenv("TARGET_DAO"):
-            print("Error: On-chain mode requires the following environment variables to be set: TARGET_DAO")
+        if not TARGET_DAOS:
+            print("Error: On-chain mode requires the following environment variables to be set: TARGET_DAO (or TARGET_DAOS)")
             print("See README.md for more information. Defaulting to off-chain mode.")
             off_chain = True
         for player in players:
@@ -154,7 +321,8 @@ def run_dao_simulation_loop(world=None, off_chain=False):
             # Dynamically load the phase function from `phases.py`
             phase_function = getattr(sim_phases, step, None)
             if callable(phase_function):
-                game_context = phase_function(game_context, world_context, players, gm, client, off_chain, **extra_args)
+                with tracer.trace("phase", ref=step):
+                    game_context = phase_function(game_context, world_context, players, gm, client, off_chain, **extra_args)
 
                 # Dynamically add extra arguments
                 # if step == "introduce_scenario":
@@ -5,11 +5,14 @@ from dao_agent_demo.prompt_helpers import (
     extract_vote, update_narrative, roll_d20, resolve_round_with_relationships
     )
 
+from dao_agent_demo.graph_utils import TARGET_DAOS
+
 from dotenv import dotenv_values
 
 config = dotenv_values("../.env")
 
-DAO_ADDRESS = os.getenv("TARGET_DAO", "")
+# the simulation plays out in the main target DAO
+DAO_ADDRESS = TARGET_DAOS[0] if TARGET_DAOS else ""
 
 def generate_summary(game_context, world_context, players, gm, client, off_chain, **kwargs):
     # Include narrative context for continuity (last 10 entries)
@@ -0,0 +1,793 @@
+import os
+import json
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from tinydb import TinyDB, Query
+
+from dao_agent_demo.lock_utils import FileLock
+
+
+def record_kind(record: Dict) -> str:
+    """
+    Get the record type of a db.json style record.
+
+    Returns:
+        str: knowledge, notification, proposal or memory
+    """
+    if "file_name" in record:
+        return "knowledge"
+    if record.get("context") == "notification" or (record.get("record_type") == "action" and "hash" in record):
+        return "notification"
+    if "proposal_id" in record:
+        return "proposal"
+    return "memory"
+
+
+class MemoryBackend:
+    """
+    Storage interface behind MemoryRetention. Records keep the db.json shapes:
+    knowledge {file_name, content, keywords}, acted notifications {hash, timestamp},
+    acted proposals {proposal_id, dao_address, actor, timestamp} and free form memories.
+    """
+
+    name = "base"
+
+    def insert(self, record: Dict):
+        raise NotImplementedError
+
+    def insert_many(self, records: List[Dict], durable: bool = False):
+        """
+        Insert records in one write, knowledge records replace the record of the same file name.
+
+        Args:
+            records (List[Dict]): Records of any type
+            durable (bool): Only return once the write is fsynced to disk
+        """
+        raise NotImplementedError
+
+    def insert_acted_notification(self, notification_hash: str, timestamp: str) -> bool:
+        """
+        Atomically record an acted notification, False if it was already recorded.
+        """
+        raise NotImplementedError
+
+    def insert_acted_proposal(self, proposal_id: str, dao_address: Optional[str], actor: str, timestamp: str) -> bool:
+        """
+        Atomically record an acted proposal, False if it was already recorded.
+        """
+        raise NotImplementedError
+
+    def is_acted_notification(self, notification_hash: str) -> bool:
+        """
+        Check the store itself, it also sees the marks of other processes.
+        """
+        raise NotImplementedError
+
+    def is_acted_proposal(self, proposal_id: str, dao_address: Optional[str]) -> bool:
+        raise NotImplementedError
+
+    def acted_notifications(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def acted_proposals(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def has_knowledge(self, file_name: str) -> bool:
+        raise NotImplementedError
+
+    def search_knowledge(self, keywords: List[str]) -> List[Dict]:
+        """
+        Get knowledge records with any of the keywords.
+        """
+        raise NotImplementedError
+
+    def knowledge(self, file_names: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get knowledge records by file name, or all of them.
+        """
+        raise NotImplementedError
+
+    def delete_knowledge(self, file_names: List[str]) -> int:
+        raise NotImplementedError
+
+    def memories(self, memory_type: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def update_memories(self, memory_type: str, fields: Dict) -> int:
+        raise NotImplementedError
+
+    def delete_memories(self, memory_type: str) -> int:
+        raise NotImplementedError
+
+    def all(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def truncate(self):
+        raise NotImplementedError
+
+    def expire(self, record_type: str, before: str) -> int:
+        """
+        Delete acted records (notification or proposal) recorded before an iso timestamp.
+
+        Returns:
+            int: The number of deleted records
+        """
+        raise NotImplementedError
+
+    def compact(self) -> bool:
+        """
+        Give the space of deleted records back to the file system.
+
+        Returns:
+            bool: True if the file was rewritten
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """
+        Get the row count per record type and the size of the store files in bytes.
+        """
+        raise NotImplementedError
+
+
+class TinyDBBackend(MemoryBackend):
+    name = "tinydb"
+
+    def __init__(self, db_path: str = "db.json"):
+        """
+        The original json store, every write rewrites the whole file.
+
+        Every operation holds an flock on <db_path>.lock and drops TinyDB's caches first,
+        so several processes can share the file: nobody reads a half written file or
+        overwrites another process' records, and check-and-insert is atomic.
+
+        Args:
+            db_path (str): The json file
+        """
+        self.db_path = db_path
+        self.db = TinyDB(db_path)
+        self.lock = FileLock(f"{db_path}.lock")
+
+    @contextmanager
+    def _locked(self):
+        with self.lock:
+            # the query cache and next document id are only valid until another process writes
+            table = self.db.table(self.db.default_table_name)
+            table.clear_cache()
+            table._next_id = None
+            yield self.db
+
+    def insert(self, record: Dict):
+        with self._locked() as db:
+            db.insert(record)
+
+    def insert_many(self, records: List[Dict], durable: bool = False):
+        # one remove and one insert_multiple, each rewrites and fsyncs the file once
+        file_names = [record["file_name"] for record in records if record_kind(record) == "knowledge"]
+        with self._locked() as db:
+            if file_names:
+                db.remove(Query().file_name.one_of(file_names))
+            db.insert_multiple(records)
+
+    def insert_acted_notification(self, notification_hash: str, timestamp: str) -> bool:
+        with self._locked() as db:
+            if db.search(Query().hash == notification_hash):
+                return False
+            db.insert({'record_type': 'action', 'context': 'notification', 'hash': notification_hash, 'timestamp': timestamp})
+        return True
+
+    def insert_acted_proposal(self, proposal_id: str, dao_address: Optional[str], actor: str, timestamp: str) -> bool:
+        with self._locked() as db:
+            if db.search((Query().proposal_id == proposal_id) & (Query().dao_address == dao_address)):
+                return False
+            db.insert({'record_type': 'action', 'context': 'proposal', 'proposal_id': proposal_id, 'dao_address': dao_address, 'actor': actor, 'timestamp': timestamp})
+        return True
+
+    def is_acted_notification(self, notification_hash: str) -> bool:
+        with self._locked() as db:
+            return db.contains(Query().hash == notification_hash)
+
+    def is_acted_proposal(self, proposal_id: str, dao_address: Optional[str]) -> bool:
+        with self._locked() as db:
+            return db.contains((Query().proposal_id == proposal_id) & (Query().dao_address == dao_address))
+
+    def acted_notifications(self) -> List[Dict]:
+        with self._locked() as db:
+            return db.search(Query().hash.exists())
+
+    def acted_proposals(self) -> List[Dict]:
+        with self._locked() as db:
+            return db.search(Query().proposal_id.exists())
+
+    def has_knowledge(self, file_name: str) -> bool:
+        with self._locked() as db:
+            return db.contains(Query().file_name == file_name)
+
+    def search_knowledge(self, keywords: List[str]) -> List[Dict]:
+        with self._locked() as db:
+            return db.search(Query().keywords.any(keywords))
+
+    def knowledge(self, file_names: Optional[List[str]] = None) -> List[Dict]:
+        with self._locked() as db:
+            if file_names is None:
+                return db.search(Query().file_name.exists())
+            return db.search(Query().file_name.one_of(list(file_names)))
+
+    def delete_knowledge(self, file_names: List[str]) -> int:
+        with self._locked() as db:
+            return len(db.remove(Query().file_name.one_of(list(file_names))))
+
+    def memories(self, memory_type: Optional[str] = None) -> List[Dict]:
+        with self._locked() as db:
+            if memory_type is None:
+                return [r for r in db.all() if record_kind(r) == "memory"]
+            return db.search(Query().type == memory_type)
+
+    def update_memories(self, memory_type: str, fields: Dict) -> int:
+        with self._locked() as db:
+            return len(db.update(fields, Query().type == memory_type))
+
+    def delete_memories(self, memory_type: str) -> int:
+        with self._locked() as db:
+            return len(db.remove(Query().type == memory_type))
+
+    def all(self) -> List[Dict]:
+        with self._locked() as db:
+            return db.all()
+
+    def count(self) -> int:
+        with self._locked() as db:
+            return len(db)
+
+    def truncate(self):
+        with self._locked() as db:
+            db.truncate()
+
+    def expire(self, record_type: str, before: str) -> int:
+        field = Query().hash if record_type == "notification" else Query().proposal_id
+        with self._locked() as db:
+            return len(db.remove(field.exists() & (Query().timestamp < before)))
+
+    def compact(self) -> bool:
+        # every write already rewrites the whole file
+        return False
+
+    def stats(self) -> Dict:
+        counts = {"memory": 0, "knowledge": 0, "notification": 0, "proposal": 0}
+        for record in self.all():
+            counts[record_kind(record)] += 1
+        return {"rows": counts, "bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0}
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memories_type ON memories (type, id);
+CREATE TABLE IF NOT EXISTS knowledge (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL UNIQUE,
+    content TEXT NOT NULL,
+    keywords TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS knowledge_keywords (
+    keyword TEXT NOT NULL,
+    knowledge_id INTEGER NOT NULL REFERENCES knowledge (id) ON DELETE CASCADE,
+    PRIMARY KEY (keyword, knowledge_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS knowledge_keywords_document ON knowledge_keywords (knowledge_id);
+CREATE TABLE IF NOT EXISTS acted_notifications (
+    hash TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS acted_notifications_timestamp ON acted_notifications (timestamp);
+CREATE TABLE IF NOT EXISTS acted_proposals (
+    dao_address TEXT NOT NULL DEFAULT '',
+    proposal_id TEXT NOT NULL,
+    actor TEXT,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (dao_address, proposal_id)
+);
+CREATE INDEX IF NOT EXISTS acted_proposals_timestamp ON acted_proposals (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteBackend(MemoryBackend):
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "memory.db"):
+        """
+        SQLite store in WAL mode with a table and indexes per record type.
+
+        Inserts are O(1) appends instead of a rewrite of the whole store, readers never
+        block the writer and the acted dedupe is a primary key, so check-and-insert is
+        atomic across threads and processes.
+
+        Args:
+            db_path (str): The database file
+        """
+        self.db_path = db_path
+        self.local = threading.local()
+        conn = self._connect()
+        conn.executescript(SQLITE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread, sqlite connections are not shared between threads
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self.local.conn = conn
+        return conn
+
+    def _write(self, statements: List[tuple]) -> List[int]:
+        # run statements in one write transaction, returns the rowcount of each
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts = [conn.execute(sql, params).rowcount for sql, params in statements]
+            conn.execute("COMMIT")
+            return counts
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _knowledge_statements(self, record: Dict) -> List[tuple]:
+        keywords = [str(keyword).lower() for keyword in record.get("keywords") or []]
+        statements = [(
+            "INSERT INTO knowledge (file_name, content, keywords) VALUES (?, ?, ?) "
+            "ON CONFLICT(file_name) DO UPDATE SET content = excluded.content, keywords = excluded.keywords",
+            (record["file_name"], record.get("content", ""), json.dumps(record.get("keywords") or [])),
+        ), (
+            "DELETE FROM knowledge_keywords WHERE knowledge_id = (SELECT id FROM knowledge WHERE file_name = ?)",
+            (record["file_name"],),
+        )]
+        statements += [(
+            "INSERT OR IGNORE INTO knowledge_keywords (keyword, knowledge_id) "
+            "SELECT ?, id FROM knowledge WHERE file_name = ?",
+            (keyword, record["file_name"]),
+        ) for keyword in set(keywords)]
+        return statements
+
+    def _record_statements(self, record: Dict) -> List[tuple]:
+        kind = record_kind(record)
+        if kind == "knowledge":
+            return self._knowledge_statements(record)
+        if kind == "notification":
+            return [("INSERT OR IGNORE INTO acted_notifications (hash, timestamp) VALUES (?, ?)",
+                     (record["hash"], record.get("timestamp", "")))]
+        if kind == "proposal":
+            return [("INSERT OR IGNORE INTO acted_proposals (dao_address, proposal_id, actor, timestamp) VALUES (?, ?, ?, ?)",
+                     (record.get("dao_address") or "", str(record["proposal_id"]), record.get("actor"), record.get("timestamp", "")))]
+        return [("INSERT INTO memories (type, record) VALUES (?, ?)",
+                 (record.get("type"), json.dumps(record, default=str)))]
+
+    def insert(self, record: Dict):
+        self._write(self._record_statements(record))
+
+    def insert_many(self, records: List[Dict], durable: bool = False):
+        """
+        Insert records of any type in a single transaction.
+        """
+        statements = [statement for record in records for statement in self._record_statements(record)]
+        if not durable:
+            self._write(statements)
+            return
+        # WAL commits with synchronous=NORMAL are not fsynced, FULL syncs this one
+        conn = self._connect()
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            self._write(statements)
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+    def insert_acted_notification(self, notification_hash: str, timestamp: str) -> bool:
+        return self._write([("INSERT OR IGNORE INTO acted_notifications (hash, timestamp) VALUES (?, ?)",
+                             (notification_hash, timestamp))])[0] == 1
+
+    def insert_acted_proposal(self, proposal_id: str, dao_address: Optional[str], actor: str, timestamp: str) -> bool:
+        return self._write([("INSERT OR IGNORE INTO acted_proposals (dao_address, proposal_id, actor, timestamp) VALUES (?, ?, ?, ?)",
+                             (dao_address or "", str(proposal_id), actor, timestamp))])[0] == 1
+
+    def is_acted_notification(self, notification_hash: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM acted_notifications WHERE hash = ?",
+                                       (notification_hash,)).fetchone() is not None
+
+    def is_acted_proposal(self, proposal_id: str, dao_address: Optional[str]) -> bool:
+        return self._connect().execute("SELECT 1 FROM acted_proposals WHERE dao_address = ? AND proposal_id = ?",
+                                       (dao_address or "", str(proposal_id))).fetchone() is not None
+
+    def acted_notifications(self) -> List[Dict]:
+        rows = self._connect().execute("SELECT hash, timestamp FROM acted_notifications").fetchall()
+        return [{'record_type': 'action', 'context': 'notification', 'hash': row["hash"], 'timestamp': row["timestamp"]} for row in rows]
+
+    def acted_proposals(self) -> List[Dict]:
+        rows = self._connect().execute("SELECT dao_address, proposal_id, actor, timestamp FROM acted_proposals").fetchall()
+        return [
+            {'record_type': 'action', 'context': 'proposal', 'proposal_id': row["proposal_id"],
+             'dao_address': row["dao_address"] or None, 'actor': row["actor"], 'timestamp': row["timestamp"]}
+            for row in rows
+        ]
+
+    def _knowledge_record(self, row: sqlite3.Row) -> Dict:
+        return {'file_name': row["file_name"], 'content': row["content"], 'keywords': json.loads(row["keywords"])}
+
+    def has_knowledge(self, file_name: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM knowledge WHERE file_name = ?", (file_name,)).fetchone() is not None
+
+    def search_knowledge(self, keywords: List[str]) -> List[Dict]:
+        keywords = [keyword.lower() for keyword in keywords]
+        if not keywords:
+            return []
+        rows = self._connect().execute(
+            "SELECT * FROM knowledge WHERE id IN "
+            f"(SELECT knowledge_id FROM knowledge_keywords WHERE keyword IN ({','.join('?' * len(keywords))}))",
+            keywords,
+        ).fetchall()
+        return [self._knowledge_record(row) for row in rows]
+
+    def knowledge(self, file_names: Optional[List[str]] = None) -> List[Dict]:
+        if file_names is None:
+            rows = self._connect().execute("SELECT * FROM knowledge ORDER BY id").fetchall()
+        else:
+            file_names = list(file_names)
+            rows = self._connect().execute(
+                f"SELECT * FROM knowledge WHERE file_name IN ({','.join('?' * len(file_names))})", file_names
+            ).fetchall() if file_names else []
+        return [self._knowledge_record(row) for row in rows]
+
+    def delete_knowledge(self, file_names: List[str]) -> int:
+        # knowledge_keywords rows go with the cascade
+        return sum(self._write([("DELETE FROM knowledge WHERE file_name = ?", (file_name,)) for file_name in file_names]))
+
+    def memories(self, memory_type: Optional[str] = None) -> List[Dict]:
+        if memory_type is None:
+            rows = self._connect().execute("SELECT record FROM memories ORDER BY id").fetchall()
+        else:
+            rows = self._connect().execute("SELECT record FROM memories WHERE type = ? ORDER BY id", (memory_type,)).fetchall()
+        return [json.loads(row["record"]) for row in rows]
+
+    def update_memories(self, memory_type: str, fields: Dict) -> int:
+        rows = self._connect().execute("SELECT id, record FROM memories WHERE type = ?", (memory_type,)).fetchall()
+        statements = []
+        for row in rows:
+            record = {**json.loads(row["record"]), **fields}
+            statements.append(("UPDATE memories SET type = ?, record = ? WHERE id = ?",
+                               (record.get("type"), json.dumps(record, default=str), row["id"])))
+        self._write(statements)
+        return len(statements)
+
+    def delete_memories(self, memory_type: str) -> int:
+        return self._write([("DELETE FROM memories WHERE type = ?", (memory_type,))])[0]
+
+    def all(self) -> List[Dict]:
+        return self.knowledge() + self.memories() + self.acted_notifications() + self.acted_proposals()
+
+    def count(self) -> int:
+        row = self._connect().execute(
+            "SELECT (SELECT COUNT(*) FROM memories) + (SELECT COUNT(*) FROM knowledge) "
+            "+ (SELECT COUNT(*) FROM acted_notifications) + (SELECT COUNT(*) FROM acted_proposals)"
+        ).fetchone()
+        return row[0]
+
+    def truncate(self):
+        self._write([(f"DELETE FROM {table}", ()) for table in
+                     ("knowledge_keywords", "knowledge", "memories", "acted_notifications", "acted_proposals")])
+
+    def expire(self, record_type: str, before: str) -> int:
+        table = "acted_notifications" if record_type == "notification" else "acted_proposals"
+        return self._write([(f"DELETE FROM {table} WHERE timestamp < ?", (before,))])[0]
+
+    def compact(self, min_free_ratio: float = 0.25) -> bool:
+        """
+        Fold the WAL back into the database and VACUUM once free pages pass min_free_ratio.
+        """
+        conn = self._connect()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not pages or free / pages < min_free_ratio:
+            return False
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def stats(self) -> Dict:
+        row = self._connect().execute(
+            "SELECT (SELECT COUNT(*) FROM memories), (SELECT COUNT(*) FROM knowledge), "
+            "(SELECT COUNT(*) FROM acted_notifications), (SELECT COUNT(*) FROM acted_proposals)"
+        ).fetchone()
+        size = sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal") if os.path.exists(path))
+        return {"rows": dict(zip(("memory", "knowledge", "notification", "proposal"), row)), "bytes": size}
+
+    def migrate_from_json(self, json_path: str = "db.json") -> int:
+        """
+        One-shot import of an existing TinyDB json store, later calls are no-ops.
+
+        Args:
+            json_path (str): The TinyDB file
+
+        Returns:
+            int: The number of migrated records
+        """
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone() or not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r") as db_file:
+            content = db_file.read().strip()
+        tables = json.loads(content) if content else {}
+        records = [record for table in tables.values() for record in table.values()]
+        statements = [statement for record in records for statement in self._record_statements(record)]
+        # the marker goes first in the write transaction, so of several processes opening a
+        # new store at once only the first imports and the others see a rowcount of 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                            (os.path.abspath(json_path),)).rowcount == 0:
+                conn.execute("ROLLBACK")
+                return 0
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        print(f"migrated {len(records)} records from {json_path} to {self.db_path}")
+        return len(records)
+
+
+class WriteBehindBackend(MemoryBackend):
+    def __init__(
+        self,
+        backend: MemoryBackend,
+        max_pending: int = 64,
+        max_delay: float = 1.0,
+        buffer_claims: bool = True,
+        on_flush: Optional[Callable[[List[Dict]], None]] = None,
+    ):
+        """
+        Write-behind buffer in front of another backend.
+
+        Memories and acted records are acknowledged as soon as they are in an in-memory
+        overlay and written in batches, one durable (fsynced) transaction per batch, when
+        max_pending records are waiting or max_delay seconds after the first one. Reads
+        merge the overlay with the store so every reader sees its own writes, updates and
+        deletes flush first. The buffer is flushed on close and at interpreter exit.
+
+        When other processes share the store, acted marks are claims that must be decided
+        by the store, buffer_claims=False writes them through right away.
+
+        Args:
+            backend (MemoryBackend): The store the batches are written to
+            max_pending (int): Records that trigger a flush
+            max_delay (float): Seconds a record waits at most
+            buffer_claims (bool): Buffer acted notifications and proposals too
+            on_flush (Optional[Callable[[List[Dict]], None]]): Called with every batch once it is
+                durable, for state derived from the records (ex: index files)
+        """
+        self.backend = backend
+        self.name = f"{backend.name}+write-behind"
+        self.db_path = backend.db_path
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.buffer_claims = buffer_claims
+        self.on_flush = on_flush
+        self.pending: List[Dict] = []
+        self.pending_notifications: set = set()
+        self.pending_proposals: set = set()
+        # held for a whole flush, so a reader never sees a batch twice or not at all
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.stats_counters = {"buffered": 0, "flushes": 0, "flushed": 0, "errors": 0}
+        self.thread = threading.Thread(target=self._flush_loop, name="memory-write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.wakeup.wait(self.max_delay)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"\033[91mError flushing memory writes: {str(e)}\033[0m")
+
+    def _buffer(self, records: List[Dict]):
+        with self.lock:
+            self.pending.extend(records)
+            self.stats_counters["buffered"] += len(records)
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write the buffered records in one durable transaction.
+
+        Returns:
+            int: The number of records written
+        """
+        with self.lock:
+            if not self.pending:
+                return 0
+            batch = self.pending
+            try:
+                self.backend.insert_many(batch, durable=True)
+            except Exception:
+                self.stats_counters["errors"] += 1
+                raise  # the batch stays buffered for the next flush
+            self.pending = []
+            self.pending_notifications.clear()
+            self.pending_proposals.clear()
+            self.stats_counters["flushes"] += 1
+            self.stats_counters["flushed"] += len(batch)
+            if self.on_flush:
+                try:
+                    self.on_flush(batch)
+                except Exception as e:
+                    # the records are durable, only what is derived from them is behind
+                    print(f"\033[91mError after flushing memory writes: {str(e)}\033[0m")
+            return len(batch)
+
+    def close(self):
+        """
+        Stop the flush thread and write what is left.
+        """
+        self.closed = True
+        self.wakeup.set()
+        self.flush()
+
+    def _pending_of(self, kind: str) -> List[Dict]:
+        return [record for record in self.pending if record_kind(record) == kind]
+
+    def insert(self, record: Dict):
+        self._buffer([record])
+
+    def insert_many(self, records: List[Dict], durable: bool = False):
+        if durable:
+            with self.lock:
+                self.flush()
+                self.backend.insert_many(records, durable=True)
+        else:
+            self._buffer(list(records))
+
+    def insert_acted_notification(self, notification_hash: str, timestamp: str) -> bool:
+        if not self.buffer_claims:
+            return self.backend.insert_acted_notification(notification_hash, timestamp)
+        # MemoryRetention checks its acted set first, this only dedupes the buffered marks
+        with self.lock:
+            if notification_hash in self.pending_notifications:
+                return False
+            self.pending_notifications.add(notification_hash)
+            self._buffer([{'record_type': 'action', 'context': 'notification', 'hash': notification_hash, 'timestamp': timestamp}])
+        return True
+
+    def insert_acted_proposal(self, proposal_id: str, dao_address: Optional[str], actor: str, timestamp: str) -> bool:
+        if not self.buffer_claims:
+            return self.backend.insert_acted_proposal(proposal_id, dao_address, actor, timestamp)
+        key = (dao_address or "", str(proposal_id))
+        with self.lock:
+            if key in self.pending_proposals:
+                return False
+            self.pending_proposals.add(key)
+            self._buffer([{'record_type': 'action', 'context': 'proposal', 'proposal_id': proposal_id,
+                           'dao_address': dao_address, 'actor': actor, 'timestamp': timestamp}])
+        return True
+
+    def is_acted_notification(self, notification_hash: str) -> bool:
+        with self.lock:
+            if notification_hash in self.pending_notifications:
+                return True
+        return self.backend.is_acted_notification(notification_hash)
+
+    def is_acted_proposal(self, proposal_id: str, dao_address: Optional[str]) -> bool:
+        with self.lock:
+            if (dao_address or "", str(proposal_id)) in self.pending_proposals:
+                return True
+        return self.backend.is_acted_proposal(proposal_id, dao_address)
+
+    def acted_notifications(self) -> List[Dict]:
+        with self.lock:
+            return self.backend.acted_notifications() + self._pending_of("notification")
+
+    def acted_proposals(self) -> List[Dict]:
+        with self.lock:
+            return self.backend.acted_proposals() + self._pending_of("proposal")
+
+    def has_knowledge(self, file_name: str) -> bool:
+        with self.lock:
+            return self.backend.has_knowledge(file_name) or any(r.get("file_name") == file_name for r in self.pending)
+
+    def search_knowledge(self, keywords: List[str]) -> List[Dict]:
+        self.flush()
+        return self.backend.search_knowledge(keywords)
+
+    def knowledge(self, file_names: Optional[List[str]] = None) -> List[Dict]:
+        self.flush()
+        return self.backend.knowledge(file_names)
+
+    def delete_knowledge(self, file_names: List[str]) -> int:
+        with self.lock:
+            self.flush()
+            return self.backend.delete_knowledge(file_names)
+
+    def memories(self, memory_type: Optional[str] = None) -> List[Dict]:
+        with self.lock:
+            pending = [r for r in self._pending_of("memory") if memory_type is None or r.get("type") == memory_type]
+            return self.backend.memories(memory_type) + pending
+
+    def update_memories(self, memory_type: str, fields: Dict) -> int:
+        with self.lock:
+            self.flush()
+            return self.backend.update_memories(memory_type, fields)
+
+    def delete_memories(self, memory_type: str) -> int:
+        with self.lock:
+            self.flush()
+            return self.backend.delete_memories(memory_type)
+
+    def all(self) -> List[Dict]:
+        with self.lock:
+            return self.backend.all() + list(self.pending)
+
+    def count(self) -> int:
+        with self.lock:
+            return self.backend.count() + len(self.pending)
+
+    def truncate(self):
+        with self.lock:
+            self.pending = []
+            self.pending_notifications.clear()
+            self.pending_proposals.clear()
+            self.backend.truncate()
+
+    def expire(self, record_type: str, before: str) -> int:
+        with self.lock:
+            self.flush()
+            return self.backend.expire(record_type, before)
+
+    def compact(self) -> bool:
+        return self.backend.compact()
+
+    def buffer_stats(self) -> Dict:
+        """
+        Get the buffer counters and the number of records waiting, no I/O.
+        """
+        with self.lock:
+            return {**self.stats_counters, "pending": len(self.pending)}
+
+    def stats(self) -> Dict:
+        # read only, rows and bytes are what is durable, the overlay is reported apart
+        # (a flush here would defeat the batching, reports run after every turn)
+        return {**self.backend.stats(), "write_behind": self.buffer_stats()}
+
+
+def open_backend(db_path: Optional[str] = None) -> MemoryBackend:
+    """
+    Open the memory store, a .json path uses TinyDB and anything else SQLite.
+
+    Defaults to MEMORY_DB (memory.db). A new SQLite store imports db.json once.
+    """
+    db_path = db_path or os.getenv("MEMORY_DB", "memory.db")
+    if db_path.endswith(".json"):
+        return TinyDBBackend(db_path)
+    backend = SQLiteBackend(db_path)
+    backend.migrate_from_json(os.getenv("MEMORY_MIGRATE_FROM", "db.json"))
+    return backend
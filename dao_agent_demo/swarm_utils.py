@@ -0,0 +1,176 @@
+import json
+import time
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from typing import List
+
+from swarm import Swarm, Agent
+from swarm.types import Response, Result
+from swarm.util import debug_print
+
+from dao_agent_demo.trace_utils import tracer as default_tracer
+from dao_agent_demo.tool_utils import ToolSelector, schema_cache, is_parallel_safe, CTX_VARS_NAME
+
+
+class AgentSwarm(Swarm):
+    def __init__(self, client=None, tracer=default_tracer, tool_selector: ToolSelector = None, max_parallel_tools: int = 8):
+        """
+        Swarm client used by the DAO agents.
+
+        Records a span per agent turn (with token usage), per tool call and per handoff
+        in the active trace. With a tool selector, agents with many tools only get the
+        tools relevant to the current turn. Read-only tools marked with
+        tool_utils.parallel_safe run concurrently when a turn calls several of them.
+
+        Args:
+            client: Optional OpenAI client
+            tracer (Tracer): The tracer spans are recorded with
+            tool_selector (ToolSelector): Optional per turn tool selection
+            max_parallel_tools (int): Size of the pool parallel safe tool calls run on
+        """
+        super().__init__(client)
+        self.tracer = tracer
+        self.tool_selector = tool_selector
+        self.tool_pool = ThreadPoolExecutor(max_workers=max_parallel_tools, thread_name_prefix="tool")
+
+    def get_chat_completion(self, agent: Agent, history: List, context_variables: dict, model_override: str, stream: bool, debug: bool):
+        context_variables = defaultdict(str, context_variables)
+        instructions = (
+            agent.instructions(context_variables)
+            if callable(agent.instructions)
+            else agent.instructions
+        )
+        messages = [{"role": "system", "content": instructions}] + history
+        debug_print(debug, "Getting chat completion for...:", messages)
+
+        functions = agent.functions
+        if self.tool_selector:
+            functions = self.tool_selector.select(functions, history)
+        # schemas are built once per function set, context_variables already hidden from the model
+        tools = schema_cache.schemas(functions)
+
+        create_params = {
+            "model": model_override or agent.model,
+            "messages": messages,
+            "tools": list(tools) or None,
+            "tool_choice": agent.tool_choice,
+            "stream": stream,
+        }
+        if tools:
+            create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+        if stream:
+            # ask for a final usage chunk so streamed turns get token counts too
+            create_params["stream_options"] = {"include_usage": True}
+
+        self.tracer.set_current_agent(agent.name)
+        span = self.tracer.start_span("agent_turn", agent.name, tools=len(tools), tools_total=len(agent.functions))
+        try:
+            completion = self.client.chat.completions.create(**create_params)
+        except Exception as e:
+            span["error"] = str(e)[:200]
+            self.tracer.end_span(span)
+            raise
+
+        if stream:
+            return self._traced_stream(completion, span)
+        self._record_usage(span, completion.usage)
+        self.tracer.end_span(span)
+        return completion
+
+    def _traced_stream(self, completion, span):
+        """
+        Pass stream chunks through, timing the turn until the stream is consumed.
+        """
+        try:
+            for chunk in completion:
+                if chunk.usage:
+                    self._record_usage(span, chunk.usage)
+                # the usage chunk has no choices, swarm expects every chunk to have one
+                if not chunk.choices:
+                    continue
+                if "first_chunk_ms" not in span:
+                    span["first_chunk_ms"] = round((time.perf_counter() - span["_t0"]) * 1000, 2)
+                yield chunk
+        finally:
+            self.tracer.end_span(span)
+
+    def _record_usage(self, span, usage):
+        if usage is None:
+            return
+        span["prompt_tokens"] = usage.prompt_tokens
+        span["completion_tokens"] = usage.completion_tokens
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables: dict, debug: bool) -> Response:
+        function_map = {f.__name__: f for f in functions}
+        partial_response = Response(messages=[], agent=None, context_variables={})
+
+        # consecutive parallel safe (read-only) calls run together, anything else runs alone in order
+        batches = []
+        for tool_call in tool_calls:
+            func = function_map.get(tool_call.function.name)
+            if func is not None and is_parallel_safe(func) and batches and batches[-1]["parallel"]:
+                batches[-1]["calls"].append(tool_call)
+            else:
+                batches.append({"parallel": func is not None and is_parallel_safe(func), "calls": [tool_call]})
+
+        for batch in batches:
+            if len(batch["calls"]) > 1:
+                results = self._call_tools_concurrently(batch["calls"], function_map, context_variables, debug)
+            else:
+                results = [self._call_tool_or_error(batch["calls"][0], function_map, context_variables, debug)]
+
+            for tool_call, result in zip(batch["calls"], results):
+                name = tool_call.function.name
+                partial_response.messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "tool_name": name,
+                    "content": result.value,
+                })
+                partial_response.context_variables.update(result.context_variables)
+                if result.agent:
+                    self.tracer.event("handoff", f"{self.tracer.current_agent()} -> {result.agent.name}", tool=name)
+                    partial_response.agent = result.agent
+
+        return partial_response
+
+    def _call_tools_concurrently(self, tool_calls, function_map, context_variables: dict, debug: bool) -> List[Result]:
+        """
+        Run a batch of parallel safe tool calls on the shared pool, results in call order.
+        """
+        trace_id, agent_name = self.tracer.current_trace_id(), self.tracer.current_agent()
+
+        def run(tool_call):
+            # keep the spans of worker threads in the caller's trace
+            with self.tracer.bind(trace_id, agent_name):
+                return self._call_tool_or_error(tool_call, function_map, context_variables, debug)
+
+        futures = [self.tool_pool.submit(run, tool_call) for tool_call in tool_calls]
+        return [future.result() for future in futures]
+
+    def _call_tool_or_error(self, tool_call, function_map, context_variables: dict, debug: bool) -> Result:
+        name = tool_call.function.name
+        # handle missing tool case, answer with an error instead of running anything
+        if name not in function_map:
+            debug_print(debug, f"Tool {name} not found in function map.")
+            return Result(value=f"Error: Tool {name} not found.")
+        return self.call_tool(function_map[name], tool_call, context_variables, debug)
+
+    def call_tool(self, func, tool_call, context_variables: dict, debug: bool) -> Result:
+        """
+        Run a single tool call inside a tool_call span.
+        """
+        name = tool_call.function.name
+        args = json.loads(tool_call.function.arguments)
+        debug_print(debug, f"Processing tool call: {name} with arguments {args}")
+
+        # pass context_variables to agent functions
+        if CTX_VARS_NAME in inspect.signature(func).parameters:
+            args[CTX_VARS_NAME] = context_variables
+
+        with self.tracer.span("tool_call", name) as span:
+            raw_result = func(**args)
+            result = self.handle_function_result(raw_result, debug)
+            span["result_chars"] = len(result.value or "")
+        return result
@@ -0,0 +1,251 @@
+import re
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+from swarm.util import function_to_json
+
+# tools every selected subset keeps, so the agent can always answer and record what it did
+CORE_TOOLS = [
+    "cast_reply",
+    "cast_to_farcaster",
+    "mark_notification_as_acted",
+    "commit_memory",
+    "get_knowledge_by_keywords",
+]
+
+# intent groups: a keyword hit in the latest request pulls in the group's tools
+TOOL_GROUPS = {
+    "farcaster": {
+        "keywords": ["cast", "casts", "reply", "replies", "mention", "mentions", "notification", "notifications",
+                     "farcaster", "warpcast", "channel", "profile", "user", "fid"],
+        "tools": ["cast_to_farcaster", "cast_reply", "check_cast_replies", "check_recent_unacted_cast_notifications",
+                  "check_all_past_notifications", "mark_notification_as_acted", "check_recent_agent_casts",
+                  "check_recent_user_casts", "check_user_profile"],
+    },
+    "proposals": {
+        "keywords": ["proposal", "proposals", "vote", "votes", "voting", "governance", "passed", "governor"],
+        "tools": ["get_dao_proposals", "get_passed_dao_proposals", "get_dao_proposal", "get_proposal_count",
+                  "get_proposal_votes_data", "submit_dao_proposal_onchain", "vote_onchain"],
+    },
+    "summon": {
+        "keywords": ["summon", "launch", "token", "meme", "crowdfund", "crowd fund", "yeet", "yeeter", "dao", "presale"],
+        "tools": ["summon_meme_token_dao", "summon_crowd_fund_dao", "generate_art", "get_agent_address"],
+    },
+    "art": {
+        "keywords": ["art", "image", "picture", "draw", "avatar", "dall-e"],
+        "tools": ["generate_art"],
+    },
+    "wallet": {
+        "keywords": ["balance", "address", "wallet", "eth", "funds"],
+        "tools": ["get_balance", "get_agent_address"],
+    },
+    "memory": {
+        "keywords": ["remember", "memory", "memories", "recall", "forget", "knowledge", "learn",
+                     "what", "how", "why", "explain", "search", "find", "docs"],
+        "tools": ["commit_memory", "recall_memories", "get_knowledge_by_keywords", "search_knowledge"],
+    },
+}
+
+
+CTX_VARS_NAME = "context_variables"
+
+
+def parallel_safe(func: Callable) -> Callable:
+    """
+    Mark a tool as read-only so it can run concurrently with other parallel safe
+    tool calls of the same turn. State changing tools must not be marked.
+    """
+    func.parallel_safe = True
+    return func
+
+
+def is_parallel_safe(func: Callable) -> bool:
+    return getattr(func, "parallel_safe", False)
+
+
+def build_tool_schema(func: Callable) -> Dict:
+    """
+    Build the json function schema the model sees for a tool, without the
+    context_variables parameter swarm injects itself.
+    """
+    schema = function_to_json(func)
+    params = schema["function"]["parameters"]
+    params["properties"].pop(CTX_VARS_NAME, None)
+    if CTX_VARS_NAME in params["required"]:
+        params["required"].remove(CTX_VARS_NAME)
+    return schema
+
+
+class ToolSchemaCache:
+    def __init__(self, max_function_sets: int = 256):
+        """
+        Cache of tool json schemas keyed by function identity.
+
+        Swarm rebuilds every schema from signatures and docstrings on each completion.
+        Tools are module level functions that never change at runtime, so each schema is
+        built once and the list for a given agent function set is reused on every turn.
+        The cached schemas are shared and must not be mutated.
+
+        ToolSelector produces many distinct subsets, so the lists are kept for the
+        max_function_sets most recently used sets only, the per tool schemas for all tools.
+
+        Args:
+            max_function_sets (int): Function set lists kept, least recently used are evicted
+        """
+        self.max_function_sets = max_function_sets
+        self.schemas_by_function: Dict[Callable, Dict] = {}
+        self.sizes_by_function: Dict[Callable, int] = {}
+        self.schemas_by_functions: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def schema(self, func: Callable) -> Dict:
+        """
+        Get the schema of a tool.
+        """
+        schema = self.schemas_by_function.get(func)
+        if schema is None:
+            schema = build_tool_schema(func)
+            with self.lock:
+                self.schemas_by_function[func] = schema
+                self.sizes_by_function[func] = len(json.dumps(schema))
+        return schema
+
+    def size(self, func: Callable) -> int:
+        """
+        Get the serialized size of a tool schema in characters.
+        """
+        if func not in self.sizes_by_function:
+            self.schema(func)
+        return self.sizes_by_function[func]
+
+    def schemas(self, functions: List[Callable]) -> List[Dict]:
+        """
+        Get the schemas for an agent's function list, built once per function set.
+
+        Args:
+            functions (List[Callable]): The agent functions
+
+        Returns:
+            List[Dict]: The tool schemas in function order
+        """
+        key = tuple(functions)
+        with self.lock:
+            schemas = self.schemas_by_functions.get(key)
+            if schemas is not None:
+                self.schemas_by_functions.move_to_end(key)
+                self.stats["hits"] += 1
+                return schemas
+        # assembled from the per tool schemas, a miss builds nothing new for known tools
+        schemas = [self.schema(f) for f in functions]
+        with self.lock:
+            self.schemas_by_functions[key] = schemas
+            self.stats["misses"] += 1
+            while len(self.schemas_by_functions) > self.max_function_sets:
+                self.schemas_by_functions.popitem(last=False)
+                self.stats["evictions"] += 1
+        return schemas
+
+
+# shared by every AgentSwarm client (gm, player, operator and dao agents)
+schema_cache = ToolSchemaCache()
+
+
+def tool_schema(func: Callable) -> Dict:
+    """
+    Get the cached json function schema the model sees for a tool.
+    """
+    return schema_cache.schema(func)
+
+
+class ToolSelector:
+    def __init__(self, min_tools: int = 8, recent_messages: int = 6, core_tools: List[str] = CORE_TOOLS, groups: Dict = TOOL_GROUPS):
+        """
+        Pick the tools sent to the model on each turn.
+
+        Agents with more than min_tools functions only get the core tools, the tools of
+        the intent groups matched by the latest request and the tools used in the recent
+        history. Handoff agents with a few tools are left untouched.
+
+        Args:
+            min_tools (int): Agents with this many functions or fewer always get all of them
+            recent_messages (int): How many trailing history messages count as recent tool usage
+            core_tools (List[str]): Tool names always included
+            groups (Dict): Intent groups of keywords and tool names
+        """
+        self.min_tools = min_tools
+        self.recent_messages = recent_messages
+        self.core_tools = set(core_tools)
+        self.groups = [
+            (
+                [re.compile(r"\b" + re.escape(keyword) + r"\b") for keyword in group["keywords"]],
+                set(group["tools"]),
+            )
+            for group in groups.values()
+        ]
+        self.lock = threading.Lock()
+        self.stats = {"turns": 0, "tools_total": 0, "tools_sent": 0, "schema_chars_total": 0, "schema_chars_sent": 0}
+
+    def _latest_request(self, history: List[Dict]) -> str:
+        for message in reversed(history):
+            if message.get("role") == "user":
+                content = message.get("content")
+                return (content if isinstance(content, str) else json.dumps(content)).lower()
+        return ""
+
+    def _recent_tools(self, history: List[Dict]) -> set:
+        names = set()
+        for message in history[-self.recent_messages:]:
+            if message.get("role") == "tool" and message.get("tool_name"):
+                names.add(message["tool_name"])
+            for tool_call in message.get("tool_calls") or []:
+                names.add(tool_call["function"]["name"])
+        return names
+
+    def select(self, functions: List[Callable], history: List[Dict]) -> List[Callable]:
+        """
+        Select the tools for the next turn.
+
+        Args:
+            functions (List[Callable]): All functions of the agent
+            history (List[Dict]): The conversation history
+
+        Returns:
+            List[Callable]: The selected functions, in the agent's order
+        """
+        if len(functions) <= self.min_tools:
+            return functions
+
+        request = self._latest_request(history)
+        wanted = self.core_tools | self._recent_tools(history)
+        for patterns, tools in self.groups:
+            if any(pattern.search(request) for pattern in patterns):
+                wanted |= tools
+        selected = [f for f in functions if f.__name__ in wanted]
+
+        self._record(functions, selected)
+        return selected
+
+    def _record(self, functions: List[Callable], selected: List[Callable]):
+        total_chars = sum(schema_cache.size(f) for f in functions)
+        sent_chars = sum(schema_cache.size(f) for f in selected)
+        with self.lock:
+            self.stats["turns"] += 1
+            self.stats["tools_total"] += len(functions)
+            self.stats["tools_sent"] += len(selected)
+            self.stats["schema_chars_total"] += total_chars
+            self.stats["schema_chars_sent"] += sent_chars
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the prompt size saved by tool selection.
+        """
+        if not self.stats["turns"]:
+            return "tool selection: no turns yet"
+        saved_chars = self.stats["schema_chars_total"] - self.stats["schema_chars_sent"]
+        return (
+            f"tool selection: {self.stats['tools_sent']}/{self.stats['tools_total']} tools sent over "
+            f"{self.stats['turns']} turns, schema chars saved {saved_chars} (~{saved_chars // 4} tokens)"
+        )
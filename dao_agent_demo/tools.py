@@ -6,15 +6,18 @@ from typing import Union, List, Dict, TypedDict
 
 from openai import OpenAI
 from web3 import Web3
+from eth_utils import event_abi_to_log_topic
 from eth_account import Account
 
 
 from dao_agent_demo.farcaster_utils import FarcasterBot
-from dao_agent_demo.graph_utils import DaohausGraphData
+from dao_agent_demo.graph_utils import MultiDaoGraphData, TARGET_DAOS
 from dao_agent_demo.image_utils import ImageThumbnailer
-from dao_agent_demo.memory_retention_utils import MemoryRetention
+from dao_agent_demo.memory_retention_utils import MemoryRetention, DEFAULT_IMPORTANCE, NOTIFICATION_LOOKBACK
 
 from dao_agent_demo.prompt_helpers import get_instructions_from_json, get_character_json
+from dao_agent_demo.tool_utils import parallel_safe
+from dao_agent_demo.cache_utils import tool_cache
 
 from dao_agent_demo.dao_summon_helpers import (
     assemble_meme_summoner_args, 
@@ -33,6 +36,12 @@ with open("abis/registrar_abi.json", "r") as abi_file:
 with open("abis/baal_abi.json", "r") as abi_file:
     baal_abi = json.load(abi_file)
 
+# SubmitProposal logs of every watched DAO are fetched with one eth_getLogs call
+SUBMIT_PROPOSAL_ABI = next(item for item in baal_abi if item.get("type") == "event" and item.get("name") == "SubmitProposal")
+SUBMIT_PROPOSAL_TOPIC = Web3.to_hex(event_abi_to_log_topic(SUBMIT_PROPOSAL_ABI))
+# providers reject eth_getLogs over large block ranges, longer ranges are scanned in chunks
+GET_LOGS_MAX_BLOCKS = int(os.getenv("GET_LOGS_MAX_BLOCKS", 2000))
+
 with open("abis/yeet24_hos_summoner_abi.json", "r") as abi_file:
     yeet24_hos_summoner_abi = json.load(abi_file)
 
@@ -69,6 +78,7 @@ print(f"Wallet Address: {agent_wallet.address}")
 
 
 # Function to get the balance of a specific asset
+@parallel_safe
 def get_balance(context_variables):
     """
     Get the eth balance of a specific asset in the agent's wallet.
@@ -83,6 +93,7 @@ def get_balance(context_variables):
     return f"Current eth balance: {eth_balance}"
 
 # Function to get the address of the current agent
+@parallel_safe
 def get_agent_address():
     """
     Get the address of the current agent's wallet.
@@ -131,7 +142,23 @@ def generate_art(prompt) -> str:
         return f"Error generating artwork: {str(e)}"
 
 # functions to interact with daos
-def vote_onchain(context_variables, proposal_id: str, vote: str) -> str:
+def resolve_dao_address(dao_address: str = None) -> str:
+    """
+    Get the watched DAO a tool acts on.
+
+    Args:
+        dao_address (str): The requested DAO, None for the main target DAO
+
+    Returns:
+        str: The lower case DAO address, None if the DAO is not watched
+    """
+    if not dao_address:
+        return TARGET_DAOS[0] if TARGET_DAOS else None
+    dao_address = dao_address.lower()
+    return dao_address if dao_address in TARGET_DAOS else None
+
+@tool_cache.invalidates("dao")
+def vote_onchain(context_variables, proposal_id: str, vote: str, dao_address: str = None) -> str:
     """
     Vote on a DAO proposal.
 
@@ -139,6 +166,7 @@ def vote_onchain(context_variables, proposal_id: str, vote: str) -> str:
         context_variables (object): The context variables.
         proposal_id (str): The proposal ID.
         vote (str): The vote. Yes/No/Abstrain
+        dao_address (str): The DAO of the proposal, defaults to the main target DAO.
 
     Returns:
         str: Success or error message.
@@ -157,7 +185,9 @@ def vote_onchain(context_variables, proposal_id: str, vote: str) -> str:
         AGENT_ADDR = os.getenv(f"{context_variables['agent_key']}_AGENT_ADDR")
         PRIVATE_KEY = os.getenv(f"{context_variables['agent_key']}_AGENT_PRIVATE_KEY")
 
-    dao_address = os.getenv("TARGET_DAO")
+    if not resolve_dao_address(dao_address):
+        return f"Error: {dao_address} is not one of the watched DAOs"
+    dao_address = resolve_dao_address(dao_address)
     if not isinstance(dao_address, str) or not isinstance(proposal_id, str) or not isinstance(bool_vote, bool):
         print("Invalid input types")
         return "Invalid input types"
@@ -382,7 +412,8 @@ def summon_crowd_fund_dao(dao_name, token_symbol, image, description, verified_e
 
 
 # function to submit a proposal
-def submit_dao_proposal_onchain(context_variables, proposal_title: str, proposal_description: str, proposal_link: str) -> str:
+@tool_cache.invalidates("dao")
+def submit_dao_proposal_onchain(context_variables, proposal_title: str, proposal_description: str, proposal_link: str, dao_address: str = None) -> str:
     """
     Submit a DAO Proposal. 
 
@@ -391,6 +422,7 @@ def submit_dao_proposal_onchain(context_variables, proposal_title: str, proposal
         proposal_title (str): The proposal title.
         proposal_description (str): The proposal description.
         proposal_link (str): The proposal link.
+        dao_address (str): The DAO to submit to, defaults to the main target DAO.
 
     Returns:
         str: Success or error message.
@@ -401,7 +433,9 @@ def submit_dao_proposal_onchain(context_variables, proposal_title: str, proposal
     if context_variables and 'agent_key' in context_variables:
         AGENT_ADDR = os.getenv(f"{context_variables['agent_key']}_AGENT_ADDR")
         PRIVATE_KEY = os.getenv(f"{context_variables['agent_key']}_AGENT_PRIVATE_KEY")
-    DAO_ADDRESS = os.getenv("TARGET_DAO")
+    if not resolve_dao_address(dao_address):
+        return f"Error: {dao_address} is not one of the watched DAOs"
+    DAO_ADDRESS = resolve_dao_address(dao_address)
     if not isinstance(DAO_ADDRESS, str) or not isinstance(proposal_title, str):
         return "Invalid input types"
 
@@ -478,10 +512,15 @@ def submit_dao_proposal_onchain(context_variables, proposal_title: str, proposal
         return f"Error Submitting Proposal in DAO: {truncated_message}"
 
     
-def get_dao_proposals() -> str:
+@parallel_safe
+@tool_cache.memoize(ttl=30, tags=("dao",))
+def get_dao_proposals(dao_address: str = None) -> str:
     """
     Get all DAO proposals.
 
+    Args:
+        dao_address (str): The DAO, defaults to the main target DAO.
+
     Returns:
         str: DAO proposals data
     
@@ -489,15 +528,20 @@ def get_dao_proposals() -> str:
 
     try:
         # Construct the query
-        proposals = dh_graph.get_proposals_data()
+        proposals = dh_graph.get(dao_address).get_proposals_data()
         return proposals
     except Exception as e:
         return f"Error getting DAO proposals: {str(e)}"
     
-def get_passed_dao_proposals() -> str:
+@parallel_safe
+@tool_cache.memoize(ttl=120, tags=("dao",))
+def get_passed_dao_proposals(dao_address: str = None) -> str:
     """
     Get all passed DAO proposals.
 
+    Args:
+        dao_address (str): The DAO, defaults to the main target DAO.
+
     Returns:
         str: DAO passed proposals data
     
@@ -505,55 +549,66 @@ def get_passed_dao_proposals() -> str:
 
     try:
         # Construct the query
-        proposals = dh_graph.get_passed_proposals_data()
+        proposals = dh_graph.get(dao_address).get_passed_proposals_data()
         return proposals
     except Exception as e:
         return f"Error getting DAO proposals: {str(e)}"
 
-def get_dao_proposal(proposal_id: int) -> str:
+@parallel_safe
+@tool_cache.memoize(ttl=30, tags=("dao",))
+def get_dao_proposal(proposal_id: int, dao_address: str = None) -> str:
     """
     Get a specific DAO proposal.
 
     Args:
         proposal_id (str): The proposal ID.
+        dao_address (str): The DAO, defaults to the main target DAO.
 
     Returns:
         str: DAO proposal data
     """
     try:
         # Construct the query
-        proposal = dh_graph.get_proposal_data(proposal_id)
+        proposal = dh_graph.get(dao_address).get_proposal_data(proposal_id)
         return proposal
     except Exception as e:
         return f"Error getting DAO proposal: {str(e)}"
 
-def get_proposal_votes_data(proposal_id: int) -> str:
+@parallel_safe
+@tool_cache.memoize(ttl=15, tags=("dao",))
+def get_proposal_votes_data(proposal_id: int, dao_address: str = None) -> str:
     """
     Get proposal votes data
 
     Args:
         proposal_id (int): The proposal ID
+        dao_address (str): The DAO, defaults to the main target DAO
 
     Returns:
         str: Proposal votes data
     """
     try:
         # Construct the query
-        votes = dh_graph.get_proposal_votes_data(proposal_id)
+        votes = dh_graph.get(dao_address).get_proposal_votes_data(proposal_id)
         return votes
     except Exception as e:
         return f"Error getting proposal votes data: {str(e)}"
 
-def get_proposal_count() -> str:
+@parallel_safe
+@tool_cache.memoize(ttl=30, tags=("dao",))
+def get_proposal_count(dao_address: str = None) -> str:
     """
     Get the current proposal count
 
+    Args:
+        dao_address (str): The DAO, defaults to the main target DAO
+
     Returns:
         str: the count
     """
     try:
         # Construct the query
-        proposals = dh_graph.get_proposal_count()
+        proposals = dh_graph.get(dao_address).get_proposal_count()
         return proposals
     except Exception as e:
         return f"Error getting proposals count: {str(e)}"
@@ -563,32 +618,106 @@ def check_recent_unacted_proposals():
     Check for recent proposals that have not been acted on.
     Returns a list of unacted proposals
     """
+    return check_all_unacted_proposals() or None
+
+def check_all_unacted_proposals() -> list:
+    """
+    Get every proposal in voting of the watched DAOs that has not been acted on, one
+    record per proposal (with its dao_address), ordered by the closest voting deadline first.
+
+    Returns:
+        list: Unacted proposal records
+    """
     # Get proposals from graph
     proposals_json = dh_graph.get_proposals_in_voting()
-    
+
     # Parse the JSON string into a Python object
     try:
         proposals = json.loads(proposals_json)
     except json.JSONDecodeError as e:
         print(f"Error parsing proposals JSON: {e}")
-        return None
+        return []
+    if not proposals or not isinstance(proposals, list):
+        return []
 
-    # Get already acted proposals
-    acted_proposals = memory_retention.get_acted_proposals()
-    
-    # Filter out proposals we've already acted on
-    if proposals and isinstance(proposals, list):
-        return [p for p in proposals if p['proposals_proposalId'] not in acted_proposals]
-    
-    return None
+    # the votes merge gives one row per vote, keep the first row of each proposal
+    unacted = {}
+    for p in proposals:
+        key = (p.get('proposals_dao_id') or dh_graph.default_dao, str(p['proposals_proposalId']))
+        if key not in unacted and not memory_retention.is_proposal_acted(key[1], key[0]):
+            unacted[key] = {**p, 'dao_address': key[0]}
+    return sorted(unacted.values(), key=lambda p: p.get('proposals_votingEnds') or 0)
+
+def iter_proposal_events(from_block: int = None, max_blocks: int = None):
+    """
+    Scan SubmitProposal events emitted by the watched DAOs since from_block, at most
+    max_blocks per eth_getLogs call.
+
+    Args:
+        from_block (int): First block to scan, None starts at the current block
+        max_blocks (int): Block range of one call, defaults to GET_LOGS_MAX_BLOCKS
+
+    Yields:
+        tuple: (proposal records of a chunk, next block to scan), a caller can save the
+            cursor after each chunk so a failure does not rescan the whole range
+    """
+    latest_block = w3.eth.block_number
+    if not TARGET_DAOS or from_block is None or from_block > latest_block:
+        yield [], (latest_block + 1 if from_block is None else from_block)
+        return
+
+    max_blocks = max(max_blocks or GET_LOGS_MAX_BLOCKS, 1)
+    addresses = [Web3.to_checksum_address(dao_address) for dao_address in TARGET_DAOS]
+    submit_proposal = w3.eth.contract(abi=baal_abi).events.SubmitProposal()
+    while from_block <= latest_block:
+        to_block = min(from_block + max_blocks - 1, latest_block)
+        logs = w3.eth.get_logs({
+            "address": addresses,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [SUBMIT_PROPOSAL_TOPIC],
+        })
+        proposals = []
+        for log in logs:
+            event = submit_proposal.process_log(log)
+            proposals.append({
+                "proposals_proposalId": str(event["args"]["proposal"]),
+                "proposals_details": event["args"]["details"],
+                "dao_address": event["address"].lower(),
+                "blockNumber": event["blockNumber"],
+            })
+        from_block = to_block + 1
+        yield proposals, from_block
+
+def get_new_proposal_events(from_block: int = None) -> tuple:
+    """
+    Get SubmitProposal events emitted by the watched DAOs since from_block.
+    Proposals show up here before the subgraph has indexed them.
+
+    Args:
+        from_block (int): First block to scan, None starts at the current block
+
+    Returns:
+        tuple: (list of proposal records shaped like the subgraph ones, next block to scan)
+    """
+    proposals, next_block = [], from_block
+    for chunk, next_block in iter_proposal_events(from_block):
+        proposals.extend(chunk)
+    return proposals, next_block
 
-def mark_proposal_as_acted(proposal_id: int):
+def mark_proposal_as_acted(proposal_id: str, actor: str = "agent", dao_address: str = None):
     """
     Mark a proposal as acted on.
+
+    Args:
+        proposal_id (str): The proposal ID
+        actor (str): Who acted on it
+        dao_address (str): The DAO of the proposal, defaults to the main target DAO
     """
-    return memory_retention.mark_proposal_as_acted(proposal_id)
+    return memory_retention.mark_proposal_as_acted(str(proposal_id), actor, (dao_address or TARGET_DAOS[0]).lower())
 
 # function to cast to farcaster
+@tool_cache.invalidates("casts")
 def cast_to_farcaster(content: str, channel_id: str = None) -> str:
     """
     Cast a message to Warpcast.
@@ -605,6 +734,7 @@ def cast_to_farcaster(content: str, channel_id: str = None) -> str:
         return f"Successfully cast to farcaster <debug mode>. Content: {content}, Channel ID: {channel_id}"
     return farcaster_bot.post_cast(content, channel_id)
 
+@parallel_safe
 def check_cast_replies():
     """
     Check recent farcaster replies.
@@ -618,6 +748,7 @@ def check_cast_replies():
 
     return replies
 
+@parallel_safe
 def check_all_past_notifications():
     """
     this will return all notification from farcaster
@@ -633,24 +764,38 @@ def check_recent_unacted_cast_notifications():
     Returns:
         str: Formatted string of recent notifications
     """
+    new_notifications = check_all_unacted_cast_notifications()
+    if isinstance(new_notifications, str):  # If an error occurred
+        return new_notifications
+    # Return the latest notification based on 'age_in_sec', or None if no notifications exist
+    if new_notifications:
+        return min(new_notifications, key=lambda n: n['age_in_sec'])
+    else:
+        return None
+
+def check_all_unacted_cast_notifications(max_age_in_sec: int = NOTIFICATION_LOOKBACK):
+    """
+    Get every farcaster notification that is not acted on and not older than max_age_in_sec,
+    mentions first, then replies, oldest first within each type.
 
+    Returns:
+        list: Unacted notifications, or an error string
+    """
     all_notifications = farcaster_bot.get_notifications()
     if isinstance(all_notifications, str):  # If an error occurred
         return all_notifications
-    acted_notifications = memory_retention.get_acted_notifications()
-    print("acted notes", acted_notifications)
-    # If no acted notifications exist, create an empty set
-    acted_hashes = {item.get('hash') for item in acted_notifications if 'hash' in item} if acted_notifications else set()
-    print("acted hashes", acted_hashes)
     # Filter out already acted notifications
-    new_notifications = [n for n in all_notifications if n['hash'] not in acted_hashes and n['age_in_sec'] <= 86400]
-    print("new notes", new_notifications)
-    # Return the oldest notification based on 'age_in_sec', or None if no notifications exist
-    if new_notifications:
-        print("oldest, latest", min(new_notifications, key=lambda n: n['age_in_sec']))
-        return min(new_notifications, key=lambda n: n['age_in_sec'])
-    else:
-        return None
+    new_notifications = [
+        n for n in all_notifications
+        if n['age_in_sec'] <= max_age_in_sec and not memory_retention.is_notification_acted(n['hash'])
+    ]
+    return sorted(new_notifications, key=lambda n: (notification_priority(n), -n['age_in_sec']))
+
+def notification_priority(notification: dict) -> int:
+    """
+    Priority of a notification, lower is handled first.
+    """
+    return 0 if notification.get('type') == 'mention' else 2
 
 def mark_notification_as_acted(notification_hash: str):
 
@@ -662,6 +807,7 @@ def mark_notification_as_acted(notification_hash: str):
     """
     return memory_retention.mark_notification_as_acted(notification_hash)
 
+@tool_cache.invalidates("casts")
 def cast_reply(content: str, parentHash: str, parent_fid: int):
     """
     Cast a message to Warpcast as a reply to another cast.
@@ -677,6 +823,7 @@ def cast_reply(content: str, parentHash: str, parent_fid: int):
     response = farcaster_bot.post_cast(content, parent=parentHash, parent_fid=parent_fid)
     return response
 
+@parallel_safe
 def check_recent_agent_casts():
     """
     Get recent casts from the agent.
@@ -687,6 +834,8 @@ def check_recent_agent_casts():
     response = farcaster_bot.get_casts()
     return response
 
+@parallel_safe
+@tool_cache.memoize(ttl=60, tags=("casts",))
 def check_recent_user_casts(fid: str):
     """
     Get recent casts from the agent.
@@ -697,6 +846,8 @@ def check_recent_user_casts(fid: str):
     response = farcaster_bot.get_casts(fid)
     return response
 
+@parallel_safe
+@tool_cache.memoize(ttl=300, tags=("profiles",))
 def check_user_profile(fid: str):
     """
     Get user profile.
@@ -709,11 +860,21 @@ def check_user_profile(fid: str):
 
 # Functions to interact with memory retention
 # def store_memory(self, memory: Dict) -> str:
-def commit_memory(memory:str):
+def commit_memory(memory:str, importance: int = 3):
     """
     Store a memory
+
+    Args:
+        memory (str): What to remember.
+        importance (int): 1 (trivia) to 5 (critical), important memories are recalled first.
     """
-    return memory_retention.store_memory({"type": "memory", "content": memory})
+    try:
+        importance = min(max(int(importance), 1), 5)
+    except (TypeError, ValueError):
+        # the model sometimes answers with words ("high"), the memory is still worth keeping
+        importance = DEFAULT_IMPORTANCE
+    return memory_retention.store_memory({"type": "memory", "content": memory, "importance": importance})
+@parallel_safe
 def get_all_memories():
     """
     Get all memories
@@ -729,11 +890,29 @@ def delete_memory(query):
     Delete a memory
     """
     return memory_retention.delete_memory(query)
+@parallel_safe
 def get_memory_count():
     """
     Get the count of memories
     """
     return memory_retention.get_memory_count()
+@parallel_safe
+def recall_memories(query: str = "", record_type: str = "", limit: int = 10, cursor: str = "", max_chars: int = 2000) -> str:
+    """
+    Recall stored memories ranked by relevance to the query, recency and importance, one page at a time.
+
+    Args:
+        query (str): What to recall, in plain words. Empty for the most recent and important memories.
+        record_type (str): Only memories of this type (ex: memory), notification or proposal for what was already acted on. Empty for all memories.
+        limit (int): How many memories per page.
+        cursor (str): The next cursor of the previous page, empty for the first page.
+        max_chars (int): Size limit of the page in characters.
+
+    Returns:
+        str: The page of memories and the cursor of the next page
+    """
+    return memory_retention.recall_memories(query, record_type or None, int(limit), cursor or None, int(max_chars))
+@parallel_safe
 def get_knowledge_by_keywords(keywords: str) -> str:
     """
     get knowledge content from keywords
@@ -747,10 +926,27 @@ def get_knowledge_by_keywords(keywords: str) -> str:
     print(keywords.lower().strip().split())
     return memory_retention.query_by_keywords(keywords.lower().strip().split())
 
+@parallel_safe
+def search_knowledge(query: str, k: int = 5, max_chars: int = 3000) -> str:
+    """
+    Search the knowledge base by meaning and wording, returns the most relevant passages with their source.
+
+    Args:
+        query (str): What to look for, in plain words.
+        k (int): How many passages to return at most.
+        max_chars (int): Size limit of the answer in characters.
+
+    Returns:
+        str: The ranked passages
+    """
+    return memory_retention.search_knowledge(query, int(k), int(max_chars))
+
 # Initialize FarcvasterBot with your credentials
 farcaster_bot = FarcasterBot()
 # init the graph
-dh_graph = DaohausGraphData()
+# one subgrounds client and schema for every watched DAO
+dh_graph = MultiDaoGraphData()
 # dh_graph = None
 # init memory retention
-memory_retention = MemoryRetention()
+# acted proposals recorded before multi dao support belong to the main DAO
+memory_retention = MemoryRetention(default_dao=TARGET_DAOS[0] if TARGET_DAOS else None)
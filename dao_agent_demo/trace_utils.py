@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import threading
+import argparse
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class Tracer:
+    def __init__(self, trace_file: Optional[str] = None):
+        """
+        Initialize the request tracer.
+
+        Every notification or proposal handled by the agents gets a trace id. Agent turns,
+        tool calls and handoffs inside that request are recorded as spans and appended to a
+        local jsonl trace file.
+
+        Args:
+            trace_file (Optional[str]): Path of the jsonl trace file (TRACE_FILE env or traces.jsonl)
+        """
+        self.trace_file = trace_file or os.getenv("TRACE_FILE", "traces.jsonl")
+        self.enabled = not os.getenv("TRACE_DISABLED")
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+
+    def current_trace_id(self) -> Optional[str]:
+        """
+        Get the trace id active in the current thread.
+        """
+        return getattr(self.local, "trace_id", None)
+
+    def current_agent(self) -> Optional[str]:
+        """
+        Get the name of the agent whose turn ran last in the current trace.
+        """
+        return getattr(self.local, "agent", None)
+
+    def set_current_agent(self, agent_name: str):
+        self.local.agent = agent_name
+
+    @contextmanager
+    def bind(self, trace_id: Optional[str], agent_name: Optional[str] = None):
+        """
+        Bind an existing trace to the current thread (used by worker threads).
+        """
+        previous = (self.current_trace_id(), self.current_agent())
+        self.local.trace_id = trace_id
+        self.local.agent = agent_name
+        try:
+            yield
+        finally:
+            self.local.trace_id, self.local.agent = previous
+
+    @contextmanager
+    def trace(self, kind: str, ref: Optional[str] = None):
+        """
+        Start a new trace for one incoming request.
+
+        Args:
+            kind (str): The request kind (notification, proposal, phase, ...)
+            ref (Optional[str]): A reference to the source item (cast hash, proposal id, ...)
+
+        Yields:
+            str: The trace id
+        """
+        trace_id = uuid.uuid4().hex[:16]
+        with self.bind(trace_id):
+            span = self.start_span("trace", kind, ref=ref)
+            try:
+                yield trace_id
+            except Exception as e:
+                span["error"] = str(e)[:200]
+                raise
+            finally:
+                self.end_span(span)
+
+    def start_span(self, kind: str, name: str, **attrs) -> Dict:
+        """
+        Start a span in the current trace. The span must be finished with end_span.
+
+        Args:
+            kind (str): Span kind (trace, agent_turn, tool_call, handoff)
+            name (str): Span name (agent name, tool name, ...)
+
+        Returns:
+            Dict: The span record, extra attributes can be set on it before it ends
+        """
+        span = {
+            "trace_id": self.current_trace_id(),
+            "span_id": uuid.uuid4().hex[:8],
+            "kind": kind,
+            "name": name,
+            "agent": self.current_agent(),
+            "start": time.time(),
+            "_t0": time.perf_counter(),
+        }
+        span.update(attrs)
+        return span
+
+    def end_span(self, span: Dict):
+        """
+        Finish a span and write it to the trace file.
+        """
+        if "duration_ms" not in span:
+            span["duration_ms"] = round((time.perf_counter() - span.pop("_t0")) * 1000, 2)
+        span.pop("_t0", None)
+        self._write(span)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """
+        Record a span around a block of code.
+        """
+        span = self.start_span(kind, name, **attrs)
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = str(e)[:200]
+            raise
+        finally:
+            self.end_span(span)
+
+    def event(self, kind: str, name: str, **attrs):
+        """
+        Record a zero duration span (ex: a handoff between agents).
+        """
+        span = self.start_span(kind, name, **attrs)
+        span["duration_ms"] = 0.0
+        self.end_span(span)
+
+    def _write(self, span: Dict):
+        # spans outside of a trace (ex: chat mode) are not recorded
+        if not self.enabled or span.get("trace_id") is None:
+            return
+        line = json.dumps(span, default=str)
+        with self.write_lock:
+            with open(self.trace_file, "a") as trace_file:
+                trace_file.write(line + "\n")
+
+
+def load_spans(trace_file: str) -> List[Dict]:
+    """
+    Load all spans from a trace file, skipping malformed lines.
+    """
+    spans = []
+    with open(trace_file, "r") as file:
+        for line in file:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_traces(trace_file: str, top: int = 10) -> str:
+    """
+    Build a latency breakdown of the recorded traces.
+
+    Args:
+        trace_file (str): Path of the jsonl trace file
+        top (int): Number of slowest traces to list
+
+    Returns:
+        str: The formatted summary
+    """
+    spans = load_spans(trace_file)
+    traces = [s for s in spans if s["kind"] == "trace"]
+    if not traces:
+        return f"No traces found in {trace_file}"
+
+    # aggregate by (kind, name) so each hop / tool shows up on its own line
+    groups: Dict[tuple, Dict] = {}
+    spans_by_trace: Dict[str, List[Dict]] = {}
+    for span in spans:
+        spans_by_trace.setdefault(span["trace_id"], []).append(span)
+        if span["kind"] == "trace":
+            continue
+        group = groups.setdefault((span["kind"], span["name"]), {"durations": [], "prompt_tokens": 0, "completion_tokens": 0, "errors": 0})
+        group["durations"].append(span.get("duration_ms", 0.0))
+        group["prompt_tokens"] += span.get("prompt_tokens") or 0
+        group["completion_tokens"] += span.get("completion_tokens") or 0
+        group["errors"] += 1 if span.get("error") else 0
+
+    trace_durations = [t["duration_ms"] for t in traces]
+    lines = [
+        f"Traces: {len(traces)}  avg {sum(trace_durations) / len(trace_durations):.0f} ms  "
+        f"p50 {_percentile(trace_durations, 50):.0f} ms  p95 {_percentile(trace_durations, 95):.0f} ms",
+        "",
+        f"{'kind':<12}{'name':<40}{'count':>7}{'avg ms':>10}{'p95 ms':>10}{'total ms':>12}{'tokens in/out':>18}{'errors':>8}",
+    ]
+    ordered_groups = sorted(groups.items(), key=lambda item: sum(item[1]["durations"]), reverse=True)
+    for (kind, name), group in ordered_groups:
+        durations = group["durations"]
+        tokens = f"{group['prompt_tokens']}/{group['completion_tokens']}"
+        lines.append(
+            f"{kind:<12}{str(name)[:39]:<40}{len(durations):>7}{sum(durations) / len(durations):>10.0f}"
+            f"{_percentile(durations, 95):>10.0f}{sum(durations):>12.0f}{tokens:>18}{group['errors']:>8}"
+        )
+
+    lines.extend(["", f"Slowest {top} traces:"])
+    for trace in sorted(traces, key=lambda t: t["duration_ms"], reverse=True)[:top]:
+        trace_spans = spans_by_trace.get(trace["trace_id"], [])
+        turns = [s for s in trace_spans if s["kind"] == "agent_turn"]
+        hops = [s["name"] for s in trace_spans if s["kind"] == "handoff"]
+        tokens = sum((s.get("prompt_tokens") or 0) + (s.get("completion_tokens") or 0) for s in turns)
+        lines.append(
+            f"{trace['trace_id']} {trace['name']:<12} {trace['duration_ms']:>10.0f} ms  "
+            f"turns {len(turns):>2}  tokens {tokens:>6}  hops {' | '.join(hops) or '-'}"
+        )
+    return "\n".join(lines)
+
+
+# shared tracer used by the swarm client and the run loops
+tracer = Tracer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize agent request traces.")
+    parser.add_argument(
+        '--trace_file',
+        type=str,
+        default=os.getenv("TRACE_FILE", "traces.jsonl"),
+        help="Path to the trace file (default: 'traces.jsonl')"
+    )
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest traces to list")
+    args = parser.parse_args()
+    print(summarize_traces(args.trace_file, args.top))
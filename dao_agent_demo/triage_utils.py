@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import threading
+from typing import Dict, Optional, Tuple
+
+from dao_agent_demo.character_registry import character_registry
+
+
+class FastPathTriage:
+    def __init__(self, file_path: str = "operators/alderman.json", operators: Optional[Dict[str, str]] = None):
+        """
+        Deterministic triage in front of the Alderman.
+
+        Scores an incoming request against the weighted keyword rules declared under
+        "TriageRules" in the alderman operator file. When one route clearly wins the
+        request goes straight to that operator, otherwise it falls back to the Alderman
+        LLM turn.
+
+        Rules routing to an operator that is not known or has no operator file are
+        dropped with a warning, their requests fall back to the Alderman.
+
+        Args:
+            file_path (str): Operator file holding the TriageRules
+            operators (Optional[Dict[str, str]]): Operator name -> operator file of the routes
+                that can be taken, defaults to the json files next to file_path
+        """
+        self.file_path = file_path
+        self.operators = operators
+        self.compiled_for = None
+        self.rules = []
+        self.min_score = 2
+        self.min_margin = 2
+        self.lock = threading.Lock()
+        self.stats = {"total": 0, "fallback": 0, "routes": {}}
+
+    def _compile(self):
+        """
+        (Re)compile the keyword patterns when the operator file changed.
+        """
+        config = character_registry.get_json(self.file_path).get("TriageRules", {})
+        # the registry returns the same object until the file changes on disk
+        if config is self.compiled_for:
+            return
+        self.min_score = config.get("min_score", 2)
+        self.min_margin = config.get("min_margin", 2)
+        self.rules = []
+        for rule in config.get("rules", []):
+            operator_file = self._operator_file(rule["route"])
+            if not operator_file or not os.path.exists(character_registry.resolve(operator_file)):
+                print(f"\033[91mTriage rule for unknown operator '{rule['route']}' ignored\033[0m")
+                continue
+            patterns = [
+                (re.compile(r"\b" + re.escape(keyword.lower()) + r"\b"), weight)
+                for keyword, weight in rule.get("keywords", {}).items()
+            ]
+            self.rules.append({
+                "route": rule["route"].lower(),
+                "min_words": rule.get("min_words", 0),
+                "patterns": patterns,
+            })
+        self.compiled_for = config
+
+    def _operator_file(self, route: str) -> Optional[str]:
+        route = route.lower()
+        if self.operators is not None:
+            return self.operators.get(route)
+        return os.path.join(os.path.dirname(self.file_path), f"{route}.json")
+
+    def score(self, text: str) -> Dict[str, int]:
+        """
+        Score a request against every rule.
+
+        Args:
+            text (str): The request text
+
+        Returns:
+            Dict[str, int]: Score per route
+        """
+        self._compile()
+        text = text.lower()
+        word_count = len(text.split())
+        scores = {}
+        for rule in self.rules:
+            if word_count < rule["min_words"]:
+                continue
+            score = sum(weight for pattern, weight in rule["patterns"] if pattern.search(text))
+            if score:
+                scores[rule["route"]] = score
+        return scores
+
+    def classify(self, request) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Pick a route for a request if the decision is unambiguous.
+
+        Args:
+            request (str | dict): The request text, or a notification dict with a 'text' field
+
+        Returns:
+            Tuple[Optional[str], Dict[str, int]]: The operator name (None to fall back to the Alderman) and the scores
+        """
+        if isinstance(request, dict):
+            text = request.get("text") or json.dumps(request)
+        else:
+            text = str(request)
+        scores = self.score(text)
+        ranked = sorted(scores.values(), reverse=True)
+        best = ranked[0] if ranked else 0
+        runner_up = ranked[1] if len(ranked) > 1 else 0
+
+        route = None
+        if best >= self.min_score and best - runner_up >= self.min_margin:
+            route = max(scores, key=scores.get)
+
+        with self.lock:
+            self.stats["total"] += 1
+            if route:
+                self.stats["routes"][route] = self.stats["routes"].get(route, 0) + 1
+            else:
+                self.stats["fallback"] += 1
+        return route, scores
+
+    def hit_rate(self) -> float:
+        """
+        Fraction of requests routed without an Alderman turn.
+        """
+        if not self.stats["total"]:
+            return 0.0
+        return (self.stats["total"] - self.stats["fallback"]) / self.stats["total"]
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the fast path hit rates.
+        """
+        routes = " ".join(f"{route}={count}" for route, count in sorted(self.stats["routes"].items()))
+        hits = self.stats["total"] - self.stats["fallback"]
+        return (
+            f"triage fast path {hits}/{self.stats['total']} ({self.hit_rate():.0%}) "
+            f"{routes} alderman={self.stats['fallback']}"
+        )
@@ -0,0 +1,385 @@
+import os
+import re
+import json
+import zlib
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dao_agent_demo.lock_utils import FileLock
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=1 << 18)
+def feature_hash(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode())
+
+
+@lru_cache(maxsize=1 << 16)
+def char_ngrams(word: str, n: int) -> tuple:
+    padded = f"<{word}>"
+    return tuple("#" + padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class HashingVectorizer:
+    def __init__(self, dim: int = 512, char_ngram: int = 3, char_weight: float = 0.5):
+        """
+        Offline text embedding with the hashing trick, no model, network or GPU.
+
+        Word unigrams, word bigrams and character n-grams of each word are hashed into
+        dim signed buckets, term frequencies are log scaled and the vector is L2
+        normalized, so a dot product is the cosine similarity. Character n-grams make
+        "proposal" and "proposals" land close together.
+
+        Args:
+            dim (int): Vector size
+            char_ngram (int): Character n-gram length, 0 disables them
+            char_weight (float): Weight of character n-grams relative to words
+        """
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def _features(self, text: str) -> Dict[str, float]:
+        words = WORD_PATTERN.findall(text.lower())
+        word_counts = Counter(words)
+        features: Dict[str, float] = dict(word_counts)
+        features.update(Counter(map(" ".join, zip(words, words[1:]))))
+        if self.char_ngram:
+            # n-grams of each distinct word are cached, only weighted by its count here
+            grams: Counter = Counter()
+            for word, count in word_counts.items():
+                for gram in char_ngrams(word, self.char_ngram):
+                    grams[gram] += count
+            features.update((gram, count * self.char_weight) for gram, count in grams.items())
+        return features
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Returns:
+            np.ndarray: (len(texts), dim) float32 matrix of unit vectors (zero rows for empty texts)
+        """
+        rows, digests, counts = [], [], []
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            rows.extend([row] * len(features))
+            digests.extend(map(feature_hash, features))
+            counts.extend(features.values())
+        digests = np.asarray(digests, dtype=np.uint32)
+        signs = np.where(digests & 0x80000000, 1.0, -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), digests % self.dim),
+                  signs * (1.0 + np.log(np.asarray(counts, dtype=np.float64))))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        vectorizer: Optional[HashingVectorizer] = None,
+        fields: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Cosine similarity search over hashed text vectors kept in one NumPy matrix.
+
+        Rows are appended in amortized O(1) and persisted by appending to a raw float32
+        file and a jsonl file of row metadata, so adding a memory never rewrites the
+        index. A query is one matrix-vector product and a partial sort, which stays in
+        the millisecond range for 100k rows.
+
+        Numeric row fields can be mirrored into arrays (columns) next to the matrix, so
+        callers can rank by them without a Python pass over the rows.
+
+        Several processes can share the files: appends and rewrites hold an flock on
+        <path>.lock, and refresh() picks up the rows other processes appended (or reloads
+        after another process rewrote the files) by comparing the file size and inode
+        with what was already read.
+
+        Args:
+            path (Optional[str]): Path prefix of the .f32 and .jsonl files
+            vectorizer (Optional[HashingVectorizer]): The text embedding
+            fields (Optional[Dict[str, float]]): Numeric row fields to mirror, with their default
+        """
+        self.path = path
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.fields = fields or {}
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(f"{path}.lock") if path else None
+        self._reset()
+
+    def _reset(self):
+        self.matrix = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.columns = {name: np.zeros(0) for name in self.fields}
+        self.size = 0
+        self.rows: List[Optional[Dict]] = []
+        self.row_by_id: Dict[str, int] = {}
+        # how much of the files is loaded, (inode, bytes of .jsonl, rows)
+        self.file_state = (None, 0, 0)
+
+    @classmethod
+    def load(
+        cls, path: str, vectorizer: Optional[HashingVectorizer] = None, fields: Optional[Dict[str, float]] = None
+    ) -> "VectorIndex":
+        """
+        Load a persisted index, an empty one if the files do not exist.
+        """
+        index = cls(path, vectorizer, fields)
+        index.refresh()
+        return index
+
+    def _file_stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(f"{self.path}.jsonl")
+        except FileNotFoundError:
+            return None
+
+    def _load_appended(self) -> bool:
+        """
+        Load the rows appended to the files since the last read, the caller holds the locks.
+
+        Returns:
+            bool: False if the files were rewritten and have to be reloaded instead
+        """
+        stat = self._file_stat()
+        inode, read_bytes, read_rows = self.file_state
+        if stat is None or not os.path.exists(f"{self.path}.f32"):
+            return True
+        if inode is not None and (stat.st_ino != inode or stat.st_size < read_bytes):
+            return False
+        if stat.st_size == read_bytes:
+            return True
+        with open(f"{self.path}.jsonl", "rb") as rows_file:
+            rows_file.seek(read_bytes)
+            data = rows_file.read()
+        # a crash between the two appends leaves one side longer, keep the rows both have
+        available = os.path.getsize(f"{self.path}.f32") // (4 * self.vectorizer.dim) - read_rows
+        rows, consumed = [], 0
+        for line in data.split(b"\n")[:-1]:
+            if len(rows) >= available:
+                break
+            consumed += len(line) + 1
+            if line.strip():
+                rows.append(json.loads(line))
+        if rows:
+            vectors = np.fromfile(f"{self.path}.f32", dtype=np.float32, count=len(rows) * self.vectorizer.dim,
+                                  offset=read_rows * 4 * self.vectorizer.dim)
+            self._append(vectors.reshape(len(rows), self.vectorizer.dim), rows)
+        self.file_state = (stat.st_ino, read_bytes + consumed, read_rows + len(rows))
+        return True
+
+    def refresh(self) -> bool:
+        """
+        Pick up the changes other processes made to the files.
+
+        Rows appended elsewhere are loaded incrementally, if the files were rewritten
+        (save) the index is reloaded, dropping rows added with persist=False.
+
+        Returns:
+            bool: True if the files changed
+        """
+        if not self.path:
+            return False
+        stat = self._file_stat()
+        if stat is None or (stat.st_ino, stat.st_size) == self.file_state[:2]:
+            return False  # fast path without the file lock, a stat per call
+        with self.file_lock, self.lock:
+            if not self._load_appended():
+                self._reset()
+                self._load_appended()
+        return True
+
+    def __len__(self) -> int:
+        return len(self.row_by_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.row_by_id
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        """
+        Get the metadata of a row.
+        """
+        position = self.row_by_id.get(doc_id)
+        return self.rows[position] if position is not None else None
+
+    def _append(self, vectors: np.ndarray, rows: List[Dict]):
+        with self.lock:
+            needed = self.size + len(rows)
+            if needed > len(self.matrix):
+                # grow geometrically so appends are amortized O(1)
+                capacity = max(needed, 2 * len(self.matrix), 64)
+                grown = np.zeros((capacity, self.vectorizer.dim), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+                self.alive = np.concatenate([self.alive[:self.size], np.zeros(capacity - self.size, dtype=bool)])
+                for name, column in self.columns.items():
+                    self.columns[name] = np.concatenate([column[:self.size], np.zeros(capacity - self.size)])
+            self.matrix[self.size:needed] = vectors
+            self.alive[self.size:needed] = True
+            for name, default in self.fields.items():
+                self.columns[name][self.size:needed] = [row.get(name, default) for row in rows]
+            for offset, row in enumerate(rows):
+                previous = self.row_by_id.get(row["id"])
+                if previous is not None:
+                    # a newer row replaces the old one
+                    self.rows[previous] = None
+                    self.matrix[previous] = 0
+                    self.alive[previous] = False
+                self.rows.append(row)
+                self.row_by_id[row["id"]] = self.size + offset
+            self.size = needed
+
+    def add_many(self, rows: List[Dict], texts: List[str], persist: bool = True):
+        """
+        Embed and append rows, a row with an existing id replaces it.
+
+        Args:
+            rows (List[Dict]): Row metadata, each with a unique "id"
+            texts (List[str]): The texts to embed
+            persist (bool): Append the rows to the files right away
+        """
+        if rows:
+            self.add_vectors(rows, self.vectorizer.transform(texts), persist)
+
+    def add_vectors(self, rows: List[Dict], vectors: np.ndarray, persist: bool = True):
+        """
+        Append rows embedded elsewhere (ex: in import workers) with the same vectorizer.
+        """
+        if not rows:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(rows), self.vectorizer.dim)
+        if not (persist and self.path):
+            with self.lock:
+                self._append(vectors, rows)
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.file_lock, self.lock:
+            # rows of other processes first, so the loaded part stays a prefix of the files
+            self.refresh()
+            self._append(vectors, rows)
+            self._write_rows(vectors, rows)
+
+    def _write_rows(self, vectors: np.ndarray, rows: List[Dict]):
+        # the caller holds the file lock and has loaded the rows other processes appended
+        with open(f"{self.path}.f32", "ab") as vectors_file:
+            vectors.tofile(vectors_file)
+        with open(f"{self.path}.jsonl", "a") as rows_file:
+            rows_file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+        stat = self._file_stat()
+        self.file_state = (stat.st_ino, stat.st_size, self.file_state[2] + len(rows))
+
+    def persist(self, doc_ids: List[str]):
+        """
+        Append rows added with persist=False to the files, without embedding or adding them again.
+
+        Args:
+            doc_ids (List[str]): Ids of the rows, unknown ids are skipped
+        """
+        if not self.path:
+            return
+        with self.lock:
+            positions = [self.row_by_id[doc_id] for doc_id in doc_ids if doc_id in self.row_by_id]
+            rows, vectors = [self.rows[i] for i in positions], self.matrix[positions].copy()
+        if not rows:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.file_lock, self.lock:
+            self.refresh()
+            # a reload after another process rewrote the files drops rows that were only in memory
+            missing = [i for i, row in enumerate(rows) if row["id"] not in self.row_by_id]
+            if missing:
+                self._append(vectors[missing], [rows[i] for i in missing])
+            self._write_rows(vectors, rows)
+
+    def add(self, row: Dict, text: str, persist: bool = True):
+        self.add_many([row], [text], persist)
+
+    def remove(self, doc_id: str):
+        """
+        Drop a row from search results, the space is reclaimed by save().
+        """
+        with self.lock:
+            position = self.row_by_id.pop(doc_id, None)
+            if position is not None:
+                self.rows[position] = None
+                self.matrix[position] = 0
+                self.alive[position] = False
+
+    def save(self):
+        """
+        Rewrite the files with only the live rows.
+
+        Rows other processes appended meanwhile are kept, if another process rewrote the
+        files the last rewrite wins. An index that never read the files replaces them.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.file_lock, self.lock:
+            if self.file_state[0] is not None:
+                self._load_appended()
+            live = [i for i, row in enumerate(self.rows) if row is not None]
+            vectors, rows = self.matrix[live], [self.rows[i] for i in live]
+            self._reset()
+            self._append(vectors, rows)
+            vectors.tofile(f"{self.path}.f32.tmp")
+            with open(f"{self.path}.jsonl.tmp", "w") as rows_file:
+                rows_file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            os.replace(f"{self.path}.f32.tmp", f"{self.path}.f32")
+            os.replace(f"{self.path}.jsonl.tmp", f"{self.path}.jsonl")
+            stat = self._file_stat()
+            self.file_state = (stat.st_ino, stat.st_size, len(rows))
+
+    def similarities(self, query: str) -> Tuple[List[Optional[Dict]], np.ndarray]:
+        """
+        Get the cosine similarity of a query to every row.
+
+        Returns:
+            Tuple[List[Optional[Dict]], np.ndarray]: The rows (None for removed ones) and their similarities
+        """
+        query_vector = self.vectorizer.transform([query])[0]
+        with self.lock:
+            return self.rows[:self.size], self.matrix[:self.size] @ query_vector
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        """
+        Get the k rows most similar to a query.
+
+        Args:
+            query (str): Free text query
+            k (int): Number of results
+            min_score (float): Minimum cosine similarity
+
+        Returns:
+            List[Tuple[Dict, float]]: (row metadata, cosine similarity), best first
+        """
+        return self.search_many([query], k, min_score)[0]
+
+    def search_many(self, queries: List[str], k: int = 5, min_score: float = 0.0) -> List[List[Tuple[Dict, float]]]:
+        """
+        Batched search, one matrix product for all queries.
+        """
+        query_vectors = self.vectorizer.transform(queries)
+        with self.lock:
+            if not self.size:
+                return [[] for _ in queries]
+            scores = query_vectors @ self.matrix[:self.size].T
+            rows = self.rows
+        k = min(k, scores.shape[1])
+        results = []
+        for query_scores in scores:
+            top = np.argpartition(-query_scores, k - 1)[:k]
+            top = top[np.argsort(-query_scores[top])]
+            results.append([
+                (rows[i], float(query_scores[i])) for i in top
+                if rows[i] is not None and query_scores[i] > min_score
+            ])
+        return results
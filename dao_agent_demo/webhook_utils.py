@@ -0,0 +1,298 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from dao_agent_demo.farcaster_utils import format_notification
+
+load_dotenv()
+
+SIGNATURE_HEADER = "X-Neynar-Signature"
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """
+    Sign a webhook body the way neynar does (hex HMAC-SHA512 of the raw body).
+    """
+    return hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+
+
+def classify_cast(cast: Dict, fid) -> Optional[str]:
+    """
+    Get the notification type of a cast for the agent.
+
+    Args:
+        cast (Dict): The neynar cast object of a cast.created event
+        fid: The agent's farcaster fid
+
+    Returns:
+        Optional[str]: mention, reply or None if the cast is not for the agent
+    """
+    fid = str(fid)
+    if str(cast.get("author", {}).get("fid")) == fid:
+        return None  # the agent's own casts
+    if any(str(profile.get("fid")) == fid for profile in cast.get("mentioned_profiles") or []):
+        return "mention"
+    if str((cast.get("parent_author") or {}).get("fid")) == fid:
+        return "reply"
+    return None
+
+
+class NeynarWebhookReceiver:
+    def __init__(
+        self,
+        submit: Callable[[Dict], object],
+        port: int = 8787,
+        host: str = "127.0.0.1",
+        secret: Optional[str] = None,
+        fid: Optional[str] = None,
+        max_remembered: int = 10000,
+        allow_unsigned: bool = False,
+    ):
+        """
+        Lightweight HTTP receiver for neynar cast.created webhooks.
+
+        Mentions and replies to the agent are verified, deduped by cast hash and handed
+        to submit (ex: AgentRuntime.submit) as soon as they arrive, so the agent reacts
+        in well under a second instead of waiting for the next notifications poll.
+        Polling keeps running as a slower reconciliation pass for missed deliveries.
+
+        Without a secret anyone who can reach the port could queue work for the agent,
+        so the receiver refuses to start unless allow_unsigned is set.
+
+        Args:
+            submit (Callable): Called with each notification
+            port (int): Port to listen on
+            host (str): Interface to bind, put a tunnel or proxy in front for neynar
+            secret (Optional[str]): Webhook secret, defaults to NEYNAR_WEBHOOK_SECRET
+            fid (Optional[str]): The agent's fid, defaults to FARCASTER_FID
+            max_remembered (int): Cast hashes kept for dedupe
+            allow_unsigned (bool): Accept unsigned deliveries when there is no secret (local testing)
+        """
+        self.submit = submit
+        self.port = port
+        self.host = host
+        self.secret = secret if secret is not None else os.getenv("NEYNAR_WEBHOOK_SECRET")
+        self.fid = fid if fid is not None else os.getenv("FARCASTER_FID")
+        self.max_remembered = max_remembered
+        self.allow_unsigned = allow_unsigned
+        self.seen: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"received": 0, "accepted": 0, "duplicates": 0, "ignored": 0, "rejected": 0, "latency_total": 0.0}
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+        if not self.secret:
+            if not allow_unsigned:
+                raise EnvironmentError(
+                    "NEYNAR_WEBHOOK_SECRET is not set, refusing unsigned webhooks (allow them with --webhook-insecure or serve --insecure)"
+                )
+            print("\033[91mNEYNAR_WEBHOOK_SECRET is not set, webhook signatures are not verified\033[0m")
+
+    def verify(self, body: bytes, signature: Optional[str]) -> bool:
+        """
+        Check the signature header of a webhook body.
+        """
+        if not self.secret:
+            return self.allow_unsigned
+        if not signature:
+            return False
+        return hmac.compare_digest(sign_payload(body, self.secret), signature)
+
+    def _count(self, stat: str):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _seen(self, cast_hash: str) -> bool:
+        with self.lock:
+            return cast_hash in self.seen
+
+    def _remember(self, cast_hash: str):
+        # webhooks are retried and can arrive twice, only the first delivery that was queued counts
+        with self.lock:
+            self.seen[cast_hash] = time.time()
+            while len(self.seen) > self.max_remembered:
+                self.seen.popitem(last=False)
+
+    def handle_event(self, body: bytes, signature: Optional[str]) -> int:
+        """
+        Handle one webhook delivery.
+
+        Args:
+            body (bytes): The raw request body
+            signature (Optional[str]): The signature header
+
+        Returns:
+            int: The http status code to answer with
+        """
+        self._count("received")
+        if not self.verify(body, signature):
+            self._count("rejected")
+            return 401
+        try:
+            event = json.loads(body)
+        except json.JSONDecodeError:
+            self._count("rejected")
+            return 400
+
+        cast = event.get("data") or {}
+        notification_type = classify_cast(cast, self.fid) if event.get("type") == "cast.created" else None
+        if not notification_type or "hash" not in cast:
+            self._count("ignored")
+            return 200
+        if self._seen(cast["hash"]):
+            self._count("duplicates")
+            return 200
+
+        try:
+            notification = format_notification(cast, notification_type)
+        except (KeyError, ValueError) as e:
+            print(f"\033[91mError reading webhook cast: {str(e)}\033[0m")
+            self._count("rejected")
+            return 400
+        if self.submit(notification) is False:
+            # not queued (ex: the runtime is still starting), neynar retries the delivery
+            self._count("rejected")
+            return 503
+        # only remembered once queued, so a failed delivery is not dropped as a duplicate on retry
+        # (a retry racing the first delivery is deduped again by the work queue)
+        self._remember(cast["hash"])
+        with self.lock:
+            self.stats["accepted"] += 1
+            self.stats["latency_total"] += max(notification["age_in_sec"], 0)
+        return 200
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status = receiver.handle_event(body, self.headers.get(SIGNATURE_HEADER))
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass  # deliveries are summarized by report()
+
+        return Handler
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="neynar-webhook", daemon=True)
+        self.thread.start()
+        print(f"neynar webhook receiver listening on http://{self.host}:{self.port}")
+
+    def stop(self):
+        """
+        Stop serving.
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def metrics(self) -> Dict:
+        """
+        Get the delivery metrics of the receiver.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        latency_total = stats.pop("latency_total")
+        stats["avg_latency_sec"] = latency_total / stats["accepted"] if stats["accepted"] else 0.0
+        return stats
+
+    def report(self) -> str:
+        """
+        Get a one line summary of the webhook deliveries.
+        """
+        m = self.metrics()
+        return (
+            f"webhook: {m['accepted']} accepted / {m['received']} received, {m['duplicates']} duplicates, "
+            f"{m['ignored']} ignored, {m['rejected']} rejected, avg cast to queue {m['avg_latency_sec']:.2f}s"
+        )
+
+
+def send_test_event(
+    url: str,
+    text: str,
+    notification_type: str = "mention",
+    fid: Optional[str] = None,
+    secret: Optional[str] = None,
+    cast_hash: Optional[str] = None,
+) -> int:
+    """
+    Stand-in for neynar: post a signed cast.created event to a receiver.
+
+    Args:
+        url (str): The receiver url
+        text (str): The cast text
+        notification_type (str): mention or reply
+        fid (Optional[str]): The agent's fid, defaults to FARCASTER_FID
+        secret (Optional[str]): Webhook secret, defaults to NEYNAR_WEBHOOK_SECRET
+        cast_hash (Optional[str]): Cast hash, random if not given
+
+    Returns:
+        int: The http status code of the receiver
+    """
+    fid = int(fid or os.getenv("FARCASTER_FID") or 0)
+    secret = secret if secret is not None else os.getenv("NEYNAR_WEBHOOK_SECRET")
+    cast = {
+        "hash": cast_hash or "0x" + os.urandom(20).hex(),
+        "text": text,
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+        "author": {"fid": 1, "username": "tester", "verified_addresses": {"eth_addresses": []}},
+        "mentioned_profiles": [{"fid": fid}] if notification_type == "mention" else [],
+        "parent_author": {"fid": fid} if notification_type == "reply" else {"fid": None},
+    }
+    body = json.dumps({"created_at": int(time.time()), "type": "cast.created", "data": cast}).encode()
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers[SIGNATURE_HEADER] = sign_payload(body, secret)
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a standalone neynar webhook receiver or send it a test event.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Print the notifications a receiver would queue")
+    serve_parser.add_argument('--port', type=int, default=8787, help="Port to listen on (default: 8787)")
+    serve_parser.add_argument('--insecure', action='store_true', help="Accept unsigned deliveries without NEYNAR_WEBHOOK_SECRET")
+    send_parser = subparsers.add_parser("send", help="Post a signed test cast to a receiver")
+    send_parser.add_argument('--url', default="http://127.0.0.1:8787", help="Receiver url")
+    send_parser.add_argument('--text', default="gm, what is on the agenda?", help="Cast text")
+    send_parser.add_argument('--type', dest="notification_type", choices=["mention", "reply"], default="mention")
+    send_parser.add_argument('--hash', dest="cast_hash", default=None, help="Cast hash (resend one to test dedupe)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        receiver = NeynarWebhookReceiver(
+            lambda notification: print(json.dumps(notification, indent=2)), port=args.port, allow_unsigned=args.insecure
+        )
+        receiver.start()
+        try:
+            receiver.thread.join()
+        except KeyboardInterrupt:
+            receiver.stop()
+            print(receiver.report())
+    else:
+        print(send_test_event(args.url, args.text, args.notification_type, cast_hash=args.cast_hash))